@@ -10,6 +10,7 @@ class CultureFlowsApp {
         this.currentYear = 2024;
         this.currentFilter = 'all';
         this.migrationData = {};
+        this.apiMode = false;
         this.culturalDimensions = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr'];
         
         this.init();
@@ -43,17 +44,27 @@ class CultureFlowsApp {
 
     async loadData() {
         try {
-            console.log('Loading CSV data...');
-            const response = await fetch('./data/masterdata.csv');
+            // Under dev_server.py, fetch only what the first render needs from the query API
+            this.data = await this.loadApiData();
             
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
+            // Otherwise prefer the typed columnar bundle written by the pipeline, fall back to CSV
+            if (!this.data) {
+                this.data = await this.loadColumnarData('./data/masterdata.bin');
             }
             
-            const csvText = await response.text();
-            console.log('CSV loaded, parsing...');
-            
-            this.data = this.parseCSV(csvText);
+            if (!this.data) {
+                console.log('Loading CSV data...');
+                const response = await fetch('./data/masterdata.csv');
+                
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                
+                const csvText = await response.text();
+                console.log('CSV loaded, parsing...');
+                
+                this.data = this.parseCSV(csvText);
+            }
             
             if (!this.data || this.data.length === 0) {
                 throw new Error('No data found in CSV file');
@@ -69,6 +80,130 @@ class CultureFlowsApp {
         }
     }
 
+    async queryApi(params) {
+        // The API caps each page (MAX_LIMIT rows), so follow offset until total rows are read
+        const rows = [];
+        let total = Infinity;
+        while (rows.length < total) {
+            const query = new URLSearchParams({ ...params, offset: rows.length });
+            const response = await fetch(`./api/masterdata?${query}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            
+            const result = await response.json();
+            total = result.total;
+            if (result.rows.length === 0) break;
+            result.rows.forEach(values => {
+                const row = {};
+                result.columns.forEach((name, i) => {
+                    // Missing scores (e.g. lto/ivr) stay null rather than becoming real zeros
+                    row[name] = values[i];
+                });
+                rows.push(row);
+            });
+        }
+        return rows;
+    }
+
+    async loadApiData() {
+        try {
+            // Names and regions for every country, migration totals for the displayed year only
+            const rows = await this.queryApi({ columns: 'continent,region', years: this.currentYear });
+            this.apiMode = true;
+            this.loadedYears = new Set([String(this.currentYear)]);
+            this.detailedCountries = new Set();
+            console.log(`Loaded ${rows.length} countries from the query API`);
+            return rows;
+        } catch (error) {
+            // Static hosting has no API
+            return null;
+        }
+    }
+
+    async ensureYearLoaded(year) {
+        if (!this.apiMode || this.loadedYears.has(String(year))) return;
+        
+        const rows = await this.queryApi({ years: year });
+        const byName = new Map(this.data.map(country => [country.country, country]));
+        rows.forEach(row => Object.assign(byName.get(row.country) || {}, row));
+        this.loadedYears.add(String(year));
+        this.processData();
+    }
+
+    async ensureCountryLoaded(countryData) {
+        if (!this.apiMode || this.detailedCountries.has(countryData.country)) return;
+        
+        // Full row (all years, cultural dimensions, population) for a selected country
+        const [row] = await this.queryApi({ country: countryData.country });
+        if (row) {
+            Object.assign(countryData, row);
+        }
+        this.detailedCountries.add(countryData.country);
+        this.processData();
+    }
+
+    async loadColumnarData(url) {
+        try {
+            const response = await fetch(url);
+            if (!response.ok) return null;
+            
+            const buffer = await response.arrayBuffer();
+            const data = this.decodeColumnar(buffer);
+            if (data) {
+                console.log('Columnar data loaded:', data.length, 'countries');
+            }
+            return data;
+        } catch (error) {
+            console.warn('Columnar data unavailable, using CSV:', error);
+            return null;
+        }
+    }
+
+    decodeColumnar(buffer) {
+        // Layout: 'CFB1', uint32 header length, JSON header, 8-byte aligned column buffers
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'CFB1') return null;
+        
+        const headerLength = view.getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        if (header.version !== 1) return null;
+        
+        const bodyOffset = 8 + headerLength;
+        const arrayTypes = { int32: Int32Array, float64: Float64Array, dict: Uint16Array };
+        const columns = {};
+        
+        header.columns.forEach(column => {
+            if (column.type === 'string') {
+                columns[column.name] = column.values;
+                return;
+            }
+            
+            const ArrayType = arrayTypes[column.type];
+            const values = new ArrayType(buffer, bodyOffset + column.offset, header.rows);
+            columns[column.name] = column.type === 'dict'
+                ? Array.from(values, code => column.categories[code])
+                : values;
+        });
+        
+        const data = [];
+        for (let i = 0; i < header.rows; i++) {
+            const row = {};
+            header.columns.forEach(({ name }) => {
+                const value = columns[name][i];
+                // Match parseCSV: missing numbers become 0
+                row[name] = typeof value === 'number' && isNaN(value) ? 0 : value;
+            });
+            
+            if (row.country && row.country.trim()) {
+                data.push(row);
+            }
+        }
+        
+        return data;
+    }
+
     parseCSV(csvText) {
         const lines = csvText.trim().split('\n');
         const headers = lines[0].split(',').map(h => h.trim());
@@ -288,10 +423,16 @@ class CultureFlowsApp {
         console.log('Fallback map created with', sampleCountries.length, 'countries');
     }
 
-    selectCountry(countryName) {
+    async selectCountry(countryName) {
         const countryData = this.data.find(d => d.country === countryName);
         if (!countryData) return;
 
+        try {
+            await this.ensureCountryLoaded(countryData);
+        } catch (error) {
+            console.error('Failed to load country details:', error);
+        }
+
         if (!this.selectedCountries.primary) {
             this.selectedCountries.primary = countryData;
             this.updateCountryDisplay('country-1', countryData);
@@ -323,9 +464,18 @@ class CultureFlowsApp {
         `;
     }
 
-    updateMapColors() {
+    async updateMapColors() {
         if (!this.worldMap) return;
 
+        const year = this.currentYear;
+        try {
+            await this.ensureYearLoaded(year);
+        } catch (error) {
+            console.error('Failed to load migration data for', year, error);
+        }
+        // The slider moved on while this year was loading
+        if (year !== this.currentYear) return;
+
         // Get migration values for current year and filter
         const migrationValues = this.data.map(country => {
             const key = this.currentFilter === 'all' ? 
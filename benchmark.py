@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the cleaning, clustering and labelling paths on synthetic masterdata
+Usage: python3 benchmark.py [--sizes 100,10000,1000000] [--repeat 3] [--save-baseline] [--threshold 0.25]
+
+Synthetic tables have the masterdata.csv columns, with Hofstede scores drawn from the
+mean/covariance of the real scores and log-normal populations and immigration ratios.
+Each run is appended to a JSON history and compared against the stored baseline; the exit
+status is 1 when any stage is slower than the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+import cluster_labels
+import clustering_analysis
+import fix_masterdata
+import masterdata_schema
+from profiling import set_quiet
+
+HISTORY_PATH = 'src/output/cache/benchmark_history.json'
+BASELINE_PATH = 'src/output/cache/benchmark_baseline.json'
+DEFAULT_SIZES = [10 ** 2, 10 ** 4, 10 ** 6]
+# Largest table for the end-to-end create_country_clustering run (writes JSON per country)
+END_TO_END_MAX_ROWS = 10 ** 4
+# Differences below this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.01
+
+# Moments of the real Hofstede scores (pdi, idv, mas, uai, lto, ivr) across the 116 countries
+HOFSTEDE_MEAN = [66.2, 40.3, 46.6, 66.2, 39.2, 45.8]
+HOFSTEDE_STD = [20.5, 22.8, 16.7, 21.5, 20.8, 22.8]
+HOFSTEDE_CORR = [
+    [1.00, -0.62, 0.01, 0.24, -0.28, -0.25],
+    [-0.62, 1.00, -0.17, 0.00, 0.57, 0.09],
+    [0.01, -0.17, 1.00, 0.01, -0.07, 0.08],
+    [0.24, 0.00, 0.01, 1.00, -0.07, -0.17],
+    [-0.28, 0.57, -0.07, -0.07, 1.00, -0.30],
+    [-0.25, 0.09, 0.08, -0.17, -0.30, 1.00],
+]
+
+CONTINENTS = {
+    'Europe': (0.33, ['Eastern Europe', 'Northern Europe', 'Southern Europe', 'Western Europe']),
+    'Asia': (0.28, ['Central Asia', 'Eastern Asia', 'Southern Asia', 'South-Eastern Asia', 'Western Asia']),
+    'Latin America and the Caribbean': (0.19, ['Caribbean', 'Central America', 'South America']),
+    'Africa': (0.155, ['Eastern Africa', 'Middle Africa', 'Northern Africa', 'Southern Africa', 'Western Africa']),
+    'Oceania': (0.028, ['Oceania', 'Melanesia']),
+    'Northern America': (0.017, ['Northern America']),
+}
+
+def synthetic_masterdata(n_rows, seed=0):
+    """
+    Masterdata-shaped table with realistic Hofstede, population and migration distributions
+    """
+    rng = np.random.default_rng(seed)
+
+    names = np.char.add('Country ', np.arange(n_rows).astype(str))
+    # A few UN DESA style names for the cleaning step
+    marked = rng.random(n_rows) < 0.05
+    names[marked] = np.char.add(names[marked], '*')
+    noted = rng.random(n_rows) < 0.05
+    names[noted] = np.char.add(names[noted], ' (Plurinational State of)')
+
+    continent_names = list(CONTINENTS)
+    weights = np.array([CONTINENTS[c][0] for c in continent_names])
+    continent_idx = rng.choice(len(continent_names), n_rows, p=weights / weights.sum())
+    region_pick = rng.random(n_rows)
+    regions = np.empty(n_rows, dtype=object)
+    for i, name in enumerate(continent_names):
+        mask = continent_idx == i
+        options = CONTINENTS[name][1]
+        regions[mask] = np.array(options, dtype=object)[(region_pick[mask] * len(options)).astype(int)]
+
+    cov = np.array(HOFSTEDE_CORR) * np.outer(HOFSTEDE_STD, HOFSTEDE_STD)
+    scores = np.clip(rng.multivariate_normal(HOFSTEDE_MEAN, cov, n_rows), 0, 120).round()
+
+    df = pd.DataFrame({
+        'country': names,
+        'continent': np.array(continent_names, dtype=object)[continent_idx],
+        'region': regions,
+    })
+    for i, col in enumerate(clustering_analysis.CULTURAL_FEATURES):
+        df[col] = scores[:, i]
+    # lto/ivr are missing for some countries in the real data
+    for col in ['lto', 'ivr']:
+        df.loc[rng.random(n_rows) < 0.05, col] = np.nan
+
+    # Log-normal population (median ~12M) and immigration ratio per 1000 (median ~21)
+    population = np.exp(rng.normal(16.3, 1.55, n_rows)).round()
+    population[rng.random(n_rows) < 0.01] = 0
+    ratio_2024 = np.exp(rng.normal(3.06, 1.75, n_rows))
+    total_2024 = ratio_2024 * population / 1000
+
+    # Walk back from 2024 with noisy log growth per five-year step
+    totals = {'2024': total_2024}
+    current = total_2024
+    for year in reversed(masterdata_schema.YEARS[:-1]):
+        current = current * np.exp(-rng.normal(0.03, 0.2, n_rows))
+        totals[year] = current
+    for year in masterdata_schema.YEARS:
+        female_share = np.clip(rng.normal(0.48, 0.06, n_rows), 0.2, 0.8)
+        df[year] = totals[year].round().astype(np.int64)
+        df[f"{year}_male"] = (totals[year] * (1 - female_share)).round().astype(np.int64)
+        df[f"{year}_female"] = (totals[year] * female_share).round().astype(np.int64)
+    df['population'] = population.astype(np.int64)
+
+    return df
+
+def run_stages(df, n_init, workdir):
+    """Time each stage once on df, returning {stage: seconds}"""
+    timings = {}
+
+    def timed_stage(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    cleaned = timed_stage('fix_clean', fix_masterdata.clean_masterdata, df)
+    timed_stage('population_corrections', fix_masterdata.apply_population_corrections, cleaned)
+    timed_stage('validate', masterdata_schema.validate_masterdata, cleaned)
+    df_clean = timed_stage('prepare', clustering_analysis.prepare_clustering_data, cleaned)
+    X = timed_stage('features', lambda d: StandardScaler().fit_transform(
+        clustering_analysis.build_feature_matrix(d)), df_clean)
+    timed_stage('kmeans', lambda x: KMeans(n_clusters=8, random_state=42, n_init=n_init).fit(x), X)
+    timed_stage('labels', cluster_labels.label_countries, df_clean)
+
+    if len(df) <= END_TO_END_MAX_ROWS:
+        input_path = os.path.join(workdir, 'masterdata.csv')
+        cleaned.to_csv(input_path, index=False)
+        timed_stage('create_country_clustering', lambda: clustering_analysis.create_country_clustering(
+            n_init=n_init, input_path=input_path, output_dir=workdir))
+
+    return timings
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, n_init=3, seed=0):
+    """
+    Median and minimum seconds per stage for every table size
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            df = synthetic_masterdata(size, seed)
+            runs = [run_stages(df, n_init, workdir) for _ in range(repeat)]
+            results[str(size)] = {
+                stage: {
+                    'median': float(np.median([run[stage] for run in runs])),
+                    'min': float(min(run[stage] for run in runs)),
+                }
+                for stage in runs[0]
+            }
+            print(f"\n{size:,} rows")
+            for stage, stats in results[str(size)].items():
+                print(f"  {stage:<28}{stats['median']:>10.4f}s (min {stats['min']:.4f}s)")
+    return results
+
+def compare(results, baseline, threshold):
+    """List of regressions: stages whose median exceeds the baseline median by the threshold"""
+    regressions = []
+    for size, stages in results.items():
+        for stage, stats in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if not reference:
+                continue
+            slower = stats['median'] - reference['median']
+            if slower > MIN_REGRESSION_SECONDS and stats['median'] > reference['median'] * (1 + threshold):
+                regressions.append({
+                    'size': size, 'stage': stage,
+                    'baseline': reference['median'], 'current': stats['median'],
+                    'ratio': stats['median'] / reference['median'],
+                })
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def append_history(entry, path=HISTORY_PATH):
+    history = []
+    if os.path.exists(path):
+        with open(path) as f:
+            history = json.load(f)
+    history.append(entry)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+if __name__ == "__main__":
+    # Paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Benchmark CultureFlows stages on synthetic data")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="row counts, e.g. 100,10000")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--n-init', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    set_quiet(True)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = run_benchmarks(sizes, repeat=args.repeat, n_init=args.n_init)
+
+    append_history({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'results': results,
+    })
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline} - run with --save-baseline to create one")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  {r['stage']} @ {r['size']} rows: {r['baseline']:.4f}s → {r['current']:.4f}s ({r['ratio']:.2f}x)")
+        sys.exit(1)
+    print(f"\n✅ No stage regressed by more than {args.threshold:.0%}")
@@ -0,0 +1,118 @@
+/**
+ * Artifact Loader
+ * Reads data/manifest.json once per page and fetches content-hashed artifacts, or only a
+ * JSON-patch delta against the copy kept in localStorage (see src/artifact_manifest.py)
+ */
+
+class ArtifactLoader {
+    constructor(baseUrl = 'data') {
+        this.baseUrl = baseUrl;
+        this.manifestPromise = null;
+    }
+
+    loadManifest() {
+        // The manifest is the only file revalidated on every visit; artifacts are content-hashed
+        if (!this.manifestPromise) {
+            this.manifestPromise = fetch(`${this.baseUrl}/manifest.json`, { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : null)
+                .catch(() => null);
+        }
+        return this.manifestPromise;
+    }
+
+    async loadArtifact(name) {
+        const manifest = await this.loadManifest();
+        const entry = manifest?.artifacts?.[name];
+        if (!entry) {
+            // No manifest published yet: fall back to the plain file
+            const response = await fetch(`${this.baseUrl}/${name}.json`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            return response.json();
+        }
+
+        const cached = this.readStoredArtifact(name);
+        if (cached && cached.hash === entry.hash) {
+            return cached.data;
+        }
+
+        let data = null;
+        if (cached && entry.delta && entry.delta.from === cached.hash) {
+            try {
+                const response = await fetch(`${this.baseUrl}/${entry.delta.path}`);
+                if (response.ok) {
+                    data = this.applyJsonPatch(cached.data, await response.json());
+                    console.log(`Updated ${name} from a ${entry.delta.bytes} byte delta`);
+                }
+            } catch (error) {
+                console.warn(`Delta for ${name} failed, fetching it in full:`, error);
+                data = null;
+            }
+        }
+        if (data === null) {
+            const response = await fetch(`${this.baseUrl}/${entry.path}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            data = await response.json();
+        }
+
+        this.storeArtifact(name, entry.hash, data);
+        return data;
+    }
+
+    async loadOptionalArtifact(name) {
+        // Artifacts only some pipeline runs produce (e.g. world_geometry): null when not published
+        const manifest = await this.loadManifest();
+        if (!manifest?.artifacts?.[name]) return null;
+        try {
+            return await this.loadArtifact(name);
+        } catch (error) {
+            console.warn(`Artifact ${name} unavailable:`, error);
+            return null;
+        }
+    }
+
+    readStoredArtifact(name) {
+        try {
+            return JSON.parse(localStorage.getItem(`cultureflows.artifact.${name}`));
+        } catch (error) {
+            return null;
+        }
+    }
+
+    storeArtifact(name, hash, data) {
+        try {
+            localStorage.setItem(`cultureflows.artifact.${name}`, JSON.stringify({ hash, data }));
+        } catch (error) {
+            // Storage full or disabled - the next visit fetches the artifact again
+        }
+    }
+
+    applyJsonPatch(document, operations) {
+        // The add/remove/replace subset of RFC 6902 that artifact_manifest.json_patch emits
+        const decode = token => token.replace(/~1/g, '/').replace(/~0/g, '~');
+        for (const { op, path, value } of operations) {
+            if (path === '') {
+                document = value;
+                continue;
+            }
+            const tokens = path.split('/').slice(1).map(decode);
+            const key = tokens.pop();
+            const parent = tokens.reduce((node, token) => node[token], document);
+            if (op === 'remove') {
+                if (Array.isArray(parent)) parent.splice(Number(key), 1);
+                else delete parent[key];
+            } else if (op === 'add' && Array.isArray(parent)) {
+                parent.splice(key === '-' ? parent.length : Number(key), 0, value);
+            } else {
+                parent[key] = value;
+            }
+        }
+        return document;
+    }
+}
+
+// Shared instance, so every component reuses one manifest request
+window.CultureFlowsArtifacts = new ArtifactLoader();
@@ -3,12 +3,15 @@ class CountryInsights {
         this.containerId = containerId;
         this.container = document.getElementById(containerId);
         this.clusterData = null;
+        this.similarCountries = null;
+        this.manifest = null;
         this.init();
     }
 
     async init() {
         try {
             await this.loadClusterData();
+            await this.loadSimilarCountries();
             this.render();
         } catch (error) {
             console.error('Failed to initialize insights:', error);
@@ -18,40 +21,47 @@ class CountryInsights {
 
     async loadClusterData() {
         try {
-            // Try different paths based on environment
-            let response;
-            const isGitHubPages = window.location.hostname.includes('github.io');
-            
-            if (isGitHubPages) {
-                // For GitHub Pages, try data folder first, then src/output
-                try {
-                    response = await fetch('./data/clustering_results.json');
-                } catch (e) {
-                    response = await fetch('./src/output/clustering_results.json');
-                }
-            } else {
-                // For local server, try src/output first, then data folder
-                try {
-                    response = await fetch('src/output/clustering_results.json');
-                } catch (e) {
-                    response = await fetch('data/clustering_results.json');
-                }
-            }
-            
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-            }
-            
-            this.clusterData = await response.json();
-            console.log('Loaded cluster data from URL:', response.url);
+            await this.loadManifest();
+            this.clusterData = await this.loadArtifact('clustering_results');
             console.log('First cluster name:', this.clusterData.clusters['0']?.name);
-            console.log('Environment:', window.location.hostname.includes('github.io') ? 'GitHub Pages' : 'Local');
         } catch (error) {
             console.error('Error loading clustering data:', error);
             throw error;
         }
     }
 
+    async loadManifest() {
+        this.manifest = await window.CultureFlowsArtifacts.loadManifest();
+    }
+
+    loadArtifact(name) {
+        return window.CultureFlowsArtifacts.loadArtifact(name);
+    }
+
+    async loadSimilarCountries() {
+        // Precomputed nearest neighbours: country names once, neighbours as indices into them
+        try {
+            const artifact = await this.loadArtifact('similar_countries');
+            const positions = new Map(artifact.countries.map((name, i) => [name, i]));
+            this.similarCountries = { artifact, positions };
+        } catch (error) {
+            console.warn('Similar countries unavailable:', error);
+        }
+    }
+
+    getSimilarCountries(country, k = 5) {
+        if (!this.similarCountries) return [];
+        
+        const { artifact, positions } = this.similarCountries;
+        const position = positions.get(country);
+        if (position === undefined) return [];
+        
+        return artifact.neighbors[position].slice(0, k).map((neighbor, i) => ({
+            country: artifact.countries[neighbor],
+            distance: artifact.distances[position][i]
+        }));
+    }
+
     render() {
         if (!this.clusterData || !this.clusterData.clusters || Object.keys(this.clusterData.clusters).length === 0) {
             this.container.innerHTML = '<p>No clustering data available</p>';
@@ -67,6 +77,8 @@ class CountryInsights {
             </div>
 
             <div class="insights-analysis">
+                <div id="similar-countries" class="similar-countries-panel" style="display: none;"></div>
+
                 <div class="cluster-grid-section">
                     <div class="cluster-grid-header">
                         <h4>Interactive Clusters</h4>
@@ -337,14 +349,13 @@ class CountryInsights {
 
     // Public method to highlight countries from map selection
     highlightCountries(countries) {
+        this.renderSimilarCountries(countries || []);
+        
         if (!countries || countries.length === 0) {
             this.clearHighlights();
             return;
         }
 
-        const canvas = document.getElementById('cluster-scatter');
-        const ctx = canvas.getContext('2d');
-        
         // Find clusters of selected countries
         const selectedClusters = new Set();
         countries.forEach(country => {
@@ -366,16 +377,40 @@ class CountryInsights {
         });
     }
 
+    renderSimilarCountries(countries) {
+        const panel = this.container.querySelector('#similar-countries');
+        if (!panel) return;
+
+        const sections = countries
+            .map(country => ({ country, similar: this.getSimilarCountries(country) }))
+            .filter(section => section.similar.length > 0);
+
+        if (sections.length === 0) {
+            panel.style.display = 'none';
+            panel.innerHTML = '';
+            return;
+        }
+
+        panel.innerHTML = sections.map(({ country, similar }) => `
+            <div class="similar-countries-group">
+                <h5>Most similar to ${country}</h5>
+                <ol class="similar-countries-list">
+                    ${similar.map(s => `<li><span>${s.country}</span><span class="similar-distance">${s.distance.toFixed(2)}</span></li>`).join('')}
+                </ol>
+            </div>
+        `).join('');
+        panel.style.display = 'grid';
+    }
+
     async renderClusterWorldMap() {
         const mapContainer = this.container.querySelector('#cluster-world-map');
         if (!mapContainer) return;
 
         try {
-            // Load world topology data
-            const response = await fetch('https://cdn.jsdelivr.net/npm/world-atlas@2/countries-110m.json');
-            if (!response.ok) throw new Error('Failed to load world data');
-            
-            const worldData = await response.json();
+            // Pre-projected geometry published by the pipeline, loaded once
+            if (this.worldGeometry === undefined) {
+                this.worldGeometry = await window.CultureFlowsArtifacts.loadOptionalArtifact('world_geometry');
+            }
             
             // Set up SVG dimensions - bigger map with no wasted space
             const container = mapContainer.parentElement;
@@ -389,8 +424,20 @@ class CountryInsights {
                 .style('width', '100%')
                 .style('height', '100%');
 
-            // Create projection - larger scale for better visibility
+            // Larger scale for better visibility
             const scale = Math.min(width / 4, height / 2);
+            
+            if (this.worldGeometry) {
+                this.drawBundledClusterMap(svg, this.worldGeometry, width, height, scale);
+                return;
+            }
+            
+            // No bundle published: load world topology data and project it here
+            const response = await fetch('https://cdn.jsdelivr.net/npm/world-atlas@2/countries-110m.json');
+            if (!response.ok) throw new Error('Failed to load world data');
+            
+            const worldData = await response.json();
+            
             const projection = d3.geoNaturalEarth1()
                 .scale(scale)
                 .translate([width / 2, height / 2]);
@@ -445,6 +492,28 @@ class CountryInsights {
         }
     }
 
+    drawBundledClusterMap(svg, geometry, width, height, scale) {
+        // The paths are projected on the bundle's frame: rescale the frame instead of re-projecting,
+        // and colour each country by the cluster the pipeline embedded instead of matching names
+        const frame = geometry.projection;
+        const k = scale / frame.scale;
+        
+        svg.selectAll('*').remove();
+        svg.append('g')
+            .attr('transform', `translate(${width / 2},${height / 2}) scale(${k}) translate(${-frame.translate[0]},${-frame.translate[1]})`)
+            .selectAll('path')
+            .data(geometry.features)
+            .enter()
+            .append('path')
+            .attr('d', d => d.paths[0])
+            .attr('class', 'cluster-map-country')
+            .attr('vector-effect', 'non-scaling-stroke')
+            .style('fill', d => d.color || '#e5e7eb')
+            .style('stroke', '#ffffff')
+            .style('stroke-width', '0.5')
+            .style('opacity', 0.8);
+    }
+
     // Add resize listener for dynamic map sizing
     setupMapResize() {
         if (window.ResizeObserver) {
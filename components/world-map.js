@@ -15,6 +15,8 @@ class WorldMapComponent {
         this.height = 500;
         this.selectedCountries = [];
         this.colorData = new Map();
+        this.geometry = null;
+        this.detailLevel = 0;
         
         this.init();
     }
@@ -31,6 +33,13 @@ class WorldMapComponent {
     }
 
     async loadWorldData() {
+        // Pre-projected, simplified geometry from the pipeline (src/world_geometry.py)
+        this.geometry = await window.CultureFlowsArtifacts?.loadOptionalArtifact('world_geometry') || null;
+        if (this.geometry) {
+            console.log(`World geometry loaded: ${this.geometry.features.length} countries`);
+            return;
+        }
+        
         try {
             console.log('Loading world map data...');
             // Load world topology data from a CDN
@@ -74,6 +83,7 @@ class WorldMapComponent {
             .on('zoom', (event) => {
                 this.svg.selectAll('path')
                     .attr('transform', event.transform);
+                this.updateDetailLevel(event.transform.k);
             });
 
         this.svg.call(this.zoom);
@@ -83,7 +93,9 @@ class WorldMapComponent {
     }
 
     createMap() {
-        if (this.worldData) {
+        if (this.geometry) {
+            this.createBundledMap();
+        } else if (this.worldData) {
             this.createWorldMap();
         } else {
             this.createFallbackMap();
@@ -109,6 +121,38 @@ class WorldMapComponent {
             .on('click', (event, d) => this.handleClick(event, d));
     }
 
+    createBundledMap() {
+        // Paths are already projected for this frame; nothing is computed per feature here
+        this.countriesGroup
+            .selectAll('path')
+            .data(this.geometry.features)
+            .enter()
+            .append('path')
+            .attr('class', 'country')
+            .attr('d', d => d.paths[this.detailLevel])
+            .attr('fill', '#e2e8f0')
+            .attr('stroke', '#cbd5e1')
+            .attr('stroke-width', 0.5)
+            .style('cursor', 'pointer')
+            .on('mouseover', (event, d) => this.handleMouseOver(event, d))
+            .on('mouseout', (event, d) => this.handleMouseOut(event, d))
+            .on('click', (event, d) => this.handleClick(event, d));
+    }
+
+    updateDetailLevel(scale) {
+        // Swap in the coarsest simplification level that is still exact at this zoom
+        if (!this.geometry) return;
+        const levels = this.geometry.levels;
+        let level = levels.findIndex(l => l.zoom >= scale);
+        if (level === -1) level = levels.length - 1;
+        if (level === this.detailLevel) return;
+        
+        this.detailLevel = level;
+        this.countriesGroup
+            .selectAll('.country')
+            .attr('d', d => d.paths[level]);
+    }
+
     createFallbackMap() {
         console.log('Creating fallback map...');
         
@@ -201,6 +245,9 @@ class WorldMapComponent {
         } else {
             // Real country
             tooltipContent += `<br/>Migration: ${window.CultureFlowsUtils?.formatNumber(migrationValue) || migrationValue}`;
+            if (d.cluster_name) {
+                tooltipContent += `<br/>${d.cluster_name} (${d.migration_level} migration)`;
+            }
         }
         
         this.tooltip
@@ -236,6 +283,11 @@ class WorldMapComponent {
             return d.name;
         }
         
+        // Bundled geometry is joined to masterdata names by the pipeline
+        if (d.paths) {
+            return d.country || d.name || 'Unknown';
+        }
+        
         // Try to match country name from properties
         if (d.properties) {
             return d.properties.NAME || d.properties.NAME_EN || d.properties.name || 'Unknown';
@@ -317,7 +369,8 @@ class WorldMapComponent {
             .filter(d => this.getCountryName(d) === countryName);
         
         if (!country.empty()) {
-            const bounds = this.path.bounds(country.datum());
+            const datum = country.datum();
+            const bounds = datum.bounds || this.path.bounds(datum);
             const dx = bounds[1][0] - bounds[0][0];
             const dy = bounds[1][1] - bounds[0][1];
             const x = (bounds[0][0] + bounds[1][0]) / 2;
@@ -1,35 +1,447 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server for local development
-Usage: python3 dev_server.py [port]
+Usage: python3 dev_server.py [port] [--cache-mb N]
+
+Serves files from a size-bounded in-memory cache with precompressed gzip (and brotli,
+when the brotli package is installed) variants, ETag/Last-Modified revalidation and
+byte-range requests, using one thread per connection. Content-hashed files under
+artifacts/ (listed in data/manifest.json) are marked immutable.
+
+/api/masterdata answers filtered, projected and paginated queries over data/masterdata.csv:
+  ?continent=Europe&region=...&country=...   equality filters (comma-separated or repeated)
+  &columns=pdi,idv&years=2020,2024           projection (years expand to total/male/female)
+  &sort=-2024&limit=20&offset=40             ordering and pagination
+/api/similar?country=Netherlands&k=5 returns precomputed nearest neighbours from data/similar_countries.json
+/api/score scores what-if rows against the fitted clusters in data/scoring_model.json:
+  GET ?country=Netherlands&immigration_ratio_2024=*2&pdi=60   one country with changed features
+  POST {"rows": [{"pdi": 40, ..., "immigration_ratio_2024": 12.5}, ...]}   a batch of rows
 """
 
+import argparse
+import email.utils
+import gzip
+import hashlib
 import http.server
-import socketserver
+import json
 import os
+import re
 import sys
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+try:
+    from masterdata_query import MasterdataTable, QueryError
+    from scoring_model import ScoringModel
+    from similarity_index import SimilarCountries
+except ImportError:
+    # The query API needs pandas and scikit-learn; static files are served without them
+    MasterdataTable = QueryError = SimilarCountries = ScoringModel = None
+
+# Text assets worth precompressing
+COMPRESSIBLE_EXTENSIONS = {'.csv', '.json', '.js', '.css', '.html', '.svg', '.bin', '.txt', '.md'}
+MIN_COMPRESS_SIZE = 1024
+# Largest POST body and batch accepted by the scoring API
+MAX_POST_BYTES = 16 * 1024 * 1024
+MAX_SCORE_ROWS = 100000
+# Content-hashed artifacts (see src/artifact_manifest.py) never change once written
+IMMUTABLE_PATH = re.compile(r'/artifacts/[^/]+\.[0-9a-f]{16}(-[0-9a-f]{16}\.patch)?\.json$')
+
+class CachedAsset:
+    def __init__(self, body, mtime_ns, compressible):
+        self.mtime_ns = mtime_ns
+        self.size = len(body)
+        self.last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True)
+        self.mtime = mtime_ns // 10 ** 9
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.variants = {'identity': body}
+
+        if compressible and len(body) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body)
+
+    @property
+    def nbytes(self):
+        return sum(len(body) for body in self.variants.values())
+
+    def variant_etag(self, encoding):
+        return self.etag if encoding == 'identity' else self.etag[:-1] + '-' + encoding + '"'
+
+class AssetCache:
+    """
+    LRU cache of file contents and their compressed variants, bounded by total bytes
+
+    Entries are revalidated against the file's mtime and size, so edits show up on the
+    next request and get recompressed once.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            asset = self.entries.get(path)
+            if asset and asset.mtime_ns == stat.st_mtime_ns and asset.size == stat.st_size:
+                self.entries.move_to_end(path)
+                return asset
+
+        with open(path, 'rb') as f:
+            compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+            asset = CachedAsset(f.read(), stat.st_mtime_ns, compressible)
+
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old:
+                self.total_bytes -= old.nbytes
+            # Files larger than the whole budget are served but not kept
+            if asset.nbytes <= self.max_bytes:
+                self.entries[path] = asset
+                self.total_bytes += asset.nbytes
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.total_bytes -= evicted.nbytes
+        return asset
+
+    def warm(self, root):
+        """Precompress the compressible assets under root at startup"""
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                    self.get(os.path.join(dirpath, name))
+
+class MasterdataEndpoint:
+    """
+    Query API over the published masterdata, with JSON responses cached per normalized query
+
+    The indexed table and the response cache are rebuilt when the CSV changes on disk.
+    """
+
+    def __init__(self, csv_path='data/masterdata.csv', max_entries=256):
+        self.csv_path = csv_path
+        self.max_entries = max_entries
+        self.table = None
+        self.mtime_ns = None
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self):
+        mtime_ns = os.stat(self.csv_path).st_mtime_ns
+        with self.lock:
+            if self.table is None or self.mtime_ns != mtime_ns:
+                self.table = MasterdataTable.from_file(self.csv_path)
+                self.mtime_ns = mtime_ns
+                self.responses.clear()
+            return self.table, self.mtime_ns
+
+    def respond(self, params):
+        table, mtime_ns = self.load()
+        key = table.normalize_query(params)
+
+        with self.lock:
+            asset = self.responses.get(key)
+            if asset:
+                self.responses.move_to_end(key)
+                return asset
+
+        asset = CachedAsset(table.query_json(key), mtime_ns, compressible=True)
+        with self.lock:
+            if self.mtime_ns == mtime_ns:
+                self.responses[key] = asset
+                while len(self.responses) > self.max_entries:
+                    self.responses.popitem(last=False)
+        return asset
+
+class SimilarCountriesEndpoint:
+    """Nearest-neighbour lookups from the precomputed artifact, reloaded when it changes"""
+
+    def __init__(self, path='data/similar_countries.json'):
+        self.path = path
+        self.index = None
+        self.mtime_ns = None
+        self.lock = threading.Lock()
+
+    def respond(self, params):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with self.lock:
+            if self.index is None or self.mtime_ns != mtime_ns:
+                self.index = SimilarCountries.from_file(self.path)
+                self.mtime_ns = mtime_ns
+            index = self.index
+
+        country = (params.get('country') or [''])[0]
+        if not country:
+            raise QueryError("country is required")
+        try:
+            k = int(params['k'][0]) if 'k' in params else None
+        except ValueError:
+            raise QueryError("k must be an integer")
+        if k is not None and k < 1:
+            raise QueryError("k must be at least 1")
+
+        neighbors = index.query(country, k)
+        if neighbors is None:
+            raise QueryError(f"Unknown country: {country}")
+        body = json.dumps({'country': index.resolve(country), 'neighbors': neighbors}, ensure_ascii=False).encode('utf-8')
+        return CachedAsset(body, mtime_ns, compressible=True)
+
+class ScoringEndpoint:
+    """What-if scores from the fitted clustering model, reloaded when it changes"""
+
+    def __init__(self, path='data/scoring_model.json', max_rows=MAX_SCORE_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.model = None
+        self.mtime_ns = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with self.lock:
+            if self.model is None or self.mtime_ns != mtime_ns:
+                self.model = ScoringModel.from_file(self.path)
+                self.mtime_ns = mtime_ns
+            return self.model, self.mtime_ns
+
+    def respond(self, params):
+        model, mtime_ns = self.load()
+        country = (params.get('country') or [''])[0]
+        if not country:
+            raise QueryError("country is required")
+        changes = {feature: values[-1] for feature, values in params.items() if feature != 'country'}
+
+        try:
+            result = model.what_if(country, changes)
+        except ValueError as e:
+            raise QueryError(str(e))
+        if result is None:
+            raise QueryError(f"Unknown country: {country}")
+        return CachedAsset(json.dumps(result, ensure_ascii=False).encode('utf-8'), mtime_ns, compressible=True)
+
+    def respond_post(self, payload):
+        model, mtime_ns = self.load()
+        rows = payload.get('rows') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise QueryError('expected {"rows": [{feature: value, ...}, ...]}')
+        if len(rows) > self.max_rows:
+            raise QueryError(f"at most {self.max_rows} rows per request")
+
+        try:
+            scores = model.score(rows) if rows else None
+        except ValueError as e:
+            raise QueryError(str(e))
+        results = scores.to_json(orient='records') if rows else '[]'
+        body = f'{{"model_id":"{model.model_id}","count":{len(rows)},"results":{results}}}'
+        return CachedAsset(body.encode('utf-8'), mtime_ns, compressible=True)
+
+class CachingRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # Keep-alive connections; every response below sends a Content-Length
+    protocol_version = 'HTTP/1.1'
+    cache = AssetCache()
+    # URL path -> endpoint with respond(params) returning a CachedAsset of JSON
+    api_routes = {}
+
+    def do_GET(self):
+        self.route(head_only=False)
+
+    def do_HEAD(self):
+        self.route(head_only=True)
+
+    def do_POST(self):
+        endpoint = self.api_routes.get(urllib.parse.urlsplit(self.path).path.rstrip('/'))
+        if not hasattr(endpoint, 'respond_post'):
+            self.send_error(404 if endpoint is None else 405)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_POST_BYTES:
+            self.close_connection = True
+            self.send_error(413, f"Body larger than {MAX_POST_BYTES} bytes")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'null')
+            asset = endpoint.respond_post(payload)
+        except ValueError as e:
+            # Malformed JSON and QueryError (a ValueError) alike
+            self.send_error(400, str(e))
+            return
+        except OSError:
+            self.send_error(404, "Data not found")
+            return
+        self.send_asset(asset, 'application/json', head_only=False)
+
+    def route(self, head_only):
+        url = urllib.parse.urlsplit(self.path)
+        endpoint = self.api_routes.get(url.path.rstrip('/'))
+        if endpoint is None:
+            return self.serve_cached(head_only)
+
+        try:
+            asset = endpoint.respond(urllib.parse.parse_qs(url.query))
+        except QueryError as e:
+            self.send_error(400, str(e))
+            return
+        except OSError:
+            self.send_error(404, "Data not found")
+            return
+        self.send_asset(asset, 'application/json', head_only)
+
+    def serve_cached(self, head_only):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            # Directory listings, index.html redirects and 404s keep the stock behaviour
+            return super().do_HEAD() if head_only else super().do_GET()
+
+        try:
+            asset = self.cache.get(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        self.send_asset(asset, self.guess_type(path), head_only)
+
+    def send_asset(self, asset, content_type, head_only):
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') not in (None, asset.etag, asset.last_modified):
+            range_header = None
+
+        encoding = 'identity' if range_header else self.choose_encoding(asset)
+        etag = asset.variant_etag(encoding)
+
+        if self.is_not_modified(asset, etag):
+            self.send_response(304)
+            self.send_validators(asset, etag)
+            self.end_headers()
+            return
+
+        body = asset.variants[encoding]
+        status = 200
+        content_range = None
+
+        if range_header:
+            byte_range = self.parse_range(range_header, len(body))
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            start, end = byte_range
+            content_range = f'bytes {start}-{end}/{len(body)}'
+            body = body[start:end + 1]
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        if content_range:
+            self.send_header('Content-Range', content_range)
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        if len(asset.variants) > 1:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_validators(asset, etag)
+        self.end_headers()
+
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_validators(self, asset, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        if IMMUTABLE_PATH.search(urllib.parse.urlsplit(self.path).path):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        else:
+            self.send_header('Cache-Control', 'no-cache')
+
+    def choose_encoding(self, asset):
+        accepted = {
+            token.split(';')[0].strip().lower()
+            for token in self.headers.get('Accept-Encoding', '').split(',')
+        }
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in asset.variants:
+                return encoding
+        return 'identity'
+
+    def is_not_modified(self, asset, etag):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or etag in tags or asset.etag in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since is not None and asset.mtime <= since.timestamp()
+        return False
+
+    @staticmethod
+    def parse_range(header, size):
+        """Single 'bytes=' range -> inclusive (start, end), or None when unsatisfiable"""
+        match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+        if not match or match.group(1) == match.group(2) == '':
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return None
+        return start, end
 
 def main():
     # Change to website directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
-    # Get port from command line or use default
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
-    
+
+    parser = argparse.ArgumentParser(description="CultureFlows development server")
+    parser.add_argument('port', nargs='?', type=int, default=8000)
+    parser.add_argument('--cache-mb', type=int, default=64, help="in-memory asset cache size")
+    args = parser.parse_args()
+
     # Create server
-    handler = http.server.SimpleHTTPRequestHandler
+    handler = CachingRequestHandler
+    handler.cache = AssetCache(max_bytes=args.cache_mb * 1024 * 1024)
     handler.extensions_map.update({
         '.js': 'application/javascript',
         '.css': 'text/css',
         '.csv': 'text/csv',
     })
-    
-    with socketserver.TCPServer(("", port), handler) as httpd:
+    handler.cache.warm(os.getcwd())
+    if MasterdataTable is not None:
+        handler.api_routes['/api/masterdata'] = MasterdataEndpoint()
+        handler.api_routes['/api/similar'] = SimilarCountriesEndpoint()
+        handler.api_routes['/api/score'] = ScoringEndpoint()
+
+    with http.server.ThreadingHTTPServer(("", args.port), handler) as httpd:
         print(f"🌍 CultureFlows development server")
-        print(f"📍 Serving at http://localhost:{port}")
+        print(f"📍 Serving at http://localhost:{args.port}")
         print(f"📁 Directory: {os.getcwd()}")
+        print(f"🗜️  Cached assets: {len(handler.cache.entries)} ({handler.cache.total_bytes / 1e6:.1f} MB)"
+              f"{'' if brotli else ' - install brotli for br encoding'}")
+        print(f"🔎 Query API: {', '.join(handler.api_routes) or 'disabled (pandas not installed)'}")
         print(f"⌨️  Press Ctrl+C to stop")
-        
+
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
@@ -37,4 +449,4 @@ def main():
             httpd.shutdown()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
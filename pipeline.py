@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Incremental data pipeline: ingest -> merge -> fix -> validate -> impute -> columnar -> cluster -> significance -> flows -> atlas -> geometry -> publish
+Usage: python3 pipeline.py [--force STAGE ...] [--dry-run] [--quiet] [--profile] [--trace-memory]
+
+Each stage declares the files it reads and writes. A stage only re-executes when the
+content of its inputs, its parameters or the source of the modules it runs changed
+since the last successful run, or when one of its outputs is missing or was modified.
+Optional stages (origin/destination flows and the world geometry, whose sources are
+downloaded separately) are skipped when one of their inputs does not exist. The atlas stage
+fetches the world atlas once; offline it writes nothing and the geometry stage is skipped.
+An optional stage that leaves an output missing is not recorded, so the next run retries it.
+
+Every run writes a JSON report of per-stage (and per-step) wall time, CPU time and memory
+to src/output/cache/run_report.json; --profile adds a cProfile dump next to it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+import artifact_manifest
+import cluster_labels
+import clustering_analysis
+import clustering_stability
+import country_matcher
+import cultural_significance
+import data_cache
+import feature_store
+import fix_masterdata
+import hofstede_imputation
+import masterdata_io
+import masterdata_schema
+import merge_datasets
+import migration_flows
+import migration_ingest
+import migration_thresholds
+import population_fetcher
+import quantile_sketch
+import scoring_model
+import similarity_index
+import trajectory_clustering
+import world_geometry
+from data_cache import file_sha256
+from profiling import PROFILER, log, set_quiet, span
+
+STATE_PATH = 'src/output/cache/pipeline_state.json'
+REPORT_PATH = 'src/output/cache/run_report.json'
+
+@dataclass
+class Stage:
+    name: str
+    run: object
+    inputs: list
+    outputs: list
+    params: dict = field(default_factory=dict)
+    modules: list = field(default_factory=list)
+    optional: bool = False
+
+    def fingerprint(self):
+        """Hash of input contents, parameters and the source of the modules the stage runs"""
+        digest = hashlib.sha256(self.name.encode())
+        for path in self.inputs:
+            digest.update(f"{path}:{file_sha256(path)}".encode())
+        digest.update(json.dumps(self.params, sort_keys=True).encode())
+        for module in self.modules:
+            digest.update(f"{module.__name__}:{file_sha256(module.__file__)}".encode())
+        return digest.hexdigest()
+
+def run_ingest(inputs, outputs):
+    migration_ingest.ingest_migration_data(inputs[0], outputs[0], cache_dir='src/output/cache')
+
+def run_merge(inputs, outputs):
+    merge_datasets.merge_datasets(inputs[0], inputs[1], outputs[0])
+
+def run_fix(inputs, outputs, base_url, concurrency, ttl_days, max_failed_share):
+    # Clean, add population and correct it in memory - masterdata is written once
+    df = pd.read_csv(inputs[0])
+    df = fix_masterdata.clean_masterdata(df)
+    df, failed = fix_masterdata.add_population_data(df, base_url, concurrency, ttl_days)
+    if len(failed) > max_failed_share * len(df):
+        # Most likely offline: failing here keeps a population-less table from being memoized
+        raise RuntimeError(f"Population lookup failed for {len(failed)} of {len(df)} countries "
+                           f"(more than {max_failed_share:.0%}); is {base_url} reachable?")
+    df = fix_masterdata.apply_population_corrections(df)
+    df.to_csv(outputs[0], index=False, quoting=0)
+
+def run_validate(inputs, outputs):
+    # Coerce and check every row against the schema; downstream stages read only valid rows
+    df, report = masterdata_schema.load_masterdata(inputs[0], cache_dir='src/output/cache')
+    df.to_csv(outputs[0], index=False, quoting=0)
+    with open(outputs[1], 'w') as f:
+        json.dump(report, f, indent=2)
+    log(f"Validated masterdata: {len(df)} rows kept, {len(report['rejected'])} rejected")
+    for reject in report['rejected']:
+        log(f"  ✗ {reject['country']}: {'; '.join(reject['reasons'])}")
+
+def run_impute(inputs, outputs, method, n_neighbors, random_state):
+    hofstede_imputation.impute_masterdata(inputs[0], outputs[0], outputs[1], method=method, n_neighbors=n_neighbors,
+                                          random_state=random_state, cache_dir='src/output/cache')
+
+def run_columnar(inputs, outputs):
+    masterdata_io.write_masterdata_artifacts(inputs[0])
+
+def run_cluster(inputs, outputs, n_clusters, n_init, random_state, stability_resamples):
+    clustering_analysis.create_country_clustering(
+        n_clusters=n_clusters, n_init=n_init, random_state=random_state,
+        input_path=inputs[0], output_dir=os.path.dirname(outputs[0]),
+        stability_resamples=stability_resamples
+    )
+
+def run_significance(inputs, outputs, n_permutations, random_state):
+    cultural_significance.analyze_significance(inputs[0], inputs[1], outputs[0], n_permutations=n_permutations,
+                                               random_state=random_state, cache_dir='src/output/cache')
+
+def run_flows(inputs, outputs):
+    migration_flows.build_migration_flows(inputs[0], inputs[1], inputs[2], os.path.dirname(outputs[0]),
+                                          cache_dir='src/output/cache')
+
+def run_atlas(inputs, outputs, url):
+    if os.path.exists(outputs[0]):
+        return
+    try:
+        world_geometry.download_atlas(outputs[0], url)
+    except OSError as e:
+        # URLError is an OSError: offline runs go on without the pre-projected maps
+        log(f"Could not fetch the world atlas from {url} ({e}); the maps keep using the CDN atlas")
+
+def run_geometry(inputs, outputs, zoom_levels):
+    world_geometry.build_geometry_bundle(inputs[0], inputs[1], inputs[2], outputs[0], zoom_levels=zoom_levels)
+
+def run_publish(inputs, outputs):
+    # Copy the artifacts the dashboard reads into data/
+    for src, dst in zip(inputs, outputs):
+        if os.path.basename(src) == artifact_manifest.MANIFEST_NAME:
+            # Hashed artifacts are republished so data/ keeps deltas against what it served before
+            artifact_manifest.publish_artifacts(os.path.dirname(src), os.path.dirname(dst))
+        else:
+            shutil.copyfile(src, dst)
+
+def build_stages():
+    return [
+        Stage(
+            name='ingest',
+            run=run_ingest,
+            inputs=['src/raw_data/undesa_pd_2024_ims_stock_by_sex_and_destination.xlsx'],
+            outputs=['src/output/migration_data_processed.csv'],
+            modules=[migration_ingest, masterdata_schema],
+        ),
+        Stage(
+            name='merge',
+            run=run_merge,
+            inputs=['src/output/migration_data_processed.csv', 'src/raw_data/hofstede_country_scores.csv'],
+            outputs=['src/output/cache/masterdata_merged.csv'],
+            modules=[merge_datasets, country_matcher],
+        ),
+        Stage(
+            name='fix',
+            run=run_fix,
+            inputs=['src/output/cache/masterdata_merged.csv', 'src/raw_data/population_sources.json'],
+            outputs=['src/output/cache/masterdata_fixed.csv'],
+            params={'base_url': population_fetcher.REST_COUNTRIES_URL, 'concurrency': 8, 'ttl_days': 30,
+                    'max_failed_share': 0.2},
+            modules=[fix_masterdata, country_matcher, population_fetcher, masterdata_schema],
+        ),
+        Stage(
+            name='validate',
+            run=run_validate,
+            inputs=['src/output/cache/masterdata_fixed.csv'],
+            outputs=['src/output/cache/masterdata_validated.csv', 'src/output/masterdata_rejects.json'],
+            modules=[masterdata_schema, data_cache],
+        ),
+        Stage(
+            name='impute',
+            run=run_impute,
+            inputs=['src/output/cache/masterdata_validated.csv'],
+            outputs=['src/output/masterdata.csv', 'src/output/imputation_report.json'],
+            params={'method': 'iterative', 'n_neighbors': 5, 'random_state': 42},
+            modules=[hofstede_imputation, masterdata_schema, data_cache],
+        ),
+        Stage(
+            name='columnar',
+            run=run_columnar,
+            inputs=['src/output/masterdata.csv'],
+            outputs=['src/output/masterdata.parquet', 'src/output/masterdata.bin'],
+            modules=[masterdata_io, masterdata_schema],
+        ),
+        Stage(
+            name='cluster',
+            run=run_cluster,
+            inputs=['src/output/masterdata.csv'],
+            outputs=['src/output/clustering_results.json', 'src/output/country_clusters.csv',
+                     'src/output/similar_countries.json', 'src/output/migration_sketches.json',
+                     'src/output/scoring_model.json'],
+            params={'n_clusters': 8, 'n_init': 10, 'random_state': 42, 'stability_resamples': 200},
+            modules=[clustering_analysis, clustering_stability, similarity_index, trajectory_clustering,
+                     cluster_labels, migration_thresholds, quantile_sketch, feature_store, masterdata_io,
+                     masterdata_schema, artifact_manifest, scoring_model],
+        ),
+        Stage(
+            name='significance',
+            run=run_significance,
+            inputs=['src/output/masterdata.csv', 'src/output/country_clusters.csv'],
+            outputs=['src/output/cultural_significance.json'],
+            params={'n_permutations': 10000, 'random_state': 42},
+            modules=[cultural_significance, feature_store, masterdata_schema, data_cache],
+        ),
+        Stage(
+            name='flows',
+            run=run_flows,
+            inputs=['src/raw_data/undesa_pd_2024_ims_stock_by_sex_destination_and_origin.xlsx',
+                    'src/output/masterdata.csv', 'src/output/country_clusters.csv'],
+            outputs=['src/output/migration_flows.npz', 'src/output/migration_flows_summary.json'],
+            modules=[migration_flows, migration_ingest, masterdata_schema, merge_datasets, country_matcher,
+                     artifact_manifest],
+            optional=True,
+        ),
+        Stage(
+            name='atlas',
+            run=run_atlas,
+            inputs=[],
+            outputs=['src/raw_data/countries-110m.json'],
+            params={'url': world_geometry.WORLD_ATLAS_URL},
+            modules=[world_geometry],
+            optional=True,
+        ),
+        Stage(
+            name='geometry',
+            run=run_geometry,
+            inputs=['src/raw_data/countries-110m.json', 'src/output/masterdata.csv',
+                    'src/output/clustering_results.json'],
+            outputs=['src/output/world_geometry.json'],
+            params={'zoom_levels': world_geometry.ZOOM_LEVELS},
+            modules=[world_geometry, country_matcher, cluster_labels, artifact_manifest],
+            optional=True,
+        ),
+        Stage(
+            name='publish',
+            run=run_publish,
+            inputs=['src/output/masterdata.csv', 'src/output/masterdata.bin',
+                    'src/output/clustering_results.json', 'src/output/similar_countries.json',
+                    'src/output/scoring_model.json', 'src/output/manifest.json'],
+            outputs=['data/masterdata.csv', 'data/masterdata.bin', 'data/clustering_results.json',
+                     'data/similar_countries.json', 'data/scoring_model.json', 'data/manifest.json'],
+            modules=[artifact_manifest],
+        ),
+    ]
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+def is_up_to_date(stage, fingerprint, state):
+    """A stage is current when its fingerprint matches and its outputs are untouched"""
+    previous = state.get(stage.name)
+    if not previous or previous['fingerprint'] != fingerprint:
+        return False
+    return all(
+        os.path.exists(path) and file_sha256(path) == previous['outputs'].get(path)
+        for path in stage.outputs
+    )
+
+def run_pipeline(force=(), dry_run=False):
+    """
+    Run every stage whose fingerprint changed, returning the names of the stages executed
+    """
+    stages = build_stages()
+    unknown = set(force) - {stage.name for stage in stages}
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    state = load_state()
+    executed = []
+
+    for stage in stages:
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            if stage.optional:
+                print(f"- {stage.name}: skipped (missing {', '.join(missing)})")
+                continue
+            if dry_run:
+                print(f"▶ {stage.name}: would run (inputs not built yet)")
+                executed.append(stage.name)
+                continue
+            raise FileNotFoundError(f"Stage '{stage.name}' is missing inputs: {', '.join(missing)}")
+
+        fingerprint = stage.fingerprint()
+        if stage.name not in force and is_up_to_date(stage, fingerprint, state):
+            print(f"✓ {stage.name}: up to date")
+            continue
+
+        if dry_run:
+            print(f"▶ {stage.name}: would run")
+            executed.append(stage.name)
+            continue
+
+        print(f"\n{'=' * 50}\n=== Running stage: {stage.name} ===")
+        for path in stage.outputs:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with span(stage.name):
+            stage.run(stage.inputs, stage.outputs, **stage.params)
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing and stage.optional:
+            print(f"- {stage.name}: produced no {', '.join(missing)}; will retry next run")
+            continue
+
+        state[stage.name] = {
+            'fingerprint': fingerprint,
+            'outputs': {path: file_sha256(path) for path in stage.outputs},
+        }
+        save_state(state)
+        executed.append(stage.name)
+
+    print(f"\nPipeline finished: {len(executed)} stage(s) {'to run' if dry_run else 'executed'}"
+          f"{': ' + ', '.join(executed) if executed else ''}")
+    return executed
+
+if __name__ == "__main__":
+    # Paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Run the CultureFlows data pipeline incrementally")
+    parser.add_argument('--force', nargs='*', default=[], metavar='STAGE',
+                        help="re-run these stages even if their inputs did not change")
+    parser.add_argument('--dry-run', action='store_true', help="only report which stages would run")
+    parser.add_argument('--quiet', action='store_true', help="suppress per-country and debug output")
+    parser.add_argument('--profile', action='store_true', help="also write a cProfile dump next to the report")
+    parser.add_argument('--trace-memory', action='store_true', help="record peak Python heap per span (slower)")
+    parser.add_argument('--report', default=REPORT_PATH, help="JSON run report path")
+    args = parser.parse_args()
+
+    set_quiet(args.quiet)
+    PROFILER.start(trace_memory=args.trace_memory, cprofile=args.profile)
+    executed = run_pipeline(force=args.force, dry_run=args.dry_run)
+
+    if executed and not args.dry_run:
+        PROFILER.write_report(args.report)
+        print(f"\n{PROFILER.summary()}")
+        print(f"Run report: {args.report}")
@@ -0,0 +1,120 @@
+"""
+Content-hashed JSON artifacts with a manifest and JSON-patch deltas
+
+Each artifact version is written once as compact JSON to artifacts/<name>.<hash>.json.
+Those files never change, so they can be cached indefinitely. manifest.json lists the
+current hash of every artifact and is the only file clients revalidate. When a new version
+differs from the previous one by a small patch (relabelled or recoloured clusters, for
+example), an RFC 6902 JSON patch from the previous hash is written as well. A client that
+holds the previous version then fetches only the patch.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+ARTIFACT_DIR = 'artifacts'
+MANIFEST_VERSION = 1
+# A delta is published only when it is smaller than this fraction of the full artifact
+DELTA_MAX_RATIO = 0.5
+
+def canonical_json(payload):
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+def json_patch(old, new, path=''):
+    """
+    RFC 6902 operations turning old into new: objects are diffed by key and equal-length
+    arrays by index; anything else that differs is replaced whole
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{'op': 'remove', 'path': f"{path}/{_escape(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                ops.extend(json_patch(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(json_patch(a, b, f"{path}/{i}"))
+        return ops
+    # bool is an int subclass: compare types too so True never "equals" 1
+    if type(old) is type(new) and old == new:
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'artifacts': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_bytes(path, data):
+    # Temporary name plus rename, so readers never see a partial file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def _update_entry(output_dir, name, payload, previous):
+    """Write one artifact version (and its delta) and return its manifest entry"""
+    data = canonical_json(payload)
+    digest = content_hash(data)
+    if previous and previous['hash'] == digest:
+        return previous
+
+    entry = {'hash': digest, 'path': f"{ARTIFACT_DIR}/{name}.{digest}.json", 'bytes': len(data)}
+    _write_bytes(os.path.join(output_dir, entry['path']), data)
+
+    previous_path = previous and os.path.join(output_dir, previous['path'])
+    if previous_path and os.path.exists(previous_path):
+        with open(previous_path, 'rb') as f:
+            patch = canonical_json(json_patch(json.loads(f.read()), json.loads(data)))
+        if len(patch) <= DELTA_MAX_RATIO * len(data):
+            delta_path = f"{ARTIFACT_DIR}/{name}.{previous['hash']}-{digest}.patch.json"
+            _write_bytes(os.path.join(output_dir, delta_path), patch)
+            entry['delta'] = {'from': previous['hash'], 'path': delta_path, 'bytes': len(patch)}
+
+    # Keep the previous version for clients that read the old manifest a moment ago
+    keep = {entry['path'], entry.get('delta', {}).get('path'), previous and previous['path']}
+    for filename in os.listdir(os.path.join(output_dir, ARTIFACT_DIR)):
+        relative = f"{ARTIFACT_DIR}/{filename}"
+        if filename.startswith(f"{name}.") and relative not in keep:
+            os.remove(os.path.join(output_dir, relative))
+    return entry
+
+def write_artifacts(output_dir, payloads):
+    """
+    Publish {name: payload} into output_dir, returning the manifest; unchanged payloads
+    are not rewritten
+    """
+    os.makedirs(os.path.join(output_dir, ARTIFACT_DIR), exist_ok=True)
+    manifest = load_manifest(output_dir)
+    for name, payload in payloads.items():
+        manifest['artifacts'][name] = _update_entry(output_dir, name, payload, manifest['artifacts'].get(name))
+    # Manifest last: it only ever points at files that are already complete
+    _write_bytes(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+def read_artifact(output_dir, name):
+    """Current payload of an artifact listed in output_dir's manifest"""
+    entry = load_manifest(output_dir)['artifacts'][name]
+    with open(os.path.join(output_dir, entry['path'])) as f:
+        return json.load(f)
+
+def publish_artifacts(source_dir, target_dir):
+    """
+    Copy the current artifacts of source_dir into target_dir's own manifest, so target_dir
+    gets deltas against the version it served before
+    """
+    names = load_manifest(source_dir)['artifacts']
+    return write_artifacts(target_dir, {name: read_artifact(source_dir, name) for name in names})
@@ -0,0 +1,161 @@
+"""
+Rule-table labelling of cultural profiles and migration levels
+
+All labellers take arrays (one entry per cluster, country or sweep configuration) and
+classify them in a single vectorized pass, so the same tables label 8 cluster means or a
+million rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+CULTURAL_DIMENSIONS = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr']
+
+# Immigration ratio per 1000 people: floor of 1, then the 25th/50th/75th percentiles of a past
+# analysis - clustering replaces the percentiles with current ones (see migration_thresholds)
+MIGRATION_BINS = [1, 6, 21, 63]
+MIGRATION_LEVELS = ['Very Low', 'Low', 'Moderate', 'High', 'Very High']
+
+# Named boolean conditions the profile rules combine: name -> (column, comparison, threshold)
+PROFILE_FLAGS = {
+    'high_pdi': ('pdi', np.greater, 55),
+    'low_pdi': ('pdi', np.less_equal, 55),
+    'low_idv': ('idv', np.less, 40),
+    'high_idv': ('idv', np.greater, 60),
+    'low_mas': ('mas', np.less, 45),
+    'high_mas': ('mas', np.greater_equal, 45),
+    'high_ivr': ('ivr', np.greater, 55),
+    'low_ivr': ('ivr', np.less, 45),
+    'migration_over_10': ('migration_ratio', np.greater, 10),
+    'migration_over_15': ('migration_ratio', np.greater, 15),
+    'migration_under_50': ('migration_ratio', np.less, 50),
+    'migration_50_plus': ('migration_ratio', np.greater_equal, 50),
+    'migration_over_70': ('migration_ratio', np.greater, 70),
+}
+
+# First matching rule wins; a rule matches when all of its flags hold
+PROFILE_RULES = [
+    (('low_idv', 'high_ivr', 'migration_over_15'), "Family-First Countries",
+     "Places where family and community come first, but people enjoy life's pleasures"),
+    (('low_idv', 'high_ivr'), "Social Living Countries",
+     "Traditional societies where everyone knows each other and celebrates together"),
+    (('high_idv', 'high_mas', 'migration_under_50'), "Competitive Nations",
+     "Independent countries focused on success, achievement and getting ahead"),
+    (('high_idv', 'high_mas', 'migration_50_plus'), "Business-Minded Countries",
+     "Global business hubs where people pursue entrepreneurship and success"),
+    (('high_pdi', 'low_idv', 'low_ivr', 'migration_over_70'), "Structured Societies",
+     "Well-organized countries with clear rules and strong leadership"),
+    (('high_pdi', 'low_idv', 'low_ivr', 'migration_over_10'), "Respectful Communities",
+     "Places where people respect authority and work together as groups"),
+    (('high_pdi', 'low_idv', 'low_ivr'), "Traditional Mindset",
+     "Countries with deep traditions and established ways of doing things"),
+    (('low_pdi', 'high_idv', 'low_mas'), "Quality-of-Life Nations",
+     "Equal societies where people value work-life balance and helping others"),
+    (('low_pdi', 'high_idv'), "Progressive Countries",
+     "Fair countries where people pursue personal goals while caring for others"),
+    (('high_idv',), "Independent Nations",
+     "Countries where people value personal freedom and self-reliance"),
+    (('low_idv',), "Team Players",
+     "Countries where people work together and support each other"),
+]
+DEFAULT_PROFILE = ("Mixed Cultures", "Countries with balanced cultural characteristics")
+
+# Hofstede dimension bands: Low up to 40, Medium up to 60, High above
+DIMENSION_BANDS = [40, 60]
+DIMENSION_LEVELS = ['Low', 'Medium', 'High']
+
+# dimension -> (profile key, display name, heading, low / moderate / high characteristic)
+DIMENSION_TABLE = {
+    'pdi': ('power_distance', 'Power Distance', 'Hierarchy', (
+        "Egalitarian society - flat social structure",
+        "Moderate hierarchy",
+        "Hierarchical society - clear social ranks and authority")),
+    'idv': ('individualism', 'Individualism', 'Social structure', (
+        "Collectivistic - group loyalty, family/community first",
+        "Balanced individual/group focus",
+        "Individualistic - personal achievement, self-reliance")),
+    'mas': ('masculinity', 'Masculinity', 'Achievement style', (
+        "Relationship-oriented - cooperation, quality of life, caring",
+        "Balanced achievement/relationship focus",
+        "Achievement-oriented - competition, success, assertiveness")),
+    'uai': ('uncertainty_avoidance', 'Uncertainty Avoidance', 'Risk tolerance', (
+        "Risk-tolerant - comfortable with ambiguity, flexible",
+        "Moderate risk tolerance",
+        "Rule-following - prefer structure, predictability, formal systems")),
+    'lto': ('long_term_orientation', 'Long-term Orientation', 'Time perspective', (
+        "Tradition-focused - respect for customs, immediate results",
+        "Balanced time perspective",
+        "Future-focused - planning, adaptation, perseverance")),
+    'ivr': ('indulgence', 'Indulgence', 'Lifestyle', (
+        "Restrained - controlled desires, social norms, duty",
+        "Moderate expression",
+        "Expressive - free expression, optimism, enjoying life")),
+}
+
+def _column(values, name):
+    return np.asarray(values[name], dtype=float)
+
+def migration_levels(migration_ratio, bins=MIGRATION_BINS):
+    """Migration level label for every ratio (missing ratios are 'Very Low')"""
+    ratio = np.asarray(migration_ratio, dtype=float)
+    codes = np.digitize(np.nan_to_num(ratio, nan=-np.inf), bins, right=True)
+    return np.array(MIGRATION_LEVELS, dtype=object)[codes]
+
+def profile_labels(cultural, migration_ratio):
+    """
+    Profile name and description arrays from cultural scores ({dimension: array} or DataFrame)
+    """
+    values = {dim: _column(cultural, dim) for dim in CULTURAL_DIMENSIONS}
+    values['migration_ratio'] = np.asarray(migration_ratio, dtype=float)
+
+    flags = {name: compare(values[col], threshold) for name, (col, compare, threshold) in PROFILE_FLAGS.items()}
+    conditions = [np.logical_and.reduce([flags[f] for f in rule_flags]) for rule_flags, _, _ in PROFILE_RULES]
+    rule_index = np.select(conditions, np.arange(len(PROFILE_RULES)), default=len(PROFILE_RULES))
+
+    names = np.array([name for _, name, _ in PROFILE_RULES] + [DEFAULT_PROFILE[0]], dtype=object)
+    descriptions = np.array([desc for _, _, desc in PROFILE_RULES] + [DEFAULT_PROFILE[1]], dtype=object)
+    return names[rule_index], descriptions[rule_index]
+
+def dimension_levels(cultural):
+    """Low/Medium/High per dimension, one column per dimension present in cultural"""
+    return pd.DataFrame({
+        dim: np.array(DIMENSION_LEVELS, dtype=object)[np.digitize(_column(cultural, dim), DIMENSION_BANDS, right=True)]
+        for dim in CULTURAL_DIMENSIONS if dim in cultural
+    })
+
+def dimension_characteristics(cultural):
+    """Low/moderate/high characteristic text per dimension (strictly below 40 / above 60)"""
+    low, high = DIMENSION_BANDS
+    result = {}
+    for dim in CULTURAL_DIMENSIONS:
+        if dim not in cultural:
+            continue
+        values = _column(cultural, dim)
+        band = np.select([values > high, values < low], [2, 0], default=1)
+        result[dim] = np.array(DIMENSION_TABLE[dim][3], dtype=object)[band]
+    return pd.DataFrame(result)
+
+def label_countries(df, ratio_column='immigration_ratio_2024', migration_bins=MIGRATION_BINS):
+    """Profile name, description and migration level for every row of df"""
+    names, descriptions = profile_labels(df, df[ratio_column])
+    return pd.DataFrame({
+        'profile': names,
+        'description': descriptions,
+        'migration_level': migration_levels(df[ratio_column], migration_bins),
+    }, index=df.index)
+
+def summarize_clusters(df, n_clusters, cluster_column='cluster', ratio_column='immigration_ratio_2024',
+                       migration_bins=MIGRATION_BINS):
+    """
+    Per-cluster means, members and labels from a single groupby, indexed 0..n_clusters-1
+    """
+    grouped = df.groupby(cluster_column, sort=True)
+    summary = grouped[CULTURAL_DIMENSIONS + [ratio_column]].mean().astype(float)
+    summary['countries'] = grouped['country'].agg(list)
+    summary = summary.reindex(range(n_clusters))
+    summary['countries'] = summary['countries'].apply(lambda c: c if isinstance(c, list) else [])
+    summary['size'] = summary['countries'].str.len()
+
+    summary['name'], summary['description'] = profile_labels(summary, summary[ratio_column])
+    summary['migration_level'] = migration_levels(summary[ratio_column], migration_bins)
+    return summary
@@ -1,248 +1,312 @@
-import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import json
+import os
 import warnings
+from masterdata_io import fresh_parquet_path, read_masterdata
+from masterdata_schema import IMPUTATION_FLAGS, load_masterdata, rejects_report, validate_masterdata
+from clustering_stability import run_stability_analysis, stability_summary
+from trajectory_clustering import run_trajectory_clustering, trajectory_frame
+from similarity_index import write_similar_countries
+from feature_store import materialize
+from artifact_manifest import write_artifacts
+from scoring_model import build_scoring_model, save_scoring_model
+from profiling import log, span
+from cluster_labels import DIMENSION_TABLE, migration_levels, profile_labels, summarize_clusters
+from migration_thresholds import build_sketches, migration_bins, save_sketches, threshold_table, with_appended
 warnings.filterwarnings('ignore')
 
-def create_country_clustering():
-    """
-    Create country clustering based on cultural dimensions and migration patterns
+CULTURAL_FEATURES = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr']
+MIGRATION_FEATURES = ['immigration_ratio_2020', 'immigration_ratio_2024']
+# Ratios per 1000 people are clamped to this range before the log transform
+MIGRATION_RATIO_RANGE = (0.001, 1000)
+# Okabe and Ito color palette - colorblind friendly (with custom replacement for yellow)
+CLUSTER_COLORS = ['#000000', '#009E73', '#0072B2', '#56B4E9', '#C26A77', '#E69F00', '#D55E00', '#CC79A7']
+
+def prepare_clustering_data(df, validated=False):
     """
-    # Load the data
-    df = pd.read_csv('output/masterdata.csv')
-    
-    # Prepare features for clustering
-    # Cultural dimensions
-    cultural_features = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr']
+    Filter countries usable for clustering and add immigration ratios per 1000 people
     
-    # Clean data - remove rows with missing values in cultural and base migration data
-    required_cols = cultural_features + ['2020', '2024', 'population']
-    df_clean = df.dropna(subset=required_cols)
-    
-    # Calculate immigration ratios per population (per 1000 people)
-    df_clean = df_clean.copy()
-    
-    # Ensure no zero population values
-    df_clean = df_clean[df_clean['population'] > 0]
+    Frames from masterdata_schema already have positive populations and finite counts, so
+    with validated=True only rows missing the optional lto/ivr scores are dropped.
+    """
+    if validated:
+        df_clean = df.dropna(subset=CULTURAL_FEATURES).copy()
+    else:
+        # Clean data - remove rows with missing values in cultural and base migration data
+        required_cols = CULTURAL_FEATURES + ['2020', '2024', 'population']
+        df_clean = df.dropna(subset=required_cols)
+        
+        # Calculate immigration ratios per population (per 1000 people)
+        df_clean = df_clean.copy()
+        
+        # Ensure no zero population values
+        df_clean = df_clean[df_clean['population'] > 0]
     
     df_clean['immigration_ratio_2020'] = (df_clean['2020'] / df_clean['population']) * 1000
     df_clean['immigration_ratio_2024'] = (df_clean['2024'] / df_clean['population']) * 1000
     
+    if validated:
+        return df_clean
+    
     # Check for any problematic values
     inf_mask = np.isinf(df_clean['immigration_ratio_2020']) | np.isinf(df_clean['immigration_ratio_2024'])
     if inf_mask.any():
-        print(f"Warning: Found {inf_mask.sum()} countries with infinite immigration ratios")
-        print("Countries with issues:")
+        log(f"Warning: Found {inf_mask.sum()} countries with infinite immigration ratios")
+        log("Countries with issues:")
         problematic = df_clean[inf_mask][['country', '2020', '2024', 'population']]
-        print(problematic)
+        log(problematic)
         # Remove problematic rows
         df_clean = df_clean[~inf_mask]
     
+    return df_clean
+
+def build_feature_matrix(df_clean):
+    """
+    Build the cultural + log-scaled migration feature matrix used for clustering
+    """
     # Migration features - use immigration ratios instead of absolute numbers
-    migration_features = ['immigration_ratio_2020', 'immigration_ratio_2024']
+    migration_features = MIGRATION_FEATURES
     
     # Create feature matrix
-    features = cultural_features + migration_features
+    features = CULTURAL_FEATURES + migration_features
     
     # Prepare feature matrix
     X = df_clean[features].copy()
     
     # Handle potential issues with migration ratios
-    print("Debugging migration ratios:")
+    log("Debugging migration ratios:")
     for col in migration_features:
-        print(f"{col}: min={X[col].min():.6f}, max={X[col].max():.6f}, mean={X[col].mean():.6f}")
+        log(f"{col}: min={X[col].min():.6f}, max={X[col].max():.6f}, mean={X[col].mean():.6f}")
         
     # Clean any infinite or very large values
     for col in migration_features:
         # Replace any negative values or zeros with small positive value
-        X[col] = np.maximum(X[col], 0.001)
+        X[col] = np.maximum(X[col], MIGRATION_RATIO_RANGE[0])
         # Cap extremely large values
-        X[col] = np.minimum(X[col], 1000)  # Cap at 1000 per 1000 (100%)
+        X[col] = np.minimum(X[col], MIGRATION_RATIO_RANGE[1])  # Cap at 1000 per 1000 (100%)
     
-    print("After cleaning:")
+    log("After cleaning:")
     for col in migration_features:
-        print(f"{col}: min={X[col].min():.6f}, max={X[col].max():.6f}, mean={X[col].mean():.6f}")
+        log(f"{col}: min={X[col].min():.6f}, max={X[col].max():.6f}, mean={X[col].mean():.6f}")
         
     # Apply log transformation to reduce skewness
     for col in migration_features:
         X[col] = np.log1p(X[col])
     
-    # Standardize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    return X
+
+def load_scaled_features(path='output/masterdata.csv'):
+    """
+    Load validated masterdata once and return the cleaned frame, standardized matrix and fitted scaler
+    """
+    with span('load'):
+        typed_path = fresh_parquet_path(path)
+        if typed_path:
+            # The typed Parquet copy from the columnar stage: no CSV parsing or type coercion
+            raw = read_masterdata(path)
+            df, rejects = validate_masterdata(raw)
+            report = rejects_report(rejects, typed_path, len(raw))
+        else:
+            # Validated once per file content; rejected rows are listed in the cached report
+            df, report = load_masterdata(path, cache_dir=os.path.join(os.path.dirname(path) or '.', 'cache'))
+        if report['rejected']:
+            log(f"Skipping {len(report['rejected'])} rows rejected by the masterdata schema: "
+                f"{', '.join(str(r['country']) for r in report['rejected'][:5])}")
+    with span('clean'):
+        df_clean = prepare_clustering_data(df, validated=True)
+        flags = [flag for flag in IMPUTATION_FLAGS.values() if flag in df_clean]
+        if flags and df_clean[flags].to_numpy().any():
+            log(f"Clustering {df_clean[flags].to_numpy().any(axis=1).sum()} countries with imputed lto/ivr scores")
+    with span('scale'):
+        X = build_feature_matrix(df_clean)
+        
+        # Standardize features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+    
+    return df_clean, X_scaled, scaler
+
+def describe_clusters(df_clean, n_clusters, bins):
+    """
+    Name, colour, members and mean profile of every cluster, keyed by cluster number
+    """
+    # One groupby for all cluster means, then rule-table labels for every cluster at once
+    summary = summarize_clusters(df_clean, n_clusters, ratio_column='immigration_ratio_2024', migration_bins=bins)
+    return {
+        i: {
+            'name': row['name'],
+            'description': row['description'],
+            'color': CLUSTER_COLORS[i % len(CLUSTER_COLORS)],
+            'countries': row['countries'],
+            'size': int(row['size']),
+            'cultural_profile': {
+                DIMENSION_TABLE[dim][0]: float(row[dim]) for dim in CULTURAL_FEATURES
+            },
+            'migration_level': row['migration_level'],
+            'immigration_ratio_per_1000': float(row['immigration_ratio_2024'])
+        }
+        for i, row in summary.iterrows()
+    }
+
+def results_document(df_clean, cluster_stats, pca, sketches):
+    """
+    clustering_results.json content for df_clean's 'cluster', 'pca_x' and 'pca_y' columns
+    """
+    return {
+        'clusters': cluster_stats,
+        'countries': df_clean[['country', 'cluster', 'pca_x', 'pca_y']].to_dict('records'),
+        'pca_explained_variance': pca.explained_variance_ratio_.tolist(),
+        'feature_importance': {
+            'cultural_weight': 0.6,
+            'migration_weight': 0.4
+        },
+        'migration_thresholds': threshold_table(sketches)
+    }
+
+def create_country_clustering(n_clusters=8, n_init=10, random_state=42,
+                              input_path='output/masterdata.csv', output_dir='output',
+                              stability_resamples=0, stability_method='subsample',
+                              stability_fraction=0.8, max_workers=None, trajectory_method=None):
+    """
+    Create country clustering based on cultural dimensions and migration patterns
+    
+    With stability_resamples > 0, also scores how stable the clusters are under resampling.
+    With trajectory_method ('basis' or 'dtw'), also clusters the 1990-2024 migration trajectories.
+    """
+    # Load the data and prepare standardized features
+    df_clean, X_scaled, scaler = load_scaled_features(input_path)
+    if len(df_clean) < n_clusters:
+        raise ValueError(f"{input_path} has {len(df_clean)} usable rows, fewer than {n_clusters} clusters "
+                         f"(check the rows rejected by the masterdata schema)")
     
     # Apply K-means clustering
-    n_clusters = 8  # Increased to better capture migration level diversity
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X_scaled)
+    # 8 clusters by default to better capture migration level diversity
+    with span('fit'):
+        kmeans = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init)
+        clusters = kmeans.fit_predict(X_scaled)
     
     # Add cluster labels to dataframe
     df_clean = df_clean.copy()
     df_clean['cluster'] = clusters
     
     # Apply PCA for 2D visualization
-    pca = PCA(n_components=2, random_state=42)
-    X_pca = pca.fit_transform(X_scaled)
+    with span('pca'):
+        pca = PCA(n_components=2, random_state=42)
+        X_pca = pca.fit_transform(X_scaled)
     
     df_clean['pca_x'] = X_pca[:, 0]
     df_clean['pca_y'] = X_pca[:, 1]
     
-    # Create cluster analysis
-    cluster_stats = {}
-    # Okabe and Ito color palette - colorblind friendly (with custom replacement for yellow)
-    cluster_colors = ['#000000', '#009E73', '#0072B2', '#56B4E9', '#C26A77', '#E69F00', '#D55E00', '#CC79A7']
+    with span('thresholds'):
+        # Migration level cut points from quantile sketches of the current ratios, plus any rows
+        # appended with migration_thresholds.py --append
+        sketches = with_appended(build_sketches(df_clean), df_clean,
+                                 os.path.join(output_dir, 'migration_appended.csv'))
+        bins_2024 = migration_bins(sketches['2024'])
+    
+    with span('profile'):
+        cluster_stats = describe_clusters(df_clean, n_clusters, bins_2024)
+    
+    # Stability of the reference fit under bootstrap/subsample refits
+    stability = None
+    if stability_resamples > 0:
+        with span('stability'):
+            # Workers map one shared float32 copy of the matrix instead of unpickling their own
+            features = materialize(X_scaled, df_clean['country'], os.path.join(output_dir, 'cache', 'features'),
+                                   columns=CULTURAL_FEATURES + MIGRATION_FEATURES)
+            log(f"Running {stability_resamples} {stability_method} refits for cluster stability...")
+            stability = stability_summary(
+                run_stability_analysis(
+                    features, clusters, n_clusters, n_resamples=stability_resamples, method=stability_method,
+                    sample_fraction=stability_fraction, n_init=n_init, random_state=random_state,
+                    max_workers=max_workers
+                ),
+                df_clean['country'].tolist()
+            )
+            for i in cluster_stats:
+                cluster_stats[i]['jaccard_stability'] = stability['cluster_jaccard'][i]
     
-    for i in range(n_clusters):
-        cluster_data = df_clean[df_clean['cluster'] == i]
+    # Prepare output data
+    clustering_results = results_document(df_clean, cluster_stats, pca, sketches)
+    if stability:
+        clustering_results['stability'] = stability
+    
+    # Clusters over all survey years, plus per-year assignments
+    if trajectory_method:
+        with span('trajectory'):
+            trajectory = run_trajectory_clustering(
+                df_clean, CULTURAL_FEATURES, n_clusters=n_clusters, method=trajectory_method,
+                random_state=random_state, n_init=n_init
+            )
+            clustering_results['trajectory'] = trajectory
+            trajectory_frame(trajectory).to_csv(os.path.join(output_dir, 'trajectory_clusters.csv'), index=False)
+    
+    with span('write'):
+        # Save results (compact; the dashboard reads the hashed copy listed in manifest.json)
+        with open(os.path.join(output_dir, 'clustering_results.json'), 'w') as f:
+            json.dump(clustering_results, f, separators=(',', ':'))
         
-        # Calculate cluster characteristics
-        cultural_means = cluster_data[cultural_features].mean()
-        migration_ratio_mean = cluster_data['immigration_ratio_2024'].mean()
+        # Save enhanced masterdata with clusters and immigration ratios
+        output_cols = ['country', 'cluster', 'pca_x', 'pca_y', 'immigration_ratio_2020', 'immigration_ratio_2024']
+        df_clean[output_cols].to_csv(os.path.join(output_dir, 'country_clusters.csv'), index=False)
         
-        # Determine cluster profile
-        profile = determine_cluster_profile(cultural_means, migration_ratio_mean)
+        # Persist the sketches so later batches can be merged in without rescanning
+        save_sketches(sketches, os.path.join(output_dir, 'migration_sketches.json'))
         
-        cluster_stats[i] = {
-            'name': profile['name'],
-            'description': profile['description'],
-            'color': cluster_colors[i],
-            'countries': cluster_data['country'].tolist(),
-            'size': len(cluster_data),
-            'cultural_profile': {
-                'power_distance': float(cultural_means['pdi']),
-                'individualism': float(cultural_means['idv']),
-                'masculinity': float(cultural_means['mas']),
-                'uncertainty_avoidance': float(cultural_means['uai']),
-                'long_term_orientation': float(cultural_means['lto']),
-                'indulgence': float(cultural_means['ivr'])
-            },
-            'migration_level': migration_classification(migration_ratio_mean),
-            'immigration_ratio_per_1000': float(migration_ratio_mean)
-        }
-    
-    # Prepare output data
-    clustering_results = {
-        'clusters': cluster_stats,
-        'countries': df_clean[['country', 'cluster', 'pca_x', 'pca_y']].to_dict('records'),
-        'pca_explained_variance': pca.explained_variance_ratio_.tolist(),
-        'feature_importance': {
-            'cultural_weight': 0.6,
-            'migration_weight': 0.4
-        }
-    }
-    
-    # Save results
-    with open('output/clustering_results.json', 'w') as f:
-        json.dump(clustering_results, f, indent=2)
-    
-    # Save enhanced masterdata with clusters and immigration ratios
-    output_cols = ['country', 'cluster', 'pca_x', 'pca_y', 'immigration_ratio_2020', 'immigration_ratio_2024']
-    df_clean[output_cols].to_csv('output/country_clusters.csv', index=False)
+        # Fitted transform, centroids and PCA, so what-if rows are scored without refitting
+        scoring_model = build_scoring_model(
+            df_clean, scaler, kmeans, pca, cluster_stats, CULTURAL_FEATURES, MIGRATION_FEATURES,
+            MIGRATION_RATIO_RANGE, bins_2024
+        )
+        save_scoring_model(scoring_model, os.path.join(output_dir, 'scoring_model.json'))
+        
+        # Precompute nearest neighbours in the standardized feature space for "similar countries"
+        similar = write_similar_countries(df_clean['country'], X_scaled, os.path.join(output_dir, 'similar_countries.json'))
+        
+        # Content-hashed copies plus deltas, so clients only fetch what changed
+        write_artifacts(output_dir, {'clustering_results': clustering_results, 'similar_countries': similar})
     
-    print(f"Clustering analysis completed!")
-    print(f"Generated {n_clusters} clusters for {len(df_clean)} countries")
-    print(f"Using immigration ratios per 1000 population instead of absolute numbers")
+    log(f"Clustering analysis completed!")
+    log(f"Generated {n_clusters} clusters for {len(df_clean)} countries")
+    log(f"Using immigration ratios per 1000 population instead of absolute numbers")
+    if trajectory_method:
+        moved = sum(len(set(c['yearly_clusters'].values())) > 1 for c in trajectory['countries'])
+        log(f"Trajectory clustering ({trajectory_method}): {moved} countries change per-year cluster at least once")
     
     # Print cluster summary
     for i, stats in cluster_stats.items():
-        print(f"\nCluster {i+1}: {stats['name']}")
-        print(f"  Countries: {stats['size']}")
-        print(f"  Examples: {', '.join(stats['countries'][:3])}...")
-        print(f"  Profile: {stats['description']}")
-        print(f"  Immigration ratio: {stats['immigration_ratio_per_1000']:.2f} per 1000 people ({stats['migration_level']})")
+        log(f"\nCluster {i+1}: {stats['name']}")
+        log(f"  Countries: {stats['size']}")
+        log(f"  Examples: {', '.join(stats['countries'][:3])}...")
+        log(f"  Profile: {stats['description']}")
+        log(f"  Immigration ratio: {stats['immigration_ratio_per_1000']:.2f} per 1000 people ({stats['migration_level']})")
+        if 'jaccard_stability' in stats:
+            log(f"  Stability (mean Jaccard): {stats['jaccard_stability']}")
     
     return clustering_results
 
 def determine_cluster_profile(cultural_profile, migration_ratio):
     """
     Create simple, intuitive cluster names for general audiences
+    Scalar form of cluster_labels.profile_labels
     """
-    pdi = cultural_profile['pdi']
-    idv = cultural_profile['idv']
-    mas = cultural_profile['mas']
-    uai = cultural_profile['uai']
-    lto = cultural_profile['lto']
-    ivr = cultural_profile['ivr']
-    
-    # Define thresholds (based on global averages)
-    high_pdi = pdi > 55     # High power distance
-    low_pdi = pdi <= 55     # Low power distance
-    low_idv = idv < 40      # Collectivist
-    high_idv = idv > 60     # Individualist
-    low_mas = mas < 45      # Feminine
-    high_mas = mas >= 45    # Masculine
-    high_ivr = ivr > 55     # Indulgent
-    low_ivr = ivr < 45      # Restrained
-    
-    # Simple, intuitive names based on cultural combinations
-    if low_idv and high_ivr:  # Cluster 0, 3 pattern
-        if migration_ratio > 15:  # Higher migration (0)
-            name = "Family-First Countries"
-            desc = "Places where family and community come first, but people enjoy life's pleasures"
-        else:  # Lower migration (3)
-            name = "Social Living Countries"
-            desc = "Traditional societies where everyone knows each other and celebrates together"
-    
-    elif high_idv and high_mas and migration_ratio < 50:  # Cluster 1 pattern (lower migration)
-        name = "Competitive Nations"
-        desc = "Independent countries focused on success, achievement and getting ahead"
-    
-    elif high_idv and high_mas and migration_ratio >= 50:  # Cluster 6 pattern (higher migration)
-        name = "Business-Minded Countries"
-        desc = "Global business hubs where people pursue entrepreneurship and success"
-    
-    elif high_pdi and low_idv and low_ivr:  # Cluster 2, 4, 7 pattern
-        if migration_ratio > 70:  # Very high migration (4)
-            name = "Structured Societies"
-            desc = "Well-organized countries with clear rules and strong leadership"
-        elif migration_ratio > 10:  # Moderate migration (2)
-            name = "Respectful Communities"
-            desc = "Places where people respect authority and work together as groups"
-        else:  # Low migration (7)
-            name = "Traditional Mindset"
-            desc = "Countries with deep traditions and established ways of doing things"
-    
-    elif low_pdi and high_idv and low_mas:  # Cluster 5 pattern
-        name = "Quality-of-Life Nations"
-        desc = "Equal societies where people value work-life balance and helping others"
-    
-    elif low_pdi and high_idv:  # Fallback for remaining high individualism
-        name = "Progressive Countries"
-        desc = "Fair countries where people pursue personal goals while caring for others"
-    
-    # Fallbacks for any unmatched patterns
-    elif high_idv:
-        name = "Independent Nations"
-        desc = "Countries where people value personal freedom and self-reliance"
-    elif low_idv:
-        name = "Team Players"
-        desc = "Countries where people work together and support each other"
-    else:
-        name = "Mixed Cultures"
-        desc = "Countries with balanced cultural characteristics"
-    
-    return {'name': name, 'description': desc}
+    names, descriptions = profile_labels(
+        {dim: [cultural_profile[dim]] for dim in CULTURAL_FEATURES}, [migration_ratio]
+    )
+    return {'name': names[0], 'description': descriptions[0]}
 
-def migration_classification(migration_ratio):
+def migration_classification(migration_ratio, bins=None):
     """
     Classify migration level based on immigration ratio per 1000 population
-    Using percentile-based thresholds for balanced distribution
-    """
-    # Based on the data analysis:
-    # 25th percentile: ~6, 50th percentile: ~21, 75th percentile: ~63, 90th percentile: ~104
-    if migration_ratio > 63:  # Above 75th percentile
-        return "Very High"
-    elif migration_ratio > 21:  # Above 50th percentile
-        return "High" 
-    elif migration_ratio > 6:   # Above 25th percentile
-        return "Moderate"
-    elif migration_ratio > 1:   # Above minimum meaningful threshold
-        return "Low"
-    else:
-        return "Very Low"
+    Scalar form of cluster_labels.migration_levels; pass bins from migration_thresholds
+    for cut points taken from the current data
+    """
+    if bins is None:
+        return migration_levels([migration_ratio])[0]
+    return migration_levels([migration_ratio], bins)[0]
 
 if __name__ == "__main__":
     results = create_country_clustering()
\ No newline at end of file
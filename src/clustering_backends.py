@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Compare clustering algorithms on the country features
+Usage: python3 clustering_backends.py [--backends kmeans,gmm,ward,hdbscan,spectral] [--k 8] [--workers N]
+
+A backend is a function registered under a name with register_backend. It is called with the
+standardized feature matrix and the pairwise Euclidean distances and returns one label per
+country, with -1 for noise. The runner does the shared work once: it loads and scales
+masterdata, computes the distance matrix and writes both to the feature store. The backends
+then fit concurrently in worker processes that map those files; the distance matrix is only
+attached by the backends that use it. Labels are aligned to the first backend, written in the
+clustering_results.json schema (noise countries are listed separately under 'noise'), and
+compared in clustering_comparison.json by pairwise ARI/NMI, silhouette and fit time.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import pdist, squareform
+from sklearn.cluster import HDBSCAN, KMeans, SpectralClustering
+from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score, normalized_mutual_info_score, silhouette_score
+from sklearn.mixture import GaussianMixture
+
+from clustering_analysis import (CULTURAL_FEATURES, MIGRATION_FEATURES, describe_clusters, load_scaled_features,
+                                 results_document)
+from feature_store import feature_matrix, materialize
+from migration_thresholds import build_sketches, migration_bins
+from profiling import log, span
+
+# Smallest group HDBSCAN reports as a cluster rather than noise
+HDBSCAN_MIN_CLUSTER_SIZE = 5
+
+@dataclass
+class Backend:
+    name: str
+    fit: object
+    uses_distances: bool = False
+
+BACKENDS = {}
+
+def register_backend(name, uses_distances=False):
+    """
+    Decorator registering fit(X, distances, n_clusters, random_state, n_init) -> labels;
+    distances is None unless uses_distances is set
+    """
+    def register(fit):
+        BACKENDS[name] = Backend(name, fit, uses_distances)
+        return fit
+    return register
+
+@register_backend('kmeans')
+def fit_kmeans(X, distances, n_clusters, random_state, n_init):
+    return KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init).fit_predict(X)
+
+@register_backend('gmm')
+def fit_gmm(X, distances, n_clusters, random_state, n_init):
+    mixture = GaussianMixture(n_components=n_clusters, covariance_type='full', random_state=random_state,
+                              n_init=n_init)
+    return mixture.fit_predict(X)
+
+@register_backend('ward', uses_distances=True)
+def fit_ward(X, distances, n_clusters, random_state, n_init):
+    # scipy's Ward linkage takes the shared Euclidean distances in condensed form
+    tree = linkage(squareform(distances, checks=False), method='ward')
+    return fcluster(tree, n_clusters, criterion='maxclust') - 1
+
+@register_backend('hdbscan', uses_distances=True)
+def fit_hdbscan(X, distances, n_clusters, random_state, n_init):
+    # Density-based: finds its own number of clusters (n_clusters is ignored) and marks outliers -1
+    return HDBSCAN(min_cluster_size=HDBSCAN_MIN_CLUSTER_SIZE, metric='precomputed').fit_predict(distances)
+
+@register_backend('spectral', uses_distances=True)
+def fit_spectral(X, distances, n_clusters, random_state, n_init):
+    # Gaussian affinity from the shared distances, with the median distance as bandwidth
+    sigma = np.median(distances[np.triu_indices_from(distances, 1)])
+    affinity = np.exp(-0.5 * (distances / sigma) ** 2)
+    spectral = SpectralClustering(n_clusters=n_clusters, affinity='precomputed', random_state=random_state,
+                                  n_init=n_init)
+    return spectral.fit_predict(affinity)
+
+# Feature matrix and distance handles, set once per worker process by _init_worker
+_FEATURES = None
+_DISTANCES = None
+
+def _init_worker(features, distances):
+    global _FEATURES, _DISTANCES
+    _FEATURES, _DISTANCES = features, distances
+
+def _fit_backend(task):
+    """Fit one backend against the shared matrices and time it"""
+    name, n_clusters, random_state, n_init = task
+    backend = BACKENDS[name]
+    X = np.asarray(feature_matrix(_FEATURES), dtype=float)
+    distances = np.asarray(feature_matrix(_DISTANCES), dtype=float) if backend.uses_distances else None
+
+    start = time.perf_counter()
+    labels = backend.fit(X, distances, n_clusters, random_state, n_init)
+    return name, np.asarray(labels, dtype=np.int64), time.perf_counter() - start
+
+def align_to(reference, labels):
+    """
+    Renumber labels so clusters overlapping most with a reference cluster take its number
+
+    Works for different cluster counts; unmatched clusters are numbered after the reference's
+    and noise (-1) is left alone.
+    """
+    clusters = np.unique(labels[labels >= 0])
+    targets = np.unique(reference[reference >= 0])
+    contingency = np.zeros((len(clusters), len(targets)), dtype=np.int64)
+    both = (labels >= 0) & (reference >= 0)
+    np.add.at(contingency, (np.searchsorted(clusters, labels[both]), np.searchsorted(targets, reference[both])), 1)
+    rows, cols = linear_sum_assignment(contingency, maximize=True)
+
+    mapping = dict(zip(clusters[rows], targets[cols]))
+    spare = iter(range(int(targets.max(initial=-1)) + 1, int(targets.max(initial=-1)) + 1 + len(clusters)))
+    for cluster in clusters:
+        if cluster not in mapping:
+            mapping[cluster] = next(spare)
+    lookup = np.vectorize(lambda label: mapping.get(label, label), otypes=[np.int64])
+    return lookup(labels) if len(labels) else labels
+
+def agreement_table(labels, score):
+    """Symmetric {backend: {backend: score}} of a label agreement measure; noise counts as a label"""
+    names = list(labels)
+    return {a: {b: round(float(score(labels[a], labels[b])), 4) for b in names} for a in names}
+
+def silhouette(distances, labels):
+    """Silhouette over the precomputed distances, leaving out noise; None with fewer than 2 clusters"""
+    kept = labels >= 0
+    if len(np.unique(labels[kept])) < 2:
+        return None
+    return round(float(silhouette_score(distances[np.ix_(kept, kept)], labels[kept], metric='precomputed')), 4)
+
+def backend_results(df, labels, bins, pca, sketches):
+    """
+    clustering_results.json content for one backend's labels
+
+    Noise rows (-1) are left out of 'countries' and listed by name under 'noise', so every
+    country's cluster has an entry in 'clusters'. Cluster ids are renumbered 0..k-1 in aligned
+    order, closing the gaps alignment leaves when a backend finds fewer clusters.
+    """
+    kept = labels >= 0
+    clustered = df[kept].copy()
+    clustered['cluster'] = np.unique(labels[kept], return_inverse=True)[1]
+    found = int(clustered['cluster'].max()) + 1 if len(clustered) else 0
+    results = results_document(clustered, describe_clusters(clustered, found, bins), pca, sketches)
+    results['noise'] = df.loc[~kept, 'country'].tolist()
+    return results
+
+def run_backends(backends=None, n_clusters=8, n_init=10, random_state=42, max_workers=None,
+                 input_path='output/masterdata.csv', output_dir='output'):
+    """
+    Fit every backend on the same features and write per-backend results plus a comparison report
+
+    Returns the comparison report; backend results go to output_dir/backends/clustering_results_<name>.json.
+    """
+    backends = list(backends or BACKENDS)
+    unknown = [name for name in backends if name not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown clustering backends: {', '.join(unknown)} (available: {', '.join(BACKENDS)})")
+
+    # Load, clean and scale once - workers map the shared matrices instead of receiving copies
+    df_clean, X_scaled, _ = load_scaled_features(input_path)
+    store_dir = os.path.join(os.path.dirname(input_path) or '.', 'cache', 'features')
+    features = materialize(X_scaled, df_clean['country'], store_dir, columns=CULTURAL_FEATURES + MIGRATION_FEATURES)
+    with span('distances'):
+        start = time.perf_counter()
+        distance_matrix = squareform(pdist(X_scaled))
+        distances = materialize(distance_matrix, df_clean['country'], store_dir, name='distances')
+        distance_seconds = time.perf_counter() - start
+
+    log(f"Fitting {len(backends)} clustering backends on {len(df_clean)} countries...")
+    start = time.perf_counter()
+    with span('fit'):
+        tasks = [(name, n_clusters, random_state, n_init) for name in backends]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(features, distances)) as executor:
+            fitted = {name: (labels, seconds) for name, labels, seconds in executor.map(_fit_backend, tasks)}
+    wall_seconds = time.perf_counter() - start
+
+    # Shared by every backend's results: one PCA projection and one set of migration thresholds
+    pca = PCA(n_components=2, random_state=42)
+    X_pca = pca.fit_transform(X_scaled)
+    df = df_clean.copy()
+    df['pca_x'], df['pca_y'] = X_pca[:, 0], X_pca[:, 1]
+    sketches = build_sketches(df)
+    bins = migration_bins(sketches['2024'])
+
+    reference = fitted[backends[0]][0]
+    labels = {name: align_to(reference, fitted[name][0]) for name in backends}
+    os.makedirs(os.path.join(output_dir, 'backends'), exist_ok=True)
+    summary = {}
+    for name in backends:
+        path = os.path.join(output_dir, 'backends', f"clustering_results_{name}.json")
+        with open(path, 'w') as f:
+            json.dump(backend_results(df, labels[name], bins, pca, sketches), f, separators=(',', ':'))
+        summary[name] = {
+            'n_clusters': len(np.unique(labels[name][labels[name] >= 0])),
+            'noise': int((labels[name] < 0).sum()),
+            'silhouette': silhouette(distance_matrix, labels[name]),
+            'fit_seconds': round(fitted[name][1], 4),
+            'results': path,
+        }
+
+    report = {
+        'countries': len(df_clean),
+        'features': CULTURAL_FEATURES + MIGRATION_FEATURES,
+        'n_clusters': n_clusters,
+        'reference': backends[0],
+        'distance_seconds': round(distance_seconds, 4),
+        'wall_seconds': round(wall_seconds, 4),
+        'backends': summary,
+        'agreement': {
+            'ari': agreement_table(labels, adjusted_rand_score),
+            'nmi': agreement_table(labels, normalized_mutual_info_score),
+        },
+    }
+    with open(os.path.join(output_dir, 'clustering_comparison.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def print_comparison(report):
+    print(f"=== CLUSTERING BACKENDS ({report['countries']} countries, k={report['n_clusters']}) ===\n")
+    print(f"{'backend':>10} {'clusters':>8} {'noise':>5} {'silhouette':>10} {'fit (s)':>8}  ARI vs {report['reference']}")
+    for name, row in report['backends'].items():
+        silhouette_text = '-' if row['silhouette'] is None else f"{row['silhouette']:.3f}"
+        print(f"{name:>10} {row['n_clusters']:>8} {row['noise']:>5} {silhouette_text:>10} {row['fit_seconds']:>8.3f}"
+              f"  {report['agreement']['ari'][name][report['reference']]:.3f}")
+    print(f"\nDistances computed once in {report['distance_seconds']:.3f}s; "
+          f"backends ran concurrently in {report['wall_seconds']:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare clustering algorithms on the country features")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"backends to run ({', '.join(BACKENDS)})")
+    parser.add_argument('--k', type=int, default=8, help="number of clusters (HDBSCAN picks its own)")
+    parser.add_argument('--n-init', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output-dir', default='output')
+    args = parser.parse_args()
+
+    report = run_backends(args.backends.split(','), args.k, args.n_init, args.seed, args.workers,
+                          output_dir=args.output_dir)
+    print_comparison(report)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Bootstrap / subsample stability of the country clustering
+Usage: python3 clustering_stability.py [--resamples 200] [--method subsample] [--workers N]
+
+Each resample refits KMeans on a subset of countries, aligns its labels to the reference fit
+with Hungarian matching and adds its co-assignments to running totals, so memory stays O(N²)
+however many resamples are run.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+
+from feature_store import feature_matrix
+
+RESAMPLING_METHODS = ['subsample', 'bootstrap']
+
+# Standardized feature matrix and reference labels, set once per worker process by _init_worker
+_X_SCALED = None
+_REFERENCE = None
+
+def _init_worker(features, reference_labels):
+    global _X_SCALED, _REFERENCE
+    # A FeatureStore handle is attached zero-copy; a plain array arrives pickled
+    _X_SCALED = feature_matrix(features)
+    _REFERENCE = reference_labels
+
+def align_labels(reference, labels, n_clusters):
+    """
+    Map resample labels onto reference labels maximizing the overlap (Hungarian matching)
+    """
+    contingency = np.zeros((n_clusters, n_clusters), dtype=np.int64)
+    np.add.at(contingency, (labels, reference), 1)
+    rows, cols = linear_sum_assignment(contingency, maximize=True)
+    mapping = np.empty(n_clusters, dtype=np.int64)
+    mapping[rows] = cols
+    return mapping[labels]
+
+def new_accumulator(n_samples, n_clusters):
+    return {
+        'co_assigned': np.zeros((n_samples, n_samples), dtype=np.int32),
+        'co_sampled': np.zeros((n_samples, n_samples), dtype=np.int32),
+        'matched': np.zeros(n_samples, dtype=np.int32),
+        'sampled': np.zeros(n_samples, dtype=np.int32),
+        'jaccard_sum': np.zeros(n_clusters),
+        'jaccard_count': np.zeros(n_clusters, dtype=np.int32),
+    }
+
+def merge_accumulators(total, part):
+    for key, value in part.items():
+        total[key] += value
+    return total
+
+def _run_resamples(task):
+    """Fit a batch of resamples in a worker and return their summed statistics"""
+    seeds, n_clusters, n_init, method, sample_fraction = task
+    X, reference = _X_SCALED, _REFERENCE
+    n_samples = len(X)
+    acc = new_accumulator(n_samples, n_clusters)
+
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        if method == 'bootstrap':
+            fit_idx = rng.integers(0, n_samples, n_samples)
+        else:
+            fit_idx = rng.choice(n_samples, int(round(sample_fraction * n_samples)), replace=False)
+
+        kmeans = KMeans(n_clusters=n_clusters, random_state=int(seed), n_init=n_init)
+        kmeans.fit(X[fit_idx])
+
+        # Label each distinct sampled country once
+        idx = np.unique(fit_idx)
+        labels = align_labels(reference[idx], kmeans.predict(X[idx]), n_clusters)
+
+        onehot = np.eye(n_clusters, dtype=np.int32)[labels]
+        block = np.ix_(idx, idx)
+        acc['co_assigned'][block] += onehot @ onehot.T
+        acc['co_sampled'][block] += 1
+        acc['matched'][idx] += labels == reference[idx]
+        acc['sampled'][idx] += 1
+
+        # Jaccard overlap between each reference cluster and its matched resample cluster
+        for c in range(n_clusters):
+            in_reference = reference[idx] == c
+            if not in_reference.any():
+                continue
+            in_resample = labels == c
+            union = np.sum(in_reference | in_resample)
+            acc['jaccard_sum'][c] += np.sum(in_reference & in_resample) / union
+            acc['jaccard_count'][c] += 1
+
+    return acc
+
+def run_stability_analysis(X_scaled, reference_labels, n_clusters, n_resamples=200, method='subsample',
+                           sample_fraction=0.8, n_init=10, random_state=42, max_workers=None, batch_size=20):
+    """
+    Resample, refit and align against reference_labels across worker processes
+
+    X_scaled is an array or a feature_store.FeatureStore; with a store, workers map the
+    shared file instead of each receiving a copy of the matrix.
+
+    Returns the co-assignment probability matrix with per-country and per-cluster summaries.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"Unknown resampling method: {method}")
+
+    reference_labels = np.asarray(reference_labels)
+    n_samples = len(X_scaled)
+    seeds = np.random.SeedSequence(random_state).generate_state(n_resamples)
+    tasks = [
+        (seeds[i:i + batch_size], n_clusters, n_init, method, sample_fraction)
+        for i in range(0, n_resamples, batch_size)
+    ]
+
+    # Batches are folded into the totals as they finish; no individual fit is kept
+    totals = new_accumulator(n_samples, n_clusters)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(X_scaled, reference_labels)) as executor:
+        for part in executor.map(_run_resamples, tasks):
+            merge_accumulators(totals, part)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        co_assignment = totals['co_assigned'] / totals['co_sampled']
+        assignment_frequency = totals['matched'] / totals['sampled']
+        jaccard = totals['jaccard_sum'] / totals['jaccard_count']
+
+    # Per country: mean probability of staying with the other members of its reference cluster
+    same_cluster = reference_labels[:, None] == reference_labels[None, :]
+    np.fill_diagonal(same_cluster, False)
+    peer_probability = np.array([
+        np.nanmean(co_assignment[i, same_cluster[i]]) if same_cluster[i].any() else np.nan
+        for i in range(n_samples)
+    ])
+
+    return {
+        'co_assignment': co_assignment,
+        'co_assignment_probability': peer_probability,
+        'assignment_frequency': assignment_frequency,
+        'cluster_jaccard': jaccard,
+        'n_resamples': n_resamples,
+        'method': method,
+        'sample_fraction': sample_fraction if method == 'subsample' else 1.0,
+    }
+
+def stability_summary(stability, countries):
+    """JSON-ready stability section for clustering_results.json"""
+    def clean(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    return {
+        'n_resamples': stability['n_resamples'],
+        'method': stability['method'],
+        'sample_fraction': stability['sample_fraction'],
+        'cluster_jaccard': {i: clean(v) for i, v in enumerate(stability['cluster_jaccard'])},
+        'countries': [
+            {
+                'country': country,
+                'co_assignment_probability': clean(peer),
+                'assignment_frequency': clean(freq),
+            }
+            for country, peer, freq in zip(countries, stability['co_assignment_probability'],
+                                           stability['assignment_frequency'])
+        ],
+    }
+
+if __name__ == "__main__":
+    from clustering_analysis import create_country_clustering
+
+    parser = argparse.ArgumentParser(description="Cluster stability under resampling")
+    parser.add_argument('--resamples', type=int, default=200)
+    parser.add_argument('--method', choices=RESAMPLING_METHODS, default='subsample')
+    parser.add_argument('--fraction', type=float, default=0.8, help="subsample fraction")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    create_country_clustering(
+        stability_resamples=args.resamples,
+        stability_method=args.method,
+        stability_fraction=args.fraction,
+        max_workers=args.workers,
+    )
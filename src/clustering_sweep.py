@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep over KMeans configurations for the country clustering
+Usage: python3 clustering_sweep.py [--k 2-12] [--seeds 42,0,1] [--workers N]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score, davies_bouldin_score
+
+from clustering_analysis import CULTURAL_FEATURES, MIGRATION_FEATURES, load_scaled_features
+from feature_store import feature_matrix, materialize
+from profiling import log
+
+# Multipliers applied to the standardized cultural / migration columns
+FEATURE_WEIGHTINGS = {
+    'equal': {'cultural': 1.0, 'migration': 1.0},
+    'cultural_heavy': {'cultural': 1.2, 'migration': 0.8},
+    'migration_heavy': {'cultural': 0.8, 'migration': 1.2},
+}
+
+# Standardized feature matrix, set once per worker process by _init_worker
+_X_SCALED = None
+
+def _init_worker(features):
+    global _X_SCALED
+    _X_SCALED = feature_matrix(features)
+
+def weighting_vector(weighting):
+    """Expand a cultural/migration weighting into one multiplier per feature column"""
+    return np.array(
+        [weighting['cultural']] * len(CULTURAL_FEATURES) +
+        [weighting['migration']] * len(MIGRATION_FEATURES)
+    )
+
+def _fit_configuration(config):
+    """Fit one KMeans configuration against the shared matrix and score it"""
+    n_clusters, seed, weighting_name, n_init = config
+    X = _X_SCALED * weighting_vector(FEATURE_WEIGHTINGS[weighting_name])
+    
+    start = time.perf_counter()
+    kmeans = KMeans(n_clusters=n_clusters, random_state=seed, n_init=n_init)
+    labels = kmeans.fit_predict(X)
+    fit_seconds = time.perf_counter() - start
+    
+    return {
+        'n_clusters': n_clusters,
+        'seed': seed,
+        'weighting': weighting_name,
+        'n_init': n_init,
+        'inertia': float(kmeans.inertia_),
+        'silhouette': float(silhouette_score(X, labels)),
+        'davies_bouldin': float(davies_bouldin_score(X, labels)),
+        'fit_seconds': fit_seconds,
+    }
+
+def run_clustering_sweep(k_values=range(2, 13), seeds=(42,), weightings=None, n_init=10,
+                         max_workers=None, input_path='output/masterdata.csv',
+                         output_path='output/clustering_sweep.csv'):
+    """
+    Evaluate every (k, seed, weighting) combination on a single prepared feature matrix
+    """
+    weightings = list(weightings or FEATURE_WEIGHTINGS)
+    unknown = [name for name in weightings if name not in FEATURE_WEIGHTINGS]
+    if unknown:
+        raise ValueError(f"Unknown feature weightings: {', '.join(unknown)}")
+    
+    # Load, clean and scale once - workers map the shared matrix instead of receiving a copy
+    df_clean, X_scaled, _ = load_scaled_features(input_path)
+    features = materialize(X_scaled, df_clean['country'],
+                           os.path.join(os.path.dirname(input_path) or '.', 'cache', 'features'),
+                           columns=CULTURAL_FEATURES + MIGRATION_FEATURES)
+    configs = [(k, seed, name, n_init) for k, seed, name in product(k_values, seeds, weightings)]
+    
+    log(f"Running {len(configs)} configurations on {len(features)} countries...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(features,)) as executor:
+        rows = list(executor.map(_fit_configuration, configs))
+    
+    results = pd.DataFrame(rows).sort_values(['weighting', 'n_clusters', 'seed']).reset_index(drop=True)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    results.to_csv(output_path, index=False)
+    
+    log(f"Sweep completed in {time.perf_counter() - start:.2f}s")
+    log(f"Results saved to {output_path}")
+    best = results.sort_values('silhouette', ascending=False).head(5)
+    log("\nTop configurations by silhouette score:")
+    log(best[['n_clusters', 'seed', 'weighting', 'silhouette', 'davies_bouldin']].to_string(index=False))
+    
+    return results
+
+def parse_int_list(value):
+    """Parse '2-12' or '4,6,8' into a list of ints"""
+    if '-' in value:
+        low, high = value.split('-', 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(v) for v in value.split(',') if v]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep KMeans settings for the country clustering")
+    parser.add_argument('--k', default='2-12', help="cluster counts, e.g. 2-12 or 4,6,8")
+    parser.add_argument('--seeds', default='42', help="random seeds, e.g. 42,0,1")
+    parser.add_argument('--weightings', default=','.join(FEATURE_WEIGHTINGS),
+                        help=f"feature weightings ({', '.join(FEATURE_WEIGHTINGS)})")
+    parser.add_argument('--n-init', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='output/clustering_sweep.csv')
+    args = parser.parse_args()
+    
+    run_clustering_sweep(
+        k_values=parse_int_list(args.k),
+        seeds=parse_int_list(args.seeds),
+        weightings=args.weightings.split(','),
+        n_init=args.n_init,
+        max_workers=args.workers,
+        output_path=args.output,
+    )
@@ -0,0 +1,148 @@
+"""
+Match country names between datasets (UN DESA migration names -> Hofstede names)
+
+Names are normalized, resolved through exact and alias hash lookups, and only the
+remainder goes through a character n-gram TF-IDF similarity search.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Migration name -> Hofstede name for pairs normalization alone cannot resolve.
+# None marks countries/areas without Hofstede data so they never fall through to fuzzy matching.
+COUNTRY_ALIASES = {
+    "United States of America": "United states",
+    "Republic of Korea": "South korea",
+    "Czechia": "Czech republic",
+    "Russian Federation": "Russia",
+    "Republic of Moldova": "Moldova",
+    "Viet Nam": "Vietnam",
+    "China, Taiwan Province of China": "Taiwan",
+    "United Republic of Tanzania": "Tanzania",
+    "Syrian Arab Republic": "Syria",
+    "Türkiye": "Turkey",
+    "China, Hong Kong SAR": "Hong kong",
+
+    # Countries without Hofstede data (excluded)
+    "Eritrea": None, "Rwanda": None, "Somalia": None, "South Sudan": None, "Uganda": None,
+    "Chad": None, "Congo": None, "Gabon": None, "Sudan": None, "Eswatini": None,
+    "Guinea": None, "Liberia": None, "Mauritania": None, "Kyrgyzstan": None, "Tajikistan": None,
+    "Turkmenistan": None, "Uzbekistan": None, "Afghanistan": None, "Cambodia": None, "Myanmar": None,
+    "Bahrain": None, "Cyprus": None, "Oman": None, "Andorra": None, "Monaco": None,
+    "Anguilla": None, "Bahamas": None, "Dominica": None, "Grenada": None,
+    "United States Virgin Islands": None, "Belize": None, "Nicaragua": None, "Guyana": None,
+    "Greenland": None, "Australia/New Zealand": None, "New Caledonia": None, "Palau": None,
+    "Tonga": None, "Dem. People's Republic of Korea": None, "Burundi": None, "Comoros": None,
+    "Djibouti": None, "Madagascar": None, "Mauritius": None, "Mayotte": None, "Réunion": None,
+    "Seychelles": None, "Zimbabwe": None, "Niger": None,
+
+    # Regions listed alongside countries
+    "South America": None,
+}
+
+def clean_country_name(name):
+    """Clean country names by removing asterisks and content in parentheses"""
+    name = name.replace('*', '')
+    name = re.sub(r'\s*\([^)]*\)', '', name)
+    return name.strip()
+
+def normalize_country_name(name):
+    """
+    Canonical lookup key: cleaned, accent-free, case-folded, punctuation collapsed to spaces
+    """
+    name = clean_country_name(str(name))
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch))
+    name = name.casefold().replace('&', ' and ')
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', name).split())
+
+class CountryMatcher:
+    """
+    Index of candidate names that resolves queries by exact key, alias, then TF-IDF similarity
+    """
+
+    def __init__(self, candidates, aliases=COUNTRY_ALIASES, threshold=0.85, ngram_range=(2, 3),
+                 block_size=10000):
+        self.candidates = list(candidates)
+        self.threshold = threshold
+        self.block_size = block_size
+
+        # Hash index over normalized candidates (first occurrence wins)
+        self.candidate_keys = [normalize_country_name(c) for c in self.candidates]
+        self.exact_index = {}
+        for key, candidate in zip(self.candidate_keys, self.candidates):
+            self.exact_index.setdefault(key, candidate)
+
+        # Aliases may point at a candidate by any spelling that normalizes to its key
+        self.alias_index = {}
+        for source, target in (aliases or {}).items():
+            if target is not None:
+                target = self.exact_index.get(normalize_country_name(target))
+                if target is None:
+                    continue
+            self.alias_index[normalize_country_name(source)] = target
+
+        # Sparse character n-gram vectors for the fuzzy fallback
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range)
+        self.candidate_vectors = self.vectorizer.fit_transform(self.candidate_keys)
+
+    def _fuzzy_match(self, keys):
+        """Best candidate and cosine score per key, computed block by block on sparse products"""
+        best = np.empty(len(keys), dtype=np.int64)
+        scores = np.zeros(len(keys))
+
+        for start in range(0, len(keys), self.block_size):
+            block = self.vectorizer.transform(keys[start:start + self.block_size])
+            similarity = (block @ self.candidate_vectors.T).tocsr()
+            best[start:start + block.shape[0]] = np.asarray(similarity.argmax(axis=1)).ravel()
+            scores[start:start + block.shape[0]] = similarity.max(axis=1).toarray().ravel()
+
+        return best, scores
+
+    def match(self, names):
+        """
+        Match every name, returning a frame with name, match, score and method columns
+
+        method is 'exact', 'alias', 'fuzzy', 'excluded' (alias to None) or None when unmatched.
+        """
+        names = pd.Series(list(names), dtype='object')
+        unique_names = pd.unique(names)
+        keys = pd.Series([normalize_country_name(n) for n in unique_names], index=unique_names)
+
+        result = pd.DataFrame({'key': keys})
+        result['match'] = result['key'].map(self.exact_index)
+        result['method'] = np.where(result['match'].notna(), 'exact', None)
+
+        # Aliases only apply where the exact index missed
+        is_alias = result['match'].isna() & result['key'].isin(list(self.alias_index))
+        alias_targets = result.loc[is_alias, 'key'].map(self.alias_index)
+        result.loc[is_alias, 'match'] = alias_targets
+        result.loc[is_alias, 'method'] = np.where(alias_targets.notna(), 'alias', 'excluded')
+        result['score'] = np.where(result['method'].isin(['exact', 'alias']), 1.0, np.nan)
+
+        remainder = result['method'].isna() & (result['key'] != '')
+        if remainder.any():
+            best, scores = self._fuzzy_match(result.loc[remainder, 'key'].tolist())
+            accepted = scores >= self.threshold
+            idx = result.index[remainder]
+            result.loc[idx, 'score'] = scores
+            result.loc[idx[accepted], 'match'] = [self.candidates[i] for i in best[accepted]]
+            result.loc[idx[accepted], 'method'] = 'fuzzy'
+
+        matched = result.reindex(names)
+        return pd.DataFrame({
+            'name': names.values,
+            'match': matched['match'].values,
+            'score': matched['score'].values,
+            'method': matched['method'].values,
+        })
+
+    def mapping(self, names):
+        """Dict of name -> matched candidate for every name that found a match"""
+        matches = self.match(names)
+        matches = matches[matches['match'].notna()]
+        return dict(zip(matches['name'], matches['match']))
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Permutation tests linking the Hofstede dimensions to immigration ratios
+Usage: python3 cultural_significance.py [--permutations 10000] [--seed 42] [--workers N]
+
+Two families of tests, over every survey year:
+- correlation: Pearson and Spearman correlation of each dimension with the log immigration
+  ratio (log1p of immigrants per 1000 people)
+- cluster: share of the variance of the female share of immigrants explained by the clusters
+  (eta²). The clusters are fit on the dimensions and the 2020/2024 ratios, and the ratios of
+  the other years move almost in step with those, so testing any of them against the clusters
+  would be circular; their eta² is reported as descriptive only, without a test.
+
+p-values are two-sided permutation p-values, with Benjamini-Hochberg q-values per family.
+Each chunk draws its permutations as one (permutations x countries) index matrix and scores
+them all with a single gather and einsum. Chunks run in worker processes attached to a
+feature_store matrix. Results are cached under a hash of the input files and test
+parameters, so a rerun on unchanged data is a file read.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from cluster_labels import CULTURAL_DIMENSIONS
+from data_cache import CACHE_DIR, cache_path, file_sha256
+from feature_store import feature_matrix, materialize
+from masterdata_schema import IMPUTATION_FLAGS, YEARS
+from profiling import log, span
+
+SIGNIFICANCE_PATH = 'output/cultural_significance.json'
+# Bump when the statistics change, so cached results are not reused
+TEST_VERSION = 4
+# Permutations scored per gather; chunks are also the unit of work sent to a process
+CHUNK_SIZE = 2000
+# Relative tolerance when comparing permuted statistics with the observed one
+TIE_TOLERANCE = 1e-9
+
+# Per-process test groups, set once by _init_worker
+_TESTS = None
+
+def ratio_columns(years=YEARS):
+    return [f"log_ratio_{year}" for year in years]
+
+def female_share_columns(years=YEARS):
+    return [f"female_share_{year}" for year in years]
+
+# Fitted on (or collinear with what was): cluster eta² is descriptive only
+DESCRIPTIVE_VARIABLES = CULTURAL_DIMENSIONS + ratio_columns()
+
+def significance_frame(masterdata, clusters):
+    """
+    Dimensions, log immigration ratios and female share of the immigrant stock of the
+    clustered countries, with their cluster
+
+    Countries without a population or a stock for every year are dropped; missing
+    dimensions (typically lto and ivr) stay NaN and are excluded test by test. Imputed
+    scores count as missing, so the tests only see published values.
+    """
+    df = masterdata.merge(clusters[['country', 'cluster']], on='country', how='inner')
+    for dim, flag in IMPUTATION_FLAGS.items():
+        if flag in df:
+            df[dim] = df[dim].mask(df[flag].fillna(0).astype(bool))
+    population = pd.to_numeric(df['population'], errors='coerce')
+    ratios = pd.DataFrame({
+        column: np.log1p(pd.to_numeric(df[str(year)], errors='coerce') / population.where(population > 0) * 1000)
+        for column, year in zip(ratio_columns(), YEARS)
+    })
+    totals = df[YEARS].apply(pd.to_numeric, errors='coerce')
+    shares = pd.DataFrame({
+        column: pd.to_numeric(df[f"{year}_female"], errors='coerce') / totals[year].where(totals[year] > 0)
+        for column, year in zip(female_share_columns(), YEARS)
+    })
+    frame = pd.concat([df[['country', 'cluster']], df[CULTURAL_DIMENSIONS].astype(float), ratios, shares], axis=1)
+    complete = np.isfinite(ratios.to_numpy()).all(axis=1)
+    return frame[complete].reset_index(drop=True)
+
+def _standardize(values):
+    """Columns centred and scaled to unit norm, so a dot product is a correlation"""
+    centred = values - values.mean(axis=0)
+    return centred / np.linalg.norm(centred, axis=0)
+
+def build_tests(matrix, labels, columns):
+    """
+    Group the tests by the rows they use, with the standardized arrays each group needs
+
+    Dimensions missing for the same countries share one group (and one permutation matrix).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    dims = [columns.index(dim) for dim in CULTURAL_DIMENSIONS]
+    ratios = [columns.index(col) for col in ratio_columns()]
+    valid = np.isfinite(matrix)
+
+    masks = {}
+    for j in dims:
+        masks.setdefault(valid[:, j].tobytes(), []).append(j)
+
+    tests = []
+    for mask_bytes, group in masks.items():
+        rows = np.flatnonzero(np.frombuffer(mask_bytes, dtype=bool))
+        x, y = matrix[np.ix_(rows, group)], matrix[np.ix_(rows, ratios)]
+        tests.append({
+            'kind': 'correlation', 'rows': rows,
+            'x': [columns[j] for j in group], 'y': [columns[j] for j in ratios],
+            'pearson': (_standardize(x), _standardize(y)),
+            'spearman': (_standardize(rankdata(x, axis=0)), _standardize(rankdata(y, axis=0))),
+        })
+
+    # Cluster tests only for variables outside the clustering features: the female shares
+    groups = {}
+    for j in [columns.index(col) for col in female_share_columns()]:
+        groups.setdefault(valid[:, j].tobytes(), []).append(j)
+    codes = np.unique(labels, return_inverse=True)[1]
+    for mask_bytes, group in groups.items():
+        rows = np.flatnonzero(np.frombuffer(mask_bytes, dtype=bool))
+        values = matrix[np.ix_(rows, group)]
+        centred = values - values.mean(axis=0)
+        group_codes = codes[rows]
+        tests.append({
+            'kind': 'cluster', 'rows': rows, 'variables': [columns[j] for j in group],
+            'centred': centred, 'total_ss': (centred ** 2).sum(axis=0),
+            'codes': group_codes, 'sizes': np.bincount(group_codes, minlength=codes.max() + 1),
+        })
+    return tests
+
+def _correlations(x, y, permutation=None):
+    """(..., x, y) correlations of standardized columns, y rows reordered by each permutation"""
+    if permutation is None:
+        return x.T @ y
+    return np.einsum('mx,bmy->bxy', x, y[permutation], optimize=True)
+
+def _between_ss(test, permutation=None):
+    """Between-cluster sum of squares of every variable, for the labels or permuted labels"""
+    codes = test['codes'] if permutation is None else test['codes'][permutation]
+    onehot = codes[..., None] == np.arange(len(test['sizes']))
+    sums = np.einsum('...mk,mv->...kv', onehot.astype(float), test['centred'], optimize=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_cluster = np.where(test['sizes'][:, None] > 0, sums ** 2 / test['sizes'][:, None], 0)
+    return per_cluster.sum(axis=-2)
+
+def observed_statistics(tests):
+    """Statistic per test group, in the shapes the permutation counts use"""
+    observed = []
+    for test in tests:
+        if test['kind'] == 'correlation':
+            observed.append({method: _correlations(*test[method]) for method in ('pearson', 'spearman')})
+        else:
+            observed.append({'eta_squared': _between_ss(test) / test['total_ss']})
+    return observed
+
+def count_exceedances(tests, observed, rng, n_permutations):
+    """
+    Number of permutations whose statistic is at least as extreme as the observed one
+
+    One (n_permutations x rows) index matrix per test group; the correlation methods
+    share it.
+    """
+    counts = []
+    for test, stats in zip(tests, observed):
+        m = len(test['rows'])
+        permutation = rng.permuted(np.tile(np.arange(m), (n_permutations, 1)), axis=1)
+        group = {}
+        for name, value in stats.items():
+            if test['kind'] == 'correlation':
+                permuted = np.abs(_correlations(test[name][0], test[name][1], permutation))
+                reference = np.abs(value)
+            else:
+                permuted = _between_ss(test, permutation) / test['total_ss']
+                reference = value
+            group[name] = (permuted >= reference * (1 - TIE_TOLERANCE)).sum(axis=0)
+        counts.append(group)
+    return counts
+
+def _init_worker(features, labels, columns):
+    global _TESTS
+    # The store is attached zero-copy; every worker rebuilds the same small test groups from it
+    tests = build_tests(feature_matrix(features), labels, columns)
+    _TESTS = (tests, observed_statistics(tests))
+
+def _run_chunk(task):
+    seed, n_permutations = task
+    tests, observed = _TESTS
+    return count_exceedances(tests, observed, np.random.default_rng(seed), n_permutations)
+
+def benjamini_hochberg(p_values):
+    """Benjamini-Hochberg adjusted p-values (q-values)"""
+    p = np.asarray(p_values, dtype=float)
+    order = np.argsort(p)
+    scaled = p[order] * len(p) / np.arange(1, len(p) + 1)
+    q = np.empty_like(p)
+    q[order] = np.minimum(1, np.minimum.accumulate(scaled[::-1])[::-1])
+    return q
+
+def run_permutation_tests(features, labels, columns, n_permutations=10000, random_state=42,
+                          chunk_size=CHUNK_SIZE, max_workers=None):
+    """
+    Observed statistics and exceedance counts of every test group
+
+    features is an array or a feature_store.FeatureStore; chunks of chunk_size permutations
+    are seeded from random_state in a fixed order, so the result does not depend on the
+    number of workers.
+    """
+    tests = build_tests(feature_matrix(features), labels, columns)
+    observed = observed_statistics(tests)
+
+    sizes = [min(chunk_size, n_permutations - start) for start in range(0, n_permutations, chunk_size)]
+    seeds = np.random.SeedSequence(random_state).generate_state(len(sizes))
+    totals = [{name: np.zeros(np.shape(value), dtype=np.int64) for name, value in group.items()}
+              for group in observed]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(features, labels, columns)) as executor:
+        for counts in executor.map(_run_chunk, zip(seeds, sizes)):
+            for total, group in zip(totals, counts):
+                for name, value in group.items():
+                    total[name] += value
+    return tests, observed, totals
+
+def eta_squared(frame, variables):
+    """Share of each variable's variance explained by the clusters, over the rows where it is present"""
+    rows = []
+    for variable in variables:
+        present = frame[['cluster', variable]].dropna()
+        centred = present[variable] - present[variable].mean()
+        total_ss = (centred ** 2).sum()
+        between_ss = (centred.groupby(present['cluster']).sum() ** 2 / present.groupby('cluster').size()).sum()
+        rows.append({'variable': variable, 'countries': len(present),
+                     'eta_squared': round(float(between_ss / total_ss), 4) if total_ss > 0 else None})
+    return rows
+
+def significance_report(frame, tests, observed, totals, n_permutations):
+    """JSON-ready tables of the tests, p-values from the exceedance counts"""
+    def p_value(count):
+        return round((1 + int(count)) / (1 + n_permutations), 6)
+
+    correlations = []
+    clusters = []
+    for test, stats, counts in zip(tests, observed, totals):
+        if test['kind'] == 'correlation':
+            for i, dim in enumerate(test['x']):
+                for j, column in enumerate(test['y']):
+                    correlations.append({
+                        'dimension': dim, 'year': int(column.rsplit('_', 1)[-1]), 'countries': len(test['rows']),
+                        'pearson': round(float(stats['pearson'][i, j]), 4),
+                        'pearson_p': p_value(counts['pearson'][i, j]),
+                        'spearman': round(float(stats['spearman'][i, j]), 4),
+                        'spearman_p': p_value(counts['spearman'][i, j]),
+                    })
+        else:
+            for i, variable in enumerate(test['variables']):
+                clusters.append({
+                    'variable': variable, 'countries': len(test['rows']),
+                    'eta_squared': round(float(stats['eta_squared'][i]), 4),
+                    'p': p_value(counts['eta_squared'][i]),
+                })
+
+    # q-values per family of tests
+    for rows, keys in ((correlations, {'pearson_p': 'pearson_q', 'spearman_p': 'spearman_q'}),
+                       (clusters, {'p': 'q'})):
+        for p_key, q_key in keys.items():
+            q = benjamini_hochberg([row[p_key] for row in rows]) if rows else []
+            for row, value in zip(rows, q):
+                row[q_key] = round(float(value), 6)
+
+    order = {dim: i for i, dim in enumerate(CULTURAL_DIMENSIONS + ratio_columns() + female_share_columns())}
+    correlations.sort(key=lambda row: (order[row['dimension']], row['year']))
+    clusters.sort(key=lambda row: order[row['variable']])
+
+    variables = CULTURAL_DIMENSIONS + ratio_columns() + female_share_columns()
+    means = frame.groupby('cluster')[variables].mean().round(3)
+    return {
+        'n_permutations': n_permutations,
+        'countries': len(frame),
+        'correlations': correlations,
+        'cluster_differences': clusters,
+        # Not tested: the clusters were fit on these variables or on ones collinear with them
+        'cluster_descriptive': eta_squared(frame, DESCRIPTIVE_VARIABLES),
+        'cluster_means': {str(cluster): {k: (None if pd.isna(v) else float(v)) for k, v in row.items()}
+                          for cluster, row in means.iterrows()},
+    }
+
+def analyze_significance(masterdata_path='output/masterdata.csv', clusters_path='output/country_clusters.csv',
+                         output_path=SIGNIFICANCE_PATH, n_permutations=10000, random_state=42,
+                         chunk_size=CHUNK_SIZE, max_workers=None, cache_dir=CACHE_DIR):
+    """
+    Run the permutation tests on masterdata and the cluster assignments and write the report,
+    reusing a cached report for the same input files and parameters
+    """
+    params = {'version': TEST_VERSION, 'n_permutations': n_permutations, 'random_state': random_state,
+              'chunk_size': chunk_size}
+    key = hashlib.sha256(
+        f"{file_sha256(masterdata_path)}:{file_sha256(clusters_path)}:{json.dumps(params, sort_keys=True)}".encode()
+    ).hexdigest()
+    cached = cache_path('cultural_significance', key, cache_dir, ext='json')
+
+    if os.path.exists(cached):
+        log(f"Using cached significance tests ({os.path.basename(cached)})")
+        with open(cached) as f:
+            report = json.load(f)
+    else:
+        frame = significance_frame(pd.read_csv(masterdata_path), pd.read_csv(clusters_path))
+        columns = CULTURAL_DIMENSIONS + ratio_columns() + female_share_columns()
+        store = materialize(frame[columns].to_numpy(), frame['country'], os.path.join(cache_dir, 'features'),
+                            name='significance', columns=columns)
+        with span('permutation tests'):
+            tests, observed, totals = run_permutation_tests(
+                store, frame['cluster'].to_numpy(), columns, n_permutations, random_state, chunk_size, max_workers)
+        report = significance_report(frame, tests, observed, totals, n_permutations)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cached + '.tmp', 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(cached + '.tmp', cached)
+
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def print_report(report, alpha=0.05):
+    print(f"=== CULTURE-MIGRATION SIGNIFICANCE ({report['n_permutations']:,} permutations, "
+          f"{report['countries']} countries) ===\n")
+    print("Correlation with log immigration ratio (* q < {:.2f}):".format(alpha))
+    table = pd.DataFrame(report['correlations'])
+    for dim, rows in table.groupby('dimension', sort=False):
+        cells = [f"{row.year}: {row.spearman:+.2f}{'*' if row.spearman_q < alpha else ' '}"
+                 for row in rows.itertuples()]
+        print(f"  {dim.upper():>4} (n={rows['countries'].iloc[0]})  " + '  '.join(cells))
+
+    print("\nVariance explained by the clusters (descriptive; fit on, or collinear with, the clustering features):")
+    for row in report['cluster_descriptive']:
+        print(f"  {row['variable']:>15}: eta² {row['eta_squared']:.2f}")
+
+    print("\nFemale share of immigrants explained by the clusters (not a clustering feature):")
+    for row in report['cluster_differences']:
+        print(f"  {row['variable']:>15}: eta² {row['eta_squared']:.2f}  p {row['p']:.4f}"
+              f"{'  *' if row['q'] < alpha else ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Permutation tests of Hofstede dimensions vs immigration ratios")
+    parser.add_argument('--masterdata', default='output/masterdata.csv')
+    parser.add_argument('--clusters', default='output/country_clusters.csv')
+    parser.add_argument('--output', default=SIGNIFICANCE_PATH)
+    parser.add_argument('--permutations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    report = analyze_significance(args.masterdata, args.clusters, args.output, args.permutations, args.seed,
+                                  max_workers=args.workers)
+    print_report(report)
@@ -0,0 +1,39 @@
+"""
+Content-hash helpers for caching intermediate tables between runs
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+
+CACHE_DIR = 'output/cache'
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file's bytes without loading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_path(name, key, cache_dir=CACHE_DIR, ext='parquet'):
+    """Location of a cached artifact for a given content key"""
+    return os.path.join(cache_dir, f"{name}_{key[:16]}.{ext}")
+
+def read_cached_frame(path):
+    """Return the cached frame at path, or None when it has not been built yet"""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def write_cached_frame(df, path):
+    """Persist a frame to the Parquet cache"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Parquet needs string column names and single-typed object columns
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype('string')
+    df.to_parquet(path, index=False)
+    return df
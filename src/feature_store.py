@@ -0,0 +1,129 @@
+"""
+Memory-mapped feature store shared by worker processes
+
+The cleaned, standardized feature matrix is written once as a float32 .npy next to a JSON
+country index. Workers receive a FeatureStore handle (a path and a shape, cheap to pickle)
+and attach to the file with mmap, so every process reads the same page-cache pages instead
+of unpickling its own copy of the matrix.
+
+materialize never deletes other matrices, since a concurrent run may still be mapping them;
+stale files are removed explicitly with prune_store (python3 feature_store.py --prune).
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+FEATURE_STORE_DIR = 'output/cache/features'
+# prune_store keeps matrices written or reused within this many days
+PRUNE_AFTER_DAYS = 7
+
+# Matrices attached in this process, by path
+_ATTACHED = {}
+
+class FeatureStore:
+    def __init__(self, path, shape, countries_path=None):
+        self.path = path
+        self.shape = tuple(shape)
+        self.countries_path = countries_path
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"FeatureStore({self.path!r}, shape={self.shape})"
+
+    def attach(self):
+        """Read-only float32 view of the matrix, mapped once per process"""
+        matrix = _ATTACHED.get(self.path)
+        if matrix is None:
+            matrix = _ATTACHED[self.path] = np.load(self.path, mmap_mode='r')
+        return matrix
+
+    def countries(self):
+        with open(self.countries_path) as f:
+            return json.load(f)['countries']
+
+    @classmethod
+    def open(cls, path):
+        """Handle for an existing store file"""
+        matrix = np.load(path, mmap_mode='r')
+        countries_path = os.path.splitext(path)[0] + '.json'
+        return cls(path, matrix.shape, countries_path if os.path.exists(countries_path) else None)
+
+def matrix_digest(X, countries=None):
+    digest = hashlib.sha256(np.ascontiguousarray(X).tobytes())
+    if countries is not None:
+        digest.update('\0'.join(countries).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def materialize(X_scaled, countries, store_dir=FEATURE_STORE_DIR, name='features', columns=None):
+    """
+    Write X_scaled as float32 plus its country index and return a FeatureStore handle
+
+    Files are named by content hash, so rerunning on the same data reuses them. Reuse
+    refreshes the file's mtime, which is what prune_store ages by.
+    """
+    X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+    countries = [str(c) for c in countries]
+    if len(countries) != len(X):
+        raise ValueError(f"{len(countries)} countries for a matrix of {len(X)} rows")
+
+    os.makedirs(store_dir, exist_ok=True)
+    stem = os.path.join(store_dir, f"{name}-{matrix_digest(X, countries)}")
+    path, countries_path = stem + '.npy', stem + '.json'
+
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        # Write under a per-process temporary name so attached readers never see a partial
+        # file and concurrent writers of the same matrix don't interleave
+        for target, write in (
+            (countries_path, lambda f: f.write(json.dumps({'countries': countries, 'columns': columns}).encode('utf-8'))),
+            (path, lambda f: np.save(f, X)),
+        ):
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                write(f)
+            os.replace(tmp, target)
+
+    return FeatureStore(path, X.shape, countries_path)
+
+def prune_store(store_dir=FEATURE_STORE_DIR, max_age_days=PRUNE_AFTER_DAYS):
+    """
+    Remove matrices (and their country index) not written or reused within max_age_days
+
+    Returns the removed .npy paths. Only run this when no clustering job is using the store.
+    """
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for path in glob.glob(os.path.join(store_dir, '*.npy')):
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            countries_path = os.path.splitext(path)[0] + '.json'
+            if os.path.exists(countries_path):
+                os.remove(countries_path)
+            removed.append(path)
+    return removed
+
+def feature_matrix(features):
+    """The array behind a FeatureStore handle, or features itself if it already is an array"""
+    return features.attach() if isinstance(features, FeatureStore) else features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or prune the memory-mapped feature store")
+    parser.add_argument('--store-dir', default=FEATURE_STORE_DIR)
+    parser.add_argument('--prune', action='store_true', help="remove matrices not used within --days")
+    parser.add_argument('--days', type=float, default=PRUNE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    if args.prune:
+        removed = prune_store(args.store_dir, args.days)
+        print(f"Removed {len(removed)} feature matrices from {args.store_dir}")
+    for path in sorted(glob.glob(os.path.join(args.store_dir, '*.npy'))):
+        print(FeatureStore.open(path))
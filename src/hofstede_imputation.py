@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Fill in missing Hofstede scores before clustering
+Usage: python3 hofstede_imputation.py [input.csv] [--output output/masterdata.csv] [--method iterative|knn]
+
+Many countries have no published lto or ivr score. Clustering needs every dimension, so without
+imputation those countries drop out of the clustered set. Each missing score is estimated from
+the country's other dimensions plus its region (one-hot), using an IterativeImputer (the
+approach of Missed_data_imputation.ipynb) or a distance-weighted KNNImputer. Imputed values
+are flagged in the <dim>_imputed columns. The fitted imputer is cached by the hash of its
+input and parameters, so unchanged masterdata is only transformed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401 - registers IterativeImputer
+from sklearn.impute import IterativeImputer, KNNImputer
+from sklearn.preprocessing import StandardScaler
+
+from cluster_labels import CULTURAL_DIMENSIONS
+from data_cache import CACHE_DIR, cache_path, file_sha256
+from masterdata_schema import HOFSTEDE_RANGE, IMPUTATION_FLAGS
+from profiling import log, span
+
+IMPUTER_VERSION = 1
+IMPUTATION_METHODS = ['iterative', 'knn']
+REPORT_PATH = 'output/imputation_report.json'
+# Weight of the region one-hot columns relative to one standardized dimension
+REGION_WEIGHT = 1.0
+# Imputed scores keep one decimal, like the published float scores
+DECIMALS = 1
+
+def imputation_matrix(df, regions):
+    """
+    Standardized dimensions (NaN where missing) next to the weighted region one-hot columns
+
+    regions fixes the one-hot columns, so a cached imputer sees the columns it was fitted on;
+    rows without a region fall back to their continent.
+    """
+    group = df['region'].fillna(df['continent']).astype(object)
+    onehot = (group.to_numpy()[:, None] == np.asarray(regions, dtype=object)[None, :]).astype(float)
+    return np.hstack([df[CULTURAL_DIMENSIONS].to_numpy(dtype=float, na_value=np.nan), REGION_WEIGHT * onehot])
+
+def fit_imputer(df, method='iterative', n_neighbors=5, random_state=42):
+    """
+    Fitted imputer with the scaler and region columns needed to apply it
+    """
+    if method not in IMPUTATION_METHODS:
+        raise ValueError(f"Unknown imputation method: {method}")
+
+    regions = sorted(df['region'].fillna(df['continent']).dropna().unique())
+    scaler = StandardScaler().fit(df[CULTURAL_DIMENSIONS].to_numpy(dtype=float, na_value=np.nan))
+    X = imputation_matrix(df, regions)
+    X[:, :len(CULTURAL_DIMENSIONS)] = scaler.transform(X[:, :len(CULTURAL_DIMENSIONS)])
+
+    if method == 'knn':
+        imputer = KNNImputer(n_neighbors=n_neighbors, weights='distance')
+    else:
+        imputer = IterativeImputer(max_iter=10, random_state=random_state, initial_strategy='mean')
+    imputer.fit(X)
+    return {'method': method, 'imputer': imputer, 'scaler': scaler, 'regions': regions}
+
+def apply_imputer(model, df):
+    """Copy of df with missing dimensions filled in and the imputation flag columns set"""
+    X = imputation_matrix(df, model['regions'])
+    dims = slice(None, len(CULTURAL_DIMENSIONS))
+    missing = np.isnan(X[:, dims])
+    X[:, dims] = model['scaler'].transform(X[:, dims])
+
+    filled = model['scaler'].inverse_transform(model['imputer'].transform(X)[:, dims])
+    filled = np.clip(np.round(filled, DECIMALS), *HOFSTEDE_RANGE)
+
+    result = df.copy()
+    for j, dim in enumerate(CULTURAL_DIMENSIONS):
+        if missing[:, j].any():
+            # Required dimensions are integers; only the optional float scores can be missing
+            result[dim] = np.where(missing[:, j], filled[:, j], result[dim].to_numpy(dtype=float, na_value=np.nan))
+    for dim, flag in IMPUTATION_FLAGS.items():
+        # Flags from an earlier pass (imputing a file in place) are kept
+        earlier = df[flag].fillna(0).to_numpy(dtype=np.int64) if flag in df else 0
+        result[flag] = earlier | missing[:, CULTURAL_DIMENSIONS.index(dim)]
+    return result
+
+def load_imputer(csv_path, df, method='iterative', n_neighbors=5, random_state=42, cache_dir=CACHE_DIR):
+    """Fitted imputer for csv_path, reused from the cache when input and parameters are unchanged"""
+    params = {'version': IMPUTER_VERSION, 'method': method, 'n_neighbors': n_neighbors,
+              'random_state': random_state, 'region_weight': REGION_WEIGHT}
+    key = hashlib.sha256(f"{file_sha256(csv_path)}:{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
+    path = cache_path('hofstede_imputer', key, cache_dir, ext='pkl')
+
+    if os.path.exists(path):
+        log(f"Using cached {method} imputer ({os.path.basename(path)})")
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    with span('fit'):
+        model = fit_imputer(df, method, n_neighbors, random_state)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(path + '.tmp', path)
+    return model
+
+def imputation_report(imputed, source, method):
+    """JSON-ready list of every imputed value"""
+    flags = list(IMPUTATION_FLAGS.items())
+    rows = imputed[imputed[[flag for _, flag in flags]].any(axis=1)]
+    return {
+        'source': source,
+        'method': method,
+        'rows': len(imputed),
+        'imputed': {dim: int(imputed[flag].sum()) for dim, flag in flags},
+        'countries': [
+            {'country': row['country'],
+             'values': {dim: float(row[dim]) for dim, flag in flags if row[flag]}}
+            for _, row in rows.iterrows()
+        ],
+    }
+
+def impute_masterdata(csv_path, output_path='output/masterdata.csv', report_path=REPORT_PATH,
+                      method='iterative', n_neighbors=5, random_state=42, cache_dir=CACHE_DIR):
+    """
+    Write csv_path with missing Hofstede scores imputed and flagged, plus a report of the
+    imputed values
+    """
+    df = pd.read_csv(csv_path)
+    model = load_imputer(csv_path, df, method, n_neighbors, random_state, cache_dir)
+    with span('impute'):
+        imputed = apply_imputer(model, df)
+    imputed.to_csv(output_path, index=False, quoting=0)
+
+    report = imputation_report(imputed, csv_path, method)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    counts = ', '.join(f"{dim} {count}" for dim, count in report['imputed'].items())
+    log(f"Imputed missing Hofstede scores ({method}): {counts}; "
+        f"{len(report['countries'])} of {len(imputed)} countries affected")
+    return imputed, report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Impute missing Hofstede scores in masterdata")
+    parser.add_argument('input', nargs='?', default='output/masterdata.csv')
+    parser.add_argument('--output', default='output/masterdata.csv')
+    parser.add_argument('--report', default=REPORT_PATH)
+    parser.add_argument('--method', choices=IMPUTATION_METHODS, default='iterative')
+    parser.add_argument('--neighbors', type=int, default=5, help="neighbours for --method knn")
+    args = parser.parse_args()
+
+    impute_masterdata(args.input, args.output, args.report, args.method, args.neighbors)
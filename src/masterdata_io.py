@@ -0,0 +1,122 @@
+"""
+Typed columnar copies of masterdata: Parquet for Python, a binary typed-array bundle for the browser
+
+The CSV stays the source of truth; readers use the Parquet copy when it is at least as new.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from masterdata_schema import coerce_masterdata
+from profiling import log
+
+# Bundle layout: b'CFB1', uint32 header length, JSON header, then 8-byte aligned column buffers
+BUNDLE_MAGIC = b'CFB1'
+BUNDLE_VERSION = 1
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def bundle_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.bin'
+
+def fresh_parquet_path(csv_path):
+    """The Parquet copy of csv_path if it exists and is not older than the CSV, else None"""
+    typed_path = parquet_path(csv_path)
+    if os.path.exists(typed_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(typed_path) >= os.path.getmtime(csv_path)):
+        return typed_path
+    return None
+
+def read_masterdata(csv_path='output/masterdata.csv'):
+    """
+    Load masterdata, preferring the typed Parquet copy when it is not older than the CSV
+    """
+    typed_path = fresh_parquet_path(csv_path)
+    if typed_path:
+        return pd.read_parquet(typed_path)
+    return pd.read_csv(csv_path)
+
+def masterdata_columns(csv_path='output/masterdata.csv'):
+    """Column names without loading any rows"""
+    typed_path = fresh_parquet_path(csv_path)
+    if typed_path:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(typed_path).schema_arrow.names
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+def iter_masterdata(csv_path='output/masterdata.csv', chunksize=100000, columns=None):
+    """
+    Yield masterdata in frames of at most chunksize rows, with the same Parquet preference
+    as read_masterdata; only the requested columns are parsed
+    """
+    typed_path = fresh_parquet_path(csv_path)
+    if typed_path:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(typed_path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(csv_path, chunksize=chunksize, usecols=columns)
+
+def _encode_column(series):
+    """
+    Column header entry plus its raw little-endian buffer (None for inline string columns)
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        values = series.astype('object').where(series.notna(), '')
+        categories, codes = np.unique(values.to_numpy(dtype=str), return_inverse=True)
+        # Dictionary-encode repeated labels such as continent/region
+        if len(categories) <= 0xFFFF and len(categories) < len(values) // 2:
+            return {'type': 'dict', 'categories': categories.tolist()}, codes.astype('<u2').tobytes()
+        return {'type': 'string', 'values': values.tolist()}, None
+
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    is_int = not np.isnan(values).any() and np.all(values == np.round(values))
+    if is_int and np.abs(values).max(initial=0) < 2 ** 31:
+        return {'type': 'int32'}, values.astype('<i4').tobytes()
+    return {'type': 'float64'}, values.astype('<f8').tobytes()
+
+def to_binary_bundle(df):
+    """Serialize a frame to the bundle read by assets/app.js"""
+    columns = []
+    buffers = []
+    offset = 0
+    for col in df.columns:
+        entry, buffer = _encode_column(df[col])
+        entry['name'] = str(col)
+        if buffer is not None:
+            entry['offset'] = offset
+            entry['length'] = len(buffer)
+            buffers.append(buffer + b'\0' * (-len(buffer) % 8))
+            offset += len(buffers[-1])
+        columns.append(entry)
+
+    header = json.dumps(
+        {'version': BUNDLE_VERSION, 'rows': len(df), 'columns': columns},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+    # Pad the header so column buffers start 8-byte aligned (typed arrays need aligned views)
+    header += b' ' * (-(len(BUNDLE_MAGIC) + 4 + len(header)) % 8)
+
+    return BUNDLE_MAGIC + struct.pack('<I', len(header)) + header + b''.join(buffers)
+
+def write_masterdata_artifacts(csv_path='output/masterdata.csv'):
+    """
+    Write the Parquet copy and browser bundle next to masterdata.csv, returning their paths
+    """
+    # Restore the schema types (e.g. nullable integer Hofstede scores) the CSV round trip loses
+    df = coerce_masterdata(pd.read_csv(csv_path))
+
+    typed_path = parquet_path(csv_path)
+    df.to_parquet(typed_path, index=False)
+
+    browser_path = bundle_path(csv_path)
+    with open(browser_path, 'wb') as f:
+        f.write(to_binary_bundle(df))
+
+    log(f"Columnar masterdata written: {typed_path}, {browser_path}")
+    return typed_path, browser_path
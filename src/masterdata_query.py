@@ -0,0 +1,130 @@
+"""
+In-memory indexed masterdata table answering filtered, projected, sorted and paginated queries
+"""
+
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from masterdata_io import read_masterdata
+
+# Columns with a hash index for equality filters (matched case-insensitively)
+INDEXED_COLUMNS = ['continent', 'region', 'country']
+MAX_LIMIT = 1000
+
+class QueryError(ValueError):
+    pass
+
+class MasterdataTable:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.columns = [str(col) for col in self.df.columns]
+        self.years = sorted({col for col in self.columns if re.fullmatch(r'\d{4}', col)})
+
+        # value -> row positions for each indexed column
+        self.indexes = {}
+        for col in INDEXED_COLUMNS:
+            if col in self.df.columns:
+                keys = self.df[col].astype('string').str.casefold()
+                self.indexes[col] = {key: np.asarray(rows) for key, rows in keys.groupby(keys).indices.items()}
+
+        # Row values as Python objects (NaN/NA -> None), ready for JSON
+        self.values = self.df.astype(object).where(self.df.notna(), None).to_numpy()
+        self.column_positions = {col: i for i, col in enumerate(self.columns)}
+        self._sort_orders = {}
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(read_masterdata(path))
+
+    def year_columns(self, year):
+        return [col for col in (year, f"{year}_male", f"{year}_female") if col in self.column_positions]
+
+    def normalize_query(self, params):
+        """
+        Validate raw query parameters ({name: [values]}) into a hashable canonical query
+
+        Multi-valued parameters accept repeated keys or comma-separated values.
+        """
+        def values(name):
+            return sorted({v.strip() for raw in params.get(name, []) for v in raw.split(',') if v.strip()})
+
+        filters = tuple((col, tuple(v.casefold() for v in values(col))) for col in INDEXED_COLUMNS if values(col))
+
+        columns = values('columns')
+        years = values('years')
+        unknown_years = [y for y in years if y not in self.years]
+        if unknown_years:
+            raise QueryError(f"Unknown years: {', '.join(unknown_years)}")
+
+        if columns or years:
+            selected = ['country'] + columns + [col for year in years for col in self.year_columns(year)]
+            # Keep table order so equal queries produce identical responses
+            selected = [col for col in self.columns if col in set(selected)]
+        else:
+            selected = list(self.columns)
+        unknown_columns = [col for col in columns if col not in self.column_positions]
+        if unknown_columns:
+            raise QueryError(f"Unknown columns: {', '.join(unknown_columns)}")
+
+        sort = (params.get('sort') or [''])[0].strip()
+        if sort and sort.lstrip('-') not in self.column_positions:
+            raise QueryError(f"Unknown sort column: {sort.lstrip('-')}")
+
+        try:
+            offset = int((params.get('offset') or ['0'])[0])
+            limit = min(int((params.get('limit') or [str(MAX_LIMIT)])[0]), MAX_LIMIT)
+        except ValueError:
+            raise QueryError("offset and limit must be integers")
+        if offset < 0 or limit < 0:
+            raise QueryError("offset and limit must be non-negative")
+
+        return filters, tuple(selected), sort, offset, limit
+
+    def _sort_order(self, column, descending=False):
+        """Stable row order for a column, computed once; missing values last in both directions"""
+        if (column, descending) not in self._sort_orders:
+            series = self.df[column]
+            missing = series.isna().to_numpy()
+            present = np.flatnonzero(~missing)
+            if pd.api.types.is_numeric_dtype(series):
+                keys = series.astype('float64').to_numpy()[present]
+            else:
+                keys = series.astype('string').str.casefold().to_numpy(dtype=object)[present].astype(str)
+            # Ranks instead of keys, so descending is a negation that keeps ties in row order
+            ranks = np.unique(keys, return_inverse=True)[1]
+            order = present[np.argsort(-ranks if descending else ranks, kind='stable')]
+            self._sort_orders[column, descending] = np.concatenate([order, np.flatnonzero(missing)])
+        return self._sort_orders[column, descending]
+
+    def query(self, normalized):
+        """Run a normalized query, returning the JSON-ready response payload"""
+        filters, selected, sort, offset, limit = normalized
+
+        rows = np.arange(len(self.df))
+        for col, keys in filters:
+            index = self.indexes[col]
+            matches = [index[key] for key in keys if key in index]
+            rows = np.intersect1d(rows, np.concatenate(matches) if matches else np.empty(0, dtype=int))
+
+        if sort:
+            order = self._sort_order(sort.lstrip('-'), descending=sort.startswith('-'))
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[rows] = True
+            rows = order[mask[order]]
+
+        page = rows[offset:offset + limit]
+        col_idx = [self.column_positions[col] for col in selected]
+
+        return {
+            'total': int(len(rows)),
+            'offset': offset,
+            'limit': limit,
+            'columns': list(selected),
+            'rows': self.values[np.ix_(page, col_idx)].tolist() if len(page) else [],
+        }
+
+    def query_json(self, normalized):
+        return json.dumps(self.query(normalized), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Declared schema for masterdata: column types, value ranges and required fields
+Usage: python3 masterdata_schema.py [output/masterdata.csv] [--rejects output/masterdata_rejects.json]
+
+validate_masterdata coerces the table and checks every rule in one vectorized pass over the
+numeric block. Rows that break a rule go to a rejects report instead of being rediscovered
+by each downstream stage. load_masterdata caches the validated frame by the hash of its
+source file.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, cache_path, file_sha256, read_cached_frame
+
+SCHEMA_VERSION = 1
+# UN DESA survey years, as masterdata column names
+YEARS = ['1990', '1995', '2000', '2005', '2010', '2015', '2020', '2024']
+# Hofstede scores are nominally 0-100; a few published scores run above 100
+HOFSTEDE_RANGE = (0, 120)
+
+# column -> (dtype, minimum, maximum, required); missing optional counts become 0
+COLUMN_SCHEMA = {
+    'country': ('str', None, None, True),
+    'continent': ('str', None, None, True),
+    'region': ('str', None, None, False),
+    'pdi': ('Int64', *HOFSTEDE_RANGE, True),
+    'idv': ('Int64', *HOFSTEDE_RANGE, True),
+    'mas': ('Int64', *HOFSTEDE_RANGE, True),
+    'uai': ('Int64', *HOFSTEDE_RANGE, True),
+    'lto': ('float64', *HOFSTEDE_RANGE, False),
+    'ivr': ('float64', *HOFSTEDE_RANGE, False),
+}
+for _year in YEARS:
+    for _suffix in ['', '_male', '_female']:
+        COLUMN_SCHEMA[f"{_year}{_suffix}"] = ('int64', 0, None, False)
+# 1 where hofstede_imputation filled in a missing optional score
+IMPUTATION_FLAGS = {'lto': 'lto_imputed', 'ivr': 'ivr_imputed'}
+for _flag in IMPUTATION_FLAGS.values():
+    COLUMN_SCHEMA[_flag] = ('int64', 0, 1, False)
+# Population 0 marks regions (e.g. "South America") and failed lookups, not countries
+COLUMN_SCHEMA['population'] = ('int64', 1, None, True)
+
+KEY_COLUMN = 'country'
+REJECTS_PATH = 'output/masterdata_rejects.json'
+
+def schema_digest():
+    """Hash of the schema, so cached frames are rebuilt when a rule changes"""
+    spec = json.dumps({'version': SCHEMA_VERSION, 'columns': COLUMN_SCHEMA}, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+def _split_columns(df):
+    numeric = [col for col, spec in COLUMN_SCHEMA.items() if spec[0] != 'str' and col in df.columns]
+    strings = [col for col, spec in COLUMN_SCHEMA.items() if spec[0] == 'str' and col in df.columns]
+    return numeric, strings
+
+def _numeric_block(df, columns):
+    """
+    float64 matrix of the numeric schema columns, plus a mask of values that were present
+    but did not parse as numbers (they become NaN)
+    """
+    block = df[columns]
+    text = [col for col in columns if not pd.api.types.is_numeric_dtype(block[col])]
+    unparsed = np.zeros(block.shape, dtype=bool)
+    if text:
+        present = block[text].notna().to_numpy()
+        block = block.copy()
+        block[text] = block[text].apply(pd.to_numeric, errors='coerce')
+        unparsed[:, [columns.index(col) for col in text]] = present & block[text].isna().to_numpy()
+    return block.to_numpy(dtype=float, na_value=np.nan), unparsed
+
+def _string_block(df, columns):
+    """Stripped string columns with blanks as missing, in pandas' default string dtype"""
+    block = df[columns].apply(lambda s: s.str.strip() if pd.api.types.is_string_dtype(s) else s)
+    return block.mask(block == '')
+
+def _typed_frame(df, values, text, numeric):
+    """df with the schema columns replaced by their coerced values, in the original column order"""
+    columns = {col: text[col].array for col in text.columns}
+    for j, col in enumerate(numeric):
+        dtype, column = COLUMN_SCHEMA[col][0], values[:, j]
+        if dtype == 'int64':
+            columns[col] = np.rint(np.nan_to_num(column, nan=0.0)).astype(np.int64)
+        elif dtype == 'Int64':
+            missing = np.isnan(column)
+            columns[col] = pd.arrays.IntegerArray(np.rint(np.where(missing, 0, column)).astype(np.int64), missing)
+        else:
+            columns[col] = column
+    return pd.DataFrame({col: columns[col] if col in columns else df[col].to_numpy() for col in df.columns},
+                        index=df.index)
+
+def coerce_masterdata(df):
+    """Schema types for every schema column present, without dropping any row"""
+    numeric, strings = _split_columns(df)
+    values, _ = _numeric_block(df, numeric)
+    return _typed_frame(df, values, _string_block(df, strings), numeric)
+
+def validate_masterdata(df):
+    """
+    Coerce df to the schema and split off rows that break it
+
+    Returns the typed valid rows and a rejects frame (row, country, reasons).
+    """
+    absent = [col for col, spec in COLUMN_SCHEMA.items() if spec[3] and col not in df.columns]
+    if absent:
+        raise ValueError(f"masterdata is missing required columns: {', '.join(absent)}")
+
+    numeric, strings = _split_columns(df)
+    values, unparsed = _numeric_block(df, numeric)
+    text = _string_block(df, strings)
+
+    minimum = np.array([-np.inf if COLUMN_SCHEMA[col][1] is None else COLUMN_SCHEMA[col][1] for col in numeric])
+    maximum = np.array([np.inf if COLUMN_SCHEMA[col][2] is None else COLUMN_SCHEMA[col][2] for col in numeric])
+    required = np.array([COLUMN_SCHEMA[col][3] for col in numeric])
+
+    # Every check over the whole numeric block at once; each is a (rows, columns) mask
+    checks = {
+        'missing': np.isnan(values) & required & ~unparsed,
+        'not a number': unparsed,
+        'not finite': np.isinf(values),
+        'below minimum': values < minimum,
+        'above maximum': np.isfinite(values) & (values > maximum),
+    }
+    string_missing = text.isna().to_numpy() & np.array([COLUMN_SCHEMA[col][3] for col in strings])
+    duplicate = (text[KEY_COLUMN].duplicated() & text[KEY_COLUMN].notna()).to_numpy()
+
+    rejected = duplicate | string_missing.any(axis=1)
+    for mask in checks.values():
+        rejected |= mask.any(axis=1)
+
+    # Reasons are only spelled out for the (few) rejected rows
+    bad = np.flatnonzero(rejected)
+    reasons = {row: [] for row in bad}
+    for problem, mask in checks.items():
+        for row, col in zip(*np.nonzero(mask[bad])):
+            value = df[numeric[col]].iat[bad[row]] if problem == 'not a number' else f"{values[bad[row], col]:g}"
+            reasons[bad[row]].append(f"{numeric[col]}: {problem} ({value})")
+    for row, col in zip(*np.nonzero(string_missing[bad])):
+        reasons[bad[row]].append(f"{strings[col]}: missing")
+    for row in bad[duplicate[bad]]:
+        reasons[row].append(f"{KEY_COLUMN}: duplicate")
+
+    rejects = pd.DataFrame({
+        'row': bad,
+        'country': text[KEY_COLUMN].to_numpy()[bad],
+        'reasons': [reasons[row] for row in bad],
+    })
+    valid = _typed_frame(df[~rejected], values[~rejected], text[~rejected], numeric)
+    return valid.reset_index(drop=True), rejects
+
+def rejects_report(rejects, source, n_rows):
+    """JSON-ready rejects report"""
+    return {
+        'source': source,
+        'schema_version': SCHEMA_VERSION,
+        'rows': n_rows,
+        'rejected': [
+            {'row': int(r.row), 'country': None if pd.isna(r.country) else r.country, 'reasons': r.reasons}
+            for r in rejects.itertuples()
+        ],
+    }
+
+def load_masterdata(csv_path='output/masterdata.csv', cache_dir=CACHE_DIR):
+    """
+    Validated masterdata and its rejects report, cached by file and schema hash
+    """
+    key = hashlib.sha256(f"{file_sha256(csv_path)}:{schema_digest()}".encode()).hexdigest()
+    frame_path = cache_path('masterdata_valid', key, cache_dir)
+    report_path = cache_path('masterdata_rejects', key, cache_dir, ext='json')
+
+    valid = read_cached_frame(frame_path)
+    if valid is not None and os.path.exists(report_path):
+        with open(report_path) as f:
+            return valid, json.load(f)
+
+    df = pd.read_csv(csv_path)
+    valid, rejects = validate_masterdata(df)
+    # Written as-is so cached and fresh frames share dtypes (write_cached_frame would recast strings)
+    os.makedirs(cache_dir, exist_ok=True)
+    valid.to_parquet(frame_path, index=False)
+    report = rejects_report(rejects, csv_path, len(df))
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return valid, report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate masterdata against its schema")
+    parser.add_argument('path', nargs='?', default='output/masterdata.csv')
+    parser.add_argument('--rejects', default=REJECTS_PATH, help="rejects report path")
+    args = parser.parse_args()
+
+    valid, report = load_masterdata(args.path)
+    with open(args.rejects, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(valid)} valid rows, {len(report['rejected'])} rejected (report: {args.rejects})")
+    for reject in report['rejected']:
+        print(f"  {reject['country']}: {'; '.join(reject['reasons'])}")
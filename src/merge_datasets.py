@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Merge processed UN DESA migration data with Hofstede cultural dimensions into masterdata
+Usage: python3 merge_datasets.py [migration_csv] [hofstede_csv] [output_csv]
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+from country_matcher import CountryMatcher, clean_country_name
+from profiling import log
+
+MIGRATION_INPUT = 'output/migration_data_processed.csv'
+HOFSTEDE_INPUT = 'raw_data/hofstede_country_scores.csv'
+MASTERDATA_OUTPUT = 'output/masterdata.csv'
+
+HOFSTEDE_COLUMNS = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr']
+
+# Display names for UN DESA names that stay verbose after cleaning
+SPECIFIC_MAPPINGS = {
+    "China, Hong Kong SAR": "Hong Kong",
+    "China, Taiwan Province of China": "Taiwan",
+    "United Republic of Tanzania": "Tanzania"
+}
+
+# Words kept lowercase when title-casing continent/region names
+SPECIAL_WORDS = {
+    ' And ': ' and ',
+    ' The ': ' the ',
+    ' Of ': ' of ',
+    ' In ': ' in ',
+    ' To ': ' to ',
+    ' For ': ' for ',
+    ' With ': ' with ',
+    ' At ': ' at ',
+    ' By ': ' by ',
+    ' From ': ' from ',
+    ' Up ': ' up ',
+    ' On ': ' on ',
+    ' As ': ' as '
+}
+
+def fix_string_formatting(series):
+    """Convert ALL CAPS names to proper title case"""
+    fixed = series.str.title()
+    for old, new in SPECIAL_WORDS.items():
+        fixed = fixed.str.replace(old, new, regex=False)
+    return fixed
+
+def merge_migration_hofstede(migration_df, hofstede_df):
+    """
+    Join the migration table to Hofstede scores on matched country names and tidy the result
+    """
+    matcher = CountryMatcher(hofstede_df['country'])
+    country_mapping = matcher.mapping(migration_df['country'])
+    log(f"Countries matched: {len(country_mapping)} of {len(migration_df)}")
+
+    filtered_migration = migration_df[migration_df['country'].isin(list(country_mapping))].copy()
+    filtered_migration['hofstede_country'] = filtered_migration['country'].map(country_mapping)
+
+    # Several migration names can map to one Hofstede row - keep the last, as the notebook did
+    filtered_migration = filtered_migration.drop_duplicates('hofstede_country', keep='last')
+
+    merged_df = pd.merge(
+        filtered_migration,
+        hofstede_df[['country'] + HOFSTEDE_COLUMNS].rename(columns={'country': 'hofstede_country'}),
+        on='hofstede_country',
+        how='inner'
+    ).drop('hofstede_country', axis=1)
+
+    # Reorder columns
+    base_columns = ['country', 'continent', 'region']
+    year_columns = [col for col in merged_df.columns if col not in base_columns + HOFSTEDE_COLUMNS]
+    masterdata_df = merged_df[base_columns + HOFSTEDE_COLUMNS + year_columns].copy()
+
+    # Clean country names and apply display-name fixes
+    masterdata_df['country'] = masterdata_df['country'].map(clean_country_name).replace(SPECIFIC_MAPPINGS)
+
+    # Convert numerical columns to proper types (lto/ivr stay float to preserve NaN)
+    masterdata_df[['pdi', 'idv', 'mas', 'uai']] = (
+        masterdata_df[['pdi', 'idv', 'mas', 'uai']].apply(pd.to_numeric, errors='coerce').astype('Int64')
+    )
+    masterdata_df[['lto', 'ivr']] = masterdata_df[['lto', 'ivr']].apply(pd.to_numeric, errors='coerce')
+    masterdata_df[year_columns] = (
+        masterdata_df[year_columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+    )
+
+    masterdata_df['continent'] = fix_string_formatting(masterdata_df['continent'])
+    masterdata_df['region'] = fix_string_formatting(masterdata_df['region'])
+
+    return masterdata_df
+
+def merge_datasets(migration_path=MIGRATION_INPUT, hofstede_path=HOFSTEDE_INPUT, output_path=MASTERDATA_OUTPUT):
+    """
+    Read both inputs, merge them and export masterdata
+    """
+    migration_df = pd.read_csv(migration_path)
+    hofstede_df = pd.read_csv(hofstede_path)
+
+    log(f"Migration data: {migration_df.shape[0]} countries")
+    log(f"Hofstede data: {hofstede_df.shape[0]} countries")
+
+    masterdata_df = merge_migration_hofstede(migration_df, hofstede_df)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    masterdata_df.to_csv(output_path, index=False, quoting=0)
+    log(f"Exported masterdata: {masterdata_df.shape[0]} countries × {masterdata_df.shape[1]} columns")
+
+    return masterdata_df
+
+if __name__ == "__main__":
+    migration_path = sys.argv[1] if len(sys.argv) > 1 else MIGRATION_INPUT
+    hofstede_path = sys.argv[2] if len(sys.argv) > 2 else HOFSTEDE_INPUT
+    output_path = sys.argv[3] if len(sys.argv) > 3 else MASTERDATA_OUTPUT
+    merge_datasets(migration_path, hofstede_path, output_path)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Origin x destination migrant stock as sparse matrices over the masterdata countries
+Usage: python3 migration_flows.py [workbook] [--masterdata output/masterdata.csv]
+                                  [--clusters output/country_clusters.csv] [--output-dir output] [--header 10]
+
+Reads the UN DESA "stock by sex, destination and origin" workbook. Every survey year becomes
+a CSR matrix with one row per origin and one column per destination, indexed by the masterdata
+country keys. Only non-zero corridors are stored. Stock from or to countries outside
+masterdata is kept as per-country totals, so inflows and outflows still add up.
+
+Aggregations (by continent, region or Hofstede cluster) are sparse products with a
+country-to-group indicator matrix. The cultural distance vs flow volume correlations are
+computed over the stored corridors in fixed-size NumPy batches.
+"""
+
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import rankdata
+
+from artifact_manifest import write_artifacts
+from country_matcher import clean_country_name
+from data_cache import CACHE_DIR
+from merge_datasets import SPECIFIC_MAPPINGS
+from masterdata_schema import YEARS
+from migration_ingest import read_undesa_sheet
+from profiling import log, span
+
+UNDESA_OD_WORKBOOK = 'raw_data/undesa_pd_2024_ims_stock_by_sex_destination_and_origin.xlsx'
+FLOWS_PATH = 'output/migration_flows.npz'
+# Row of Table 1 holding the column headers
+OD_HEADER_ROW = 10
+# UN M49 codes of 900 and above are regions, income/development groups and "Other"
+AGGREGATE_CODE_MIN = 900
+
+HOFSTEDE_DIMENSIONS = ['pdi', 'idv', 'mas', 'uai', 'lto', 'ivr']
+# Corridors whose distances are computed per batch
+DISTANCE_BATCH = 1 << 18
+TOP_CORRIDORS = 20
+
+def _column(df_raw, *words):
+    """First column whose header contains every word (case-insensitive)"""
+    for col in df_raw.columns:
+        header = str(col).casefold()
+        if all(word in header for word in words):
+            return col
+    raise ValueError(f"No column with {' and '.join(words)!r} in the header - is the header row right?")
+
+def year_columns(df_raw):
+    """Both-sexes stock column per survey year (the first of the duplicated year headers)"""
+    columns = {}
+    for col in df_raw.columns:
+        match = re.fullmatch(r'(\d{4})(\.0)?', str(col).strip())
+        if match and match.group(1) in YEARS:
+            columns.setdefault(match.group(1), col)
+    return columns
+
+def masterdata_key(name):
+    """The masterdata spelling of a UN DESA name (see merge_datasets)"""
+    name = clean_country_name(str(name))
+    return SPECIFIC_MAPPINGS.get(name, name)
+
+def od_frame(df_raw):
+    """
+    Country-to-country rows of the raw sheet: origin, destination and stock per year
+
+    Regional and group aggregates (on either side) are dropped by their location code.
+    """
+    destination = _column(df_raw, 'destination', 'country')
+    origin = _column(df_raw, 'origin', 'country')
+    destination_code = pd.to_numeric(df_raw[_column(df_raw, 'code', 'destination')], errors='coerce')
+    origin_code = pd.to_numeric(df_raw[_column(df_raw, 'code', 'origin')], errors='coerce')
+    years = year_columns(df_raw)
+    if not years:
+        raise ValueError("No survey year columns found in the origin/destination table")
+
+    countries = (destination_code < AGGREGATE_CODE_MIN) & (origin_code < AGGREGATE_CODE_MIN)
+    frame = pd.DataFrame({
+        'origin': df_raw.loc[countries, origin].astype(str).map(masterdata_key).to_numpy(object),
+        'destination': df_raw.loc[countries, destination].astype(str).map(masterdata_key).to_numpy(object),
+    })
+    for year, col in years.items():
+        frame[year] = pd.to_numeric(df_raw.loc[countries, col], errors='coerce').fillna(0).to_numpy(np.int64)
+    return frame
+
+class MigrationFlows:
+    """
+    Per-year CSR matrices (origin rows, destination columns) over a fixed country index, plus
+    stock exchanged with countries outside that index
+    """
+
+    def __init__(self, countries, matrices, outside_inflow, outside_outflow):
+        self.countries = list(countries)
+        self.index = {country: i for i, country in enumerate(self.countries)}
+        self.matrices = matrices
+        self.outside_inflow = outside_inflow
+        self.outside_outflow = outside_outflow
+
+    @property
+    def years(self):
+        return sorted(self.matrices)
+
+    @classmethod
+    def from_frame(cls, frame, countries):
+        """Build the matrices from od_frame rows; duplicate corridors are summed"""
+        countries = list(countries)
+        index = pd.Series(np.arange(len(countries)), index=countries)
+        o = frame['origin'].map(index).to_numpy()
+        d = frame['destination'].map(index).to_numpy()
+        inside_o, inside_d = ~np.isnan(o), ~np.isnan(d)
+        both = inside_o & inside_d
+        n = len(countries)
+
+        matrices, outside_inflow, outside_outflow = {}, {}, {}
+        years = [col for col in frame.columns if col not in ('origin', 'destination')]
+        for year in years:
+            stock = frame[year].to_numpy(np.int64)
+            keep = both & (stock != 0)
+            matrices[year] = sparse.csr_matrix(
+                (stock[keep], (o[keep].astype(np.int64), d[keep].astype(np.int64))), shape=(n, n)
+            )
+            # Stock arriving from / leaving for countries outside the index
+            only_d, only_o = inside_d & ~inside_o, inside_o & ~inside_d
+            outside_inflow[year] = np.bincount(d[only_d].astype(np.int64), weights=stock[only_d], minlength=n).astype(np.int64)
+            outside_outflow[year] = np.bincount(o[only_o].astype(np.int64), weights=stock[only_o], minlength=n).astype(np.int64)
+        return cls(countries, matrices, outside_inflow, outside_outflow)
+
+    def save(self, path=FLOWS_PATH):
+        arrays = {'countries': np.array(self.countries, dtype=str), 'years': np.array(self.years, dtype=str)}
+        for year, matrix in self.matrices.items():
+            arrays[f"{year}_data"] = matrix.data
+            arrays[f"{year}_indices"] = matrix.indices
+            arrays[f"{year}_indptr"] = matrix.indptr
+            arrays[f"{year}_outside_inflow"] = self.outside_inflow[year]
+            arrays[f"{year}_outside_outflow"] = self.outside_outflow[year]
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path=FLOWS_PATH):
+        with np.load(path) as arrays:
+            countries = arrays['countries'].tolist()
+            n = len(countries)
+            matrices, outside_inflow, outside_outflow = {}, {}, {}
+            for year in arrays['years'].tolist():
+                matrices[year] = sparse.csr_matrix(
+                    (arrays[f"{year}_data"], arrays[f"{year}_indices"], arrays[f"{year}_indptr"]), shape=(n, n)
+                )
+                outside_inflow[year] = arrays[f"{year}_outside_inflow"]
+                outside_outflow[year] = arrays[f"{year}_outside_outflow"]
+        return cls(countries, matrices, outside_inflow, outside_outflow)
+
+    def matrix(self, year):
+        return self.matrices[str(year)]
+
+    def inflows(self, year):
+        """Total stock per destination, including arrivals from outside the index"""
+        return np.asarray(self.matrix(year).sum(axis=0)).ravel() + self.outside_inflow[str(year)]
+
+    def outflows(self, year):
+        """Total stock per origin, including departures to outside the index"""
+        return np.asarray(self.matrix(year).sum(axis=1)).ravel() + self.outside_outflow[str(year)]
+
+    def group_indicator(self, labels):
+        """Sparse country x group 0/1 matrix and the group names; unlabelled countries are left out"""
+        labels = pd.Series(labels)
+        # Factorized before aligning, so integer labels (clusters) do not turn into floats
+        codes, groups = pd.factorize(labels, sort=True)
+        codes = pd.Series(codes, index=labels.index).reindex(self.countries).fillna(-1).to_numpy(np.int64)
+        rows = np.flatnonzero(codes >= 0)
+        indicator = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, codes[rows])), shape=(len(self.countries), len(groups))
+        )
+        return indicator, list(groups)
+
+    def aggregate(self, labels, year):
+        """
+        Origin group x destination group stock, for labels mapping country -> group
+        (continent, region, cluster, ...)
+        """
+        indicator, groups = self.group_indicator(labels)
+        totals = (indicator.T @ self.matrix(year) @ indicator).toarray()
+        return pd.DataFrame(totals, index=pd.Index(groups, name='origin'),
+                            columns=pd.Index(groups, name='destination'))
+
+    def top_corridors(self, year, k=TOP_CORRIDORS):
+        """The k largest origin -> destination stocks, largest first"""
+        coo = self.matrix(year).tocoo()
+        k = min(k, coo.nnz)
+        top = np.argpartition(coo.data, -k)[-k:] if k else np.array([], dtype=np.int64)
+        top = top[np.argsort(coo.data[top])[::-1]]
+        return [
+            {'origin': self.countries[coo.row[i]], 'destination': self.countries[coo.col[i]], 'stock': int(coo.data[i])}
+            for i in top
+        ]
+
+def _pearson(x, y):
+    if len(x) < 3 or x.std() == 0 or y.std() == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+def cultural_distance_correlation(flows, scores, year, dimensions=HOFSTEDE_DIMENSIONS, batch_size=DISTANCE_BATCH):
+    """
+    Correlation of Hofstede distance with log stock over every non-zero corridor
+
+    scores is a country-indexed frame of the dimensions. Distances are Euclidean over all
+    dimensions (pairs where either country lacks one are left out of the overall figure) and
+    absolute differences per dimension. Reports Pearson on log1p(stock) and Spearman.
+    """
+    coo = flows.matrix(year).tocoo()
+    off_diagonal = coo.row != coo.col
+    rows, cols = coo.row[off_diagonal], coo.col[off_diagonal]
+    log_stock = np.log1p(coo.data[off_diagonal].astype(float))
+    H = scores.reindex(flows.countries)[dimensions].to_numpy(dtype=float)
+
+    # Gathering H rows for every corridor at once would allocate two more (corridors x dimensions)
+    # temporaries; batches keep those bounded. Dimension-major, so each dimension is contiguous.
+    differences = np.empty((len(dimensions), len(rows)))
+    for start in range(0, len(rows), batch_size):
+        stop = start + batch_size
+        differences[:, start:stop] = np.abs(H[rows[start:stop]] - H[cols[start:stop]]).T
+    distance = np.sqrt((differences ** 2).sum(axis=0))
+    # Ranked once and reused by every dimension with no missing scores
+    stock_ranks = rankdata(log_stock)
+
+    def correlations(x):
+        valid = np.isfinite(x)
+        y, y_ranks = log_stock, stock_ranks
+        if not valid.all():
+            x, y = x[valid], log_stock[valid]
+            y_ranks = rankdata(y)
+        return {
+            'pairs': int(valid.sum()),
+            'pearson_log_stock': _pearson(x, y),
+            'spearman': _pearson(rankdata(x), y_ranks) if len(x) >= 3 else None,
+        }
+
+    return {
+        'year': str(year),
+        'corridors': int(len(rows)),
+        'overall': correlations(distance),
+        'by_dimension': {dim: correlations(differences[j]) for j, dim in enumerate(dimensions)},
+    }
+
+def flow_summary(flows, masterdata, clusters=None, year=None):
+    """JSON-ready aggregations, corridors and correlations for one year (the latest by default)"""
+    year = str(year or flows.years[-1])
+    masterdata = masterdata.set_index('country')
+
+    def grouped(labels):
+        table = flows.aggregate(labels, year)
+        return {
+            'groups': [str(g) for g in table.index],
+            'stock': table.to_numpy().tolist(),
+        }
+
+    summary = {
+        'year': year,
+        'countries': len(flows.countries),
+        'corridors': int(flows.matrix(year).nnz),
+        'total_stock': int(flows.matrix(year).sum()),
+        'by_continent': grouped(masterdata['continent']),
+        'by_region': grouped(masterdata['region']),
+        'top_corridors': flows.top_corridors(year),
+        'cultural_distance': cultural_distance_correlation(flows, masterdata, year),
+    }
+    if clusters is not None:
+        summary['by_cluster'] = grouped(clusters.set_index('country')['cluster'])
+    return summary
+
+def build_migration_flows(workbook=UNDESA_OD_WORKBOOK, masterdata_path='output/masterdata.csv',
+                          clusters_path='output/country_clusters.csv', output_dir='output',
+                          header=OD_HEADER_ROW, cache_dir=CACHE_DIR):
+    """
+    Ingest the workbook into migration_flows.npz and write migration_flows_summary.json,
+    also published as the migration_flows artifact of output_dir
+    """
+    masterdata = pd.read_csv(masterdata_path)
+    clusters = pd.read_csv(clusters_path) if clusters_path and os.path.exists(clusters_path) else None
+
+    with span('read'):
+        df_raw = read_undesa_sheet(workbook, sheet_name='Table 1', header=header, cache_dir=cache_dir)
+        frame = od_frame(df_raw)
+    with span('matrix'):
+        flows = MigrationFlows.from_frame(frame, masterdata['country'])
+        flows.save(os.path.join(output_dir, 'migration_flows.npz'))
+    with span('summary'):
+        summary = flow_summary(flows, masterdata, clusters)
+        with open(os.path.join(output_dir, 'migration_flows_summary.json'), 'w') as f:
+            json.dump(summary, f, separators=(',', ':'))
+        write_artifacts(output_dir, {'migration_flows': summary})
+
+    matched = np.isin(frame['origin'], flows.countries) & np.isin(frame['destination'], flows.countries)
+    log(f"Migration flows: {len(frame):,} country pairs, {matched.sum():,} between masterdata countries; "
+        f"{summary['corridors']:,} non-zero corridors in {summary['year']}")
+    correlation = summary['cultural_distance']['overall']
+    log(f"Cultural distance vs log stock: Pearson {correlation['pearson_log_stock']}, "
+        f"Spearman {correlation['spearman']} over {correlation['pairs']:,} corridors")
+    return flows, summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest UN DESA origin/destination stock into sparse flow matrices")
+    parser.add_argument('workbook', nargs='?', default=UNDESA_OD_WORKBOOK)
+    parser.add_argument('--masterdata', default='output/masterdata.csv')
+    parser.add_argument('--clusters', default='output/country_clusters.csv')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--header', type=int, default=OD_HEADER_ROW, help="row of Table 1 holding the headers")
+    args = parser.parse_args()
+
+    build_migration_flows(args.workbook, args.masterdata, args.clusters, args.output_dir, header=args.header)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Ingest the UN DESA international migrant stock workbook into a per-country table
+Usage: python3 migration_ingest.py [workbook] [output_csv]
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, cache_path, file_sha256, read_cached_frame, write_cached_frame
+from masterdata_schema import YEARS
+from profiling import log
+
+UNDESA_WORKBOOK = 'raw_data/undesa_pd_2024_ims_stock_by_sex_and_destination.xlsx'
+MIGRATION_OUTPUT = 'output/migration_data_processed.csv'
+
+# First year column of Table 1
+YEAR_COLUMN_START = 5
+
+# Header rows that start a continent block in the "Region, ... country or area" column
+CONTINENT_PATTERNS = {
+    "AFRICA": "AFRICA",
+    "Sub-Saharan Africa": "AFRICA",
+    "Northern Africa and Western Asia": "AFRICA",
+    "ASIA": "ASIA",
+    "Central and Southern Asia": "ASIA",
+    "Eastern and South-Eastern Asia": "ASIA",
+    "EUROPE": "EUROPE",
+    "Europe and Northern America": "EUROPE",
+    "LATIN AMERICA AND THE CARIBBEAN": "LATIN AMERICA AND THE CARIBBEAN",
+    "NORTHERN AMERICA": "NORTHERN AMERICA",
+    "OCEANIA": "OCEANIA"
+}
+
+# Substrings that mark a row as a sub-continental region header
+REGION_INDICATORS = [
+    "Eastern", "Western", "Northern", "Southern", "Central", "Middle",
+    "Caribbean", "Melanesia", "Polynesia", "Micronesia",
+    "Australia and New Zealand", "Pacific"
+]
+
+def read_undesa_sheet(path=UNDESA_WORKBOOK, sheet_name="Table 1", header=9, cache_dir=CACHE_DIR):
+    """
+    Read one sheet of the UN DESA workbook, reusing a Parquet copy keyed by the workbook hash
+    """
+    key = file_sha256(path)
+    cached = cache_path(f"undesa_{sheet_name.replace(' ', '_').lower()}_h{header}", key, cache_dir)
+    
+    df_raw = read_cached_frame(cached)
+    if df_raw is not None:
+        log(f"Using cached sheet: {cached}")
+        return df_raw
+    
+    log(f"Parsing {path} ({sheet_name})...")
+    df_raw = pd.read_excel(path, sheet_name=sheet_name, header=header, engine='openpyxl')
+    return write_cached_frame(df_raw, cached)
+
+def map_continents_and_regions(df_clean, name_col):
+    """
+    Assign continent/region to every row by forward-filling the header rows above it
+    
+    Returns the frame's continent and region per row plus a mask selecting country rows.
+    """
+    names = df_clean[name_col].astype('string').fillna('')
+    
+    is_continent = names.isin(list(CONTINENT_PATTERNS))
+    region_pattern = '|'.join(REGION_INDICATORS)
+    is_region = names.str.contains(region_pattern, regex=True) & ~is_continent
+    
+    continent = names.map(CONTINENT_PATTERNS).where(is_continent).ffill()
+    
+    # Region headers set the current region, continent headers reset it
+    region = pd.Series(np.nan, index=names.index, dtype='object')
+    region[is_region] = names[is_region]
+    region[is_continent] = ''
+    region = region.ffill().replace('', np.nan).fillna(continent)
+    
+    is_country = (names != '') & (names != 'nan') & ~is_continent & ~is_region & continent.notna()
+    
+    # A name listed more than once keeps the mapping of its last occurrence
+    mapping = pd.DataFrame({'country': names, 'continent': continent, 'region': region})[is_country]
+    mapping = mapping.drop_duplicates('country', keep='last').set_index('country')
+    
+    return mapping, names.isin(mapping.index)
+
+def build_migration_table(df_raw):
+    """
+    Turn the raw sheet into one row per country with continent, region and stock per year/sex
+    """
+    # Remove development group rows
+    df_clean = df_raw.drop(df_raw.index[3:27]).reset_index(drop=True)
+    region_col = df_clean.columns[1]
+    
+    mapping, country_mask = map_continents_and_regions(df_clean, region_col)
+    df_countries = df_clean[country_mask].reset_index(drop=True)
+    
+    final_df = pd.DataFrame()
+    final_df['country'] = df_countries[region_col]
+    final_df['continent'] = final_df['country'].map(mapping['continent']).fillna('Unknown')
+    final_df['region'] = final_df['country'].map(mapping['region']).fillna('Unknown')
+    
+    # Year data starts at column 5 as three blocks of one column per year: both sexes, male, female
+    for i, year in enumerate(YEARS):
+        for block, suffix in enumerate(['', '_male', '_female']):
+            col_index = YEAR_COLUMN_START + block * len(YEARS) + i
+            if col_index < len(df_countries.columns):
+                values = pd.to_numeric(df_countries[df_countries.columns[col_index]], errors='coerce')
+                final_df[f"{year}{suffix}"] = values.fillna(0).astype(int)
+    
+    return final_df
+
+def ingest_migration_data(input_path=UNDESA_WORKBOOK, output_path=MIGRATION_OUTPUT, cache_dir=CACHE_DIR):
+    """
+    Read (or reuse) the workbook sheet, build the country table and export it to CSV
+    """
+    df_raw = read_undesa_sheet(input_path, cache_dir=cache_dir)
+    final_df = build_migration_table(df_raw)
+    
+    final_df.to_csv(output_path, index=False, quoting=1)
+    log(f"Exported migration data: {final_df.shape[0]} countries × {final_df.shape[1]} columns")
+    
+    return final_df
+
+if __name__ == "__main__":
+    input_path = sys.argv[1] if len(sys.argv) > 1 else UNDESA_WORKBOOK
+    output_path = sys.argv[2] if len(sys.argv) > 2 else MIGRATION_OUTPUT
+    ingest_migration_data(input_path, output_path)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Data-driven migration level thresholds from persisted quantile sketches
+Usage: python3 migration_thresholds.py [--append new_rows.csv] [--sketches output/migration_sketches.json]
+       [--appended output/migration_appended.csv]
+
+One KLL sketch of the immigration ratio per 1000 people is kept for every survey year and for
+every continent and year. Cut points are the 25th/50th/75th percentiles of the sketch, plus
+the fixed 1-per-1000 floor for "Very Low". New rows are merged into the stored sketches
+without revisiting the rows already absorbed. Appended rows are also kept, keyed by country,
+in output/migration_appended.csv: clustering_analysis.py rebuilds the sketches from masterdata
+and merges back only the appended countries masterdata does not have yet, dropping the others
+from the store so no row is counted twice.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cluster_labels import MIGRATION_BINS
+from masterdata_schema import YEARS
+from quantile_sketch import KLLSketch
+
+SKETCH_PATH = 'output/migration_sketches.json'
+APPENDED_ROWS_PATH = 'output/migration_appended.csv'
+APPENDED_COLUMNS = ['country', 'continent', 'population'] + YEARS
+MIGRATION_QUANTILES = [0.25, 0.5, 0.75]
+# Below this ratio migration is "Very Low" regardless of the distribution
+MIGRATION_FLOOR = MIGRATION_BINS[0]
+
+def sketch_key(year, continent=None):
+    return f"{year}" if continent is None else f"{continent}|{year}"
+
+def immigration_ratios(df, years=YEARS):
+    """(rows, years) ratios per 1000 people; rows without population are NaN"""
+    population = df['population'].to_numpy(dtype=float)[:, None]
+    totals = df[[y for y in years]].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = totals / population * 1000
+    ratios[~np.isfinite(ratios)] = np.nan
+    return ratios
+
+def build_sketches(df, years=YEARS, k=200):
+    """Sketches for every year and every (continent, year) from one ratio matrix"""
+    ratios = immigration_ratios(df, years)
+    sketches = {}
+    for j, year in enumerate(years):
+        sketches[sketch_key(year)] = KLLSketch(k).update(ratios[:, j])
+    if 'continent' in df.columns:
+        for continent, rows in df.groupby('continent').indices.items():
+            for j, year in enumerate(years):
+                sketches[sketch_key(year, continent)] = KLLSketch(k).update(ratios[rows, j])
+    return sketches
+
+def merge_sketches(sketches, new_sketches):
+    for key, sketch in new_sketches.items():
+        if key in sketches:
+            sketches[key].merge(sketch)
+        else:
+            sketches[key] = sketch
+    return sketches
+
+def save_sketches(sketches, path=SKETCH_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({key: sketch.to_dict() for key, sketch in sketches.items()}, f, separators=(',', ':'))
+
+def load_sketches(path=SKETCH_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {key: KLLSketch.from_dict(data) for key, data in json.load(f).items()}
+
+def migration_bins(sketch):
+    """Cut points for migration_levels: the floor, then the sketch's quartiles"""
+    if sketch is None or sketch.n == 0:
+        return list(MIGRATION_BINS)
+    quartiles = sketch.quantile(MIGRATION_QUANTILES)
+    return [MIGRATION_FLOOR] + [round(float(max(q, MIGRATION_FLOOR)), 2) for q in quartiles]
+
+def threshold_table(sketches, years=YEARS):
+    """JSON-ready cut points per year and per continent and year"""
+    table = {'quantiles': MIGRATION_QUANTILES, 'by_year': {}, 'by_continent': {}}
+    for key, sketch in sorted(sketches.items()):
+        if '|' in key:
+            continent, year = key.split('|')
+            table['by_continent'].setdefault(continent, {})[year] = migration_bins(sketch)
+        elif key in years:
+            table['by_year'][key] = migration_bins(sketch)
+    return table
+
+def load_appended(path=APPENDED_ROWS_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=APPENDED_COLUMNS)
+    return pd.read_csv(path)
+
+def save_appended(rows, path=APPENDED_ROWS_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rows[APPENDED_COLUMNS].to_csv(path, index=False)
+
+def with_appended(sketches, df, appended_path=APPENDED_ROWS_PATH):
+    """
+    sketches (rebuilt from the rows of df) with the appended countries df lacks merged back in
+
+    Appended rows of countries df already has are dropped from the store, so a rebuild never
+    counts a country twice however often it runs.
+    """
+    appended = load_appended(appended_path)
+    pending = appended[~appended['country'].isin(df['country'])]
+    if len(pending) < len(appended):
+        save_appended(pending, appended_path)
+    return merge_sketches(sketches, build_sketches(pending)) if len(pending) else sketches
+
+def update_sketch_store(df_new, path=SKETCH_PATH, appended_path=APPENDED_ROWS_PATH):
+    """
+    Merge sketches of new rows into the stored sketches and persist them
+
+    The new rows are also kept in the appended store (a later row for the same country
+    replaces the earlier one), so a rebuild of the main store from masterdata keeps them.
+    """
+    rows = pd.concat([load_appended(appended_path), df_new.reindex(columns=APPENDED_COLUMNS)], ignore_index=True)
+    save_appended(rows.drop_duplicates('country', keep='last'), appended_path)
+    sketches = merge_sketches(load_sketches(path), build_sketches(df_new))
+    save_sketches(sketches, path)
+    return sketches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migration level thresholds from quantile sketches")
+    parser.add_argument('--append', help="CSV of new masterdata rows to merge into the stored sketches")
+    parser.add_argument('--sketches', default=SKETCH_PATH)
+    parser.add_argument('--appended', default=APPENDED_ROWS_PATH, help="appended rows kept across rebuilds")
+    args = parser.parse_args()
+
+    if args.append:
+        sketches = update_sketch_store(pd.read_csv(args.append), args.sketches, args.appended)
+    else:
+        sketches = load_sketches(args.sketches)
+    if not sketches:
+        print(f"No sketches at {args.sketches} - run clustering_analysis.py first or pass --append")
+    else:
+        table = threshold_table(sketches)
+        for year, bins in table['by_year'].items():
+            print(f"{year}: {bins}")
+        for continent, years in table['by_continent'].items():
+            print(f"{continent} 2024: {years.get('2024')}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Out-of-core clustering for feature tables too large to load at once
+Usage: python3 out_of_core_clustering.py [--input output/masterdata.csv] [--output-dir output/out_of_core]
+                                         [--chunksize 100000] [--clusters 8] [--epochs 3]
+
+Uses the same feature recipe as clustering_analysis (Hofstede scores plus log-scaled
+immigration ratios), streamed in chunks so peak memory follows the chunk size, not the
+table size:
+
+1. the scaler is fitted with partial_fit, while a bounded random sample of rows is kept
+   to seed the centroids and the migration sketches are updated
+2. MiniBatchKMeans and IncrementalPCA are trained chunk by chunk
+3. a second streaming pass assigns clusters and PCA coordinates, appends them to
+   country_clusters.csv and accumulates the per-cluster summaries
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+from cluster_labels import DIMENSION_TABLE, migration_levels, profile_labels
+from clustering_analysis import CULTURAL_FEATURES, MIGRATION_FEATURES, MIGRATION_RATIO_RANGE, prepare_clustering_data
+from masterdata_io import iter_masterdata, masterdata_columns
+from masterdata_schema import YEARS
+from migration_thresholds import build_sketches, merge_sketches, migration_bins, save_sketches, threshold_table
+from profiling import log, span
+
+DEFAULT_CHUNKSIZE = 100000
+# Rows kept in memory to seed the mini-batch centroids with k-means++
+INIT_SAMPLE_SIZE = 20000
+# Countries listed per cluster in the results JSON (all assignments are in the CSV)
+MAX_EXAMPLES = 20
+
+FEATURES = CULTURAL_FEATURES + MIGRATION_FEATURES
+OUTPUT_COLUMNS = ['country', 'cluster', 'pca_x', 'pca_y'] + MIGRATION_FEATURES
+
+def input_columns(input_path):
+    """Columns the stream needs, restricted to those the table has"""
+    wanted = ['country', 'continent'] + CULTURAL_FEATURES + YEARS + ['population']
+    available = set(masterdata_columns(input_path))
+    return [col for col in wanted if col in available]
+
+def iter_clean_chunks(input_path, chunksize, columns):
+    """Cleaned chunks with immigration ratios; empty chunks are skipped"""
+    for chunk in iter_masterdata(input_path, chunksize, columns):
+        chunk_clean = prepare_clustering_data(chunk)
+        if len(chunk_clean):
+            yield chunk_clean
+
+def chunk_features(chunk_clean):
+    """Unscaled float64 feature matrix of a cleaned chunk (the build_feature_matrix recipe)"""
+    X = chunk_clean[FEATURES].to_numpy(dtype=float)
+    migration = slice(len(CULTURAL_FEATURES), None)
+    X[:, migration] = np.log1p(np.clip(X[:, migration], *MIGRATION_RATIO_RANGE))
+    return X
+
+def update_sample(sample, sample_keys, X, size, rng):
+    """
+    Bottom-k sample: every row gets a random key and the size smallest keys are kept, which
+    is a uniform sample of all rows seen so far
+    """
+    keys = rng.random(len(X))
+    if sample is not None:
+        X = np.concatenate([sample, X])
+        keys = np.concatenate([sample_keys, keys])
+    if len(X) > size:
+        keep = np.argpartition(keys, size)[:size]
+        X, keys = X[keep], keys[keep]
+    return X, keys
+
+def run_out_of_core_clustering(input_path='output/masterdata.csv', output_dir='output/out_of_core',
+                               n_clusters=8, chunksize=DEFAULT_CHUNKSIZE, n_epochs=3, n_init=10,
+                               random_state=42):
+    """
+    Cluster input_path chunk by chunk, writing country_clusters.csv, clustering_results.json
+    and migration_sketches.json to output_dir
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    columns = input_columns(input_path)
+    rng = np.random.default_rng(random_state)
+
+    with span('scale', chunksize=chunksize):
+        scaler = StandardScaler()
+        sample = sample_keys = None
+        sketches = {}
+        n_rows = 0
+        for chunk_clean in iter_clean_chunks(input_path, chunksize, columns):
+            X = chunk_features(chunk_clean)
+            scaler.partial_fit(X)
+            sample, sample_keys = update_sample(sample, sample_keys, X, INIT_SAMPLE_SIZE, rng)
+            merge_sketches(sketches, build_sketches(chunk_clean))
+            n_rows += len(X)
+    if n_rows < n_clusters:
+        raise ValueError(f"{input_path} has {n_rows} usable rows, fewer than {n_clusters} clusters")
+    log(f"Scaler fitted on {n_rows:,} rows in chunks of {chunksize:,}")
+
+    with span('fit', epochs=n_epochs):
+        # Seed from the sample so the result does not depend on the row order of the first chunk
+        init = KMeans(n_clusters=n_clusters, n_init=n_init, random_state=random_state).fit(
+            scaler.transform(sample)).cluster_centers_
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=random_state)
+        pca = IncrementalPCA(n_components=2)
+        for epoch in range(n_epochs):
+            for chunk_clean in iter_clean_chunks(input_path, chunksize, columns):
+                X_scaled = scaler.transform(chunk_features(chunk_clean))
+                kmeans.partial_fit(X_scaled)
+                # IncrementalPCA needs at least n_components rows per batch
+                if epoch == 0 and len(X_scaled) >= pca.n_components:
+                    pca.partial_fit(X_scaled)
+
+    with span('assign'):
+        clusters_path = os.path.join(output_dir, 'country_clusters.csv')
+        counts = np.zeros(n_clusters, dtype=np.int64)
+        sums = np.zeros((n_clusters, len(CULTURAL_FEATURES) + 1))
+        examples = [[] for _ in range(n_clusters)]
+        inertia = 0.0
+        header = True
+        for chunk_clean in iter_clean_chunks(input_path, chunksize, columns):
+            X_scaled = scaler.transform(chunk_features(chunk_clean))
+            labels = kmeans.predict(X_scaled)
+            X_pca = pca.transform(X_scaled)
+            inertia += float(((X_scaled - kmeans.cluster_centers_[labels]) ** 2).sum())
+
+            chunk_out = chunk_clean.assign(cluster=labels, pca_x=X_pca[:, 0], pca_y=X_pca[:, 1])
+            chunk_out[OUTPUT_COLUMNS].to_csv(clusters_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+
+            # Per-cluster sums of the raw scores and 2024 ratio for the profile labels
+            values = chunk_clean[CULTURAL_FEATURES + ['immigration_ratio_2024']].to_numpy(dtype=float)
+            counts += np.bincount(labels, minlength=n_clusters)
+            np.add.at(sums, labels, values)
+            for i in range(n_clusters):
+                if len(examples[i]) < MAX_EXAMPLES:
+                    names = chunk_clean['country'].to_numpy()[labels == i]
+                    examples[i].extend(names[:MAX_EXAMPLES - len(examples[i])].tolist())
+
+    with span('profile'):
+        with np.errstate(invalid='ignore'):
+            means = pd.DataFrame(sums / counts[:, None], columns=CULTURAL_FEATURES + ['immigration_ratio_2024'])
+        names, descriptions = profile_labels(means, means['immigration_ratio_2024'])
+        levels = migration_levels(means['immigration_ratio_2024'], migration_bins(sketches.get('2024')))
+        cluster_stats = {
+            i: {
+                'name': names[i],
+                'description': descriptions[i],
+                'countries': examples[i],
+                'size': int(counts[i]),
+                'cultural_profile': {
+                    DIMENSION_TABLE[dim][0]: float(means.at[i, dim]) for dim in CULTURAL_FEATURES
+                },
+                'migration_level': levels[i],
+                'immigration_ratio_per_1000': float(means.at[i, 'immigration_ratio_2024'])
+            }
+            for i in range(n_clusters)
+        }
+
+    clustering_results = {
+        'clusters': cluster_stats,
+        'rows': n_rows,
+        'inertia': inertia,
+        'pca_explained_variance': pca.explained_variance_ratio_.tolist(),
+        'feature_importance': {
+            'cultural_weight': 0.6,
+            'migration_weight': 0.4
+        },
+        'migration_thresholds': threshold_table(sketches),
+        'out_of_core': {'chunksize': chunksize, 'epochs': n_epochs, 'init_sample': len(sample)}
+    }
+
+    with span('write'):
+        with open(os.path.join(output_dir, 'clustering_results.json'), 'w') as f:
+            json.dump(clustering_results, f, indent=2)
+        save_sketches(sketches, os.path.join(output_dir, 'migration_sketches.json'))
+
+    log(f"Out-of-core clustering completed: {n_clusters} clusters for {n_rows:,} rows")
+    for i, stats in cluster_stats.items():
+        log(f"  Cluster {i+1}: {stats['name']} ({stats['size']:,} rows, {stats['migration_level']} migration)")
+    log(f"Assignments written to {clusters_path}")
+    return clustering_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster a large masterdata-shaped table chunk by chunk")
+    parser.add_argument('--input', default='output/masterdata.csv')
+    parser.add_argument('--output-dir', default='output/out_of_core')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--clusters', type=int, default=8)
+    parser.add_argument('--epochs', type=int, default=3, help="mini-batch passes over the table")
+    args = parser.parse_args()
+
+    run_out_of_core_clustering(args.input, args.output_dir, n_clusters=args.clusters,
+                               chunksize=args.chunksize, n_epochs=args.epochs)
@@ -0,0 +1,159 @@
+"""
+Concurrent, cached population lookups against the REST Countries API
+
+Lookups are blocking http.client requests run on a pool of worker threads, each holding one
+keep-alive connection; the pool size bounds the number of requests in flight.
+"""
+
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from profiling import log
+
+REST_COUNTRIES_URL = 'https://restcountries.com/v3.1'
+POPULATION_SOURCES = 'raw_data/population_sources.json'
+POPULATION_CACHE = 'output/cache/population_cache.json'
+
+# Statuses worth retrying; anything else (e.g. 404) is a definitive miss
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    pass
+
+def load_population_sources(path=POPULATION_SOURCES):
+    """API name overrides and fallback populations for countries the API cannot resolve"""
+    with open(path, encoding='utf-8') as f:
+        sources = json.load(f)
+    return sources.get('api_names', {}), sources.get('fallback_populations', {})
+
+class PopulationFetcher:
+    """
+    Fetch populations on a thread pool of `concurrency` workers, one keep-alive connection each
+
+    Successful lookups are kept in an on-disk JSON cache for ttl_days, so reruns only
+    hit the API for countries that are new or whose cache entry expired.
+    """
+
+    def __init__(self, base_url=REST_COUNTRIES_URL, concurrency=8, retries=3, backoff=0.5,
+                 timeout=10, cache_path=POPULATION_CACHE, ttl_days=30, sources_path=POPULATION_SOURCES):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.api_names, self.fallback_populations = load_population_sources(sources_path)
+        self._local = threading.local()
+
+    def _connection(self):
+        """One persistent connection per worker thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(self.netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _get(self, path):
+        """Blocking GET on this thread's connection, returning (status, body)"""
+        conn = self._connection()
+        try:
+            conn.request('GET', path, headers={'Accept': 'application/json'})
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # Drop the broken connection so the next attempt reconnects
+            conn.close()
+            self._local.conn = None
+            raise RetryableError(str(e)) from e
+
+    def _fetch_country(self, country):
+        """(country, population or None, error or None), retrying with backoff on this worker thread"""
+        api_country = self.api_names.get(country, country)
+        path = f"{self.base_path}/name/{quote(api_country)}"
+
+        for attempt in range(self.retries + 1):
+            try:
+                status, body = self._get(path)
+                if status in RETRY_STATUSES:
+                    raise RetryableError(f"API error {status}")
+                if status != 200:
+                    return country, None, f"API error {status}"
+                data = json.loads(body)
+                population = data[0].get('population', 0) if data else 0
+                if not population:
+                    return country, None, "No data found"
+                return country, int(population), None
+            except RetryableError as e:
+                if attempt == self.retries:
+                    return country, None, f"Error - {e}"
+                time.sleep(self.backoff * 2 ** attempt)
+            except (ValueError, KeyError, IndexError, AttributeError) as e:
+                return country, None, f"Error - {e}"
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        with open(self.cache_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_cache(self, cache):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+
+    def fetch(self, countries):
+        """
+        Return ({country: population}, [failed countries]) for the given country names
+
+        Countries the API cannot resolve fall back to the configured populations (or 0).
+        """
+        cache = self._load_cache()
+        now = time.time()
+        population_data = {}
+        to_fetch = []
+
+        for country in dict.fromkeys(countries):
+            entry = cache.get(country)
+            if entry and now - entry['fetched_at'] < self.ttl_seconds:
+                population_data[country] = entry['population']
+            else:
+                to_fetch.append(country)
+
+        log(f"Population cache: {len(population_data)} fresh, {len(to_fetch)} to fetch")
+
+        failed_countries = []
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                results = list(executor.map(self._fetch_country, to_fetch))
+
+            for country, population, error in results:
+                if error is None:
+                    population_data[country] = population
+                    cache[country] = {'population': population, 'fetched_at': now}
+                    log(f"✓ {country}: {population:,}")
+                else:
+                    failed_countries.append(country)
+                    log(f"✗ {country}: {error}")
+
+            self._save_cache(cache)
+
+        # Handle failed countries with fallback data
+        for country in failed_countries:
+            if country in self.fallback_populations:
+                population_data[country] = self.fallback_populations[country]
+                log(f"📝 {country}: Using fallback population {self.fallback_populations[country]:,}")
+            else:
+                population_data[country] = 0
+                log(f"❌ {country}: No population data available")
+
+        return population_data, failed_countries
@@ -0,0 +1,147 @@
+"""
+Lightweight timing and memory instrumentation for the data pipeline
+
+    with span('fit'):
+        ...
+
+    @timed('load')
+    def load(...): ...
+
+Every span records wall time, CPU time and process RSS; with trace_memory, also the peak
+Python heap allocated inside it (tracemalloc). Spans nest, and the run can be written as a
+JSON report. log() replaces progress prints and is silenced by set_quiet(True).
+"""
+
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import psutil
+
+_PROCESS = psutil.Process()
+
+class Profiler:
+    def __init__(self):
+        self.spans = []
+        self.stack = []
+        self.quiet = False
+        self.trace_memory = False
+        self.cprofile = None
+        self.started = time.time()
+
+    def start(self, trace_memory=False, cprofile=False):
+        """Reset recorded spans and optionally enable tracemalloc and cProfile"""
+        self.spans = []
+        self.stack = []
+        self.started = time.time()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        frame = {'name': name, 'carry': 0}
+        if self.trace_memory:
+            # The parent keeps its peak so far; the child measures its own from here
+            if self.stack:
+                self.stack[-1]['carry'] = max(self.stack[-1]['carry'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            heap_start = tracemalloc.get_traced_memory()[0]
+
+        path = '/'.join([f['name'] for f in self.stack] + [name])
+        # Reserve the slot now so spans are reported in start order, parents first
+        index = len(self.spans)
+        self.spans.append(None)
+        self.stack.append(frame)
+        rss_start = _PROCESS.memory_info().rss
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            record = {
+                'name': name,
+                'path': path,
+                'depth': len(self.stack) - 1,
+                'wall_seconds': time.perf_counter() - wall_start,
+                'cpu_seconds': time.process_time() - cpu_start,
+            }
+            rss_end = _PROCESS.memory_info().rss
+            record['rss_mb'] = rss_end / 1e6
+            record['rss_delta_mb'] = (rss_end - rss_start) / 1e6
+            self.stack.pop()
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame['carry'])
+                record['heap_peak_mb'] = (peak - heap_start) / 1e6
+                if self.stack:
+                    self.stack[-1]['carry'] = max(self.stack[-1]['carry'], peak)
+            record.update(attrs)
+            self.spans[index] = record
+
+    def report(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'peak_rss_mb': _peak_rss_bytes() / 1e6,
+            'spans': [s for s in self.spans if s is not None],
+        }
+
+    def write_report(self, path, cprofile_path=None):
+        """Write the JSON run report and, when cProfile was enabled, the raw profile dump"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(cprofile_path or os.path.splitext(path)[0] + '.prof')
+            self.cprofile = None
+        return path
+
+    def summary(self):
+        """Recorded spans as aligned text lines, indented by nesting depth"""
+        lines = [f"{'span':<32}{'wall s':>10}{'cpu s':>10}{'rss MB':>10}"]
+        for s in self.spans:
+            if s is None:
+                continue
+            lines.append(f"{'  ' * s['depth'] + s['name']:<32}{s['wall_seconds']:>10.3f}"
+                         f"{s['cpu_seconds']:>10.3f}{s['rss_mb']:>10.1f}")
+        return '\n'.join(lines)
+
+def _peak_rss_bytes():
+    """Lifetime peak RSS of this process (Linux/macOS), falling back to the current RSS"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return _PROCESS.memory_info().rss
+
+PROFILER = Profiler()
+
+def span(name, **attrs):
+    return PROFILER.span(name, **attrs)
+
+def timed(name=None):
+    """Decorator recording every call of a function as a span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def set_quiet(quiet=True):
+    PROFILER.quiet = quiet
+
+def log(*args, **kwargs):
+    """print() unless quiet mode is on"""
+    if not PROFILER.quiet:
+        print(*args, **kwargs)
@@ -0,0 +1,100 @@
+"""
+Mergeable streaming quantile sketch (KLL)
+
+Values are kept in a stack of compactors; when a level overflows it is sorted and every
+other item is promoted to the next level with double weight. Rank error is about 1/k, memory
+is O(k log(n/k)), and two sketches merge by concatenating their levels and compacting, so
+new batches update a persisted sketch without revisiting earlier data.
+"""
+
+import math
+
+import numpy as np
+
+class KLLSketch:
+    def __init__(self, k=200):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        # Compactions per level; alternating the kept offset keeps results deterministic
+        self.compactions = [0]
+
+    def capacity(self, level):
+        """Items level may hold: k at the top, shrinking by 2/3 per level below it"""
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+            self.compactions.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                    self.compactions.append(0)
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[:len(items) % 2]
+                paired = items[len(items) % 2:]
+                offset = self.compactions[level] % 2
+                self.compactions[level] += 1
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], paired[offset::2]])
+                # Capacities changed if a level was added - rescan from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def weighted_items(self):
+        """Sorted retained values and their weights"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """Approximate q-quantile(s): the smallest retained value whose rank reaches q * n"""
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values, weights = self.weighted_items()
+        cumulative = np.cumsum(weights)
+        targets = np.asarray(q, dtype=float) * cumulative[-1]
+        index = np.clip(np.searchsorted(cumulative, targets, side='left'), 0, len(values) - 1)
+        return values[index]
+
+    def to_dict(self):
+        return {
+            'k': self.k,
+            'n': self.n,
+            'levels': [items.tolist() for items in self.levels],
+            'compactions': list(self.compactions),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.levels = [np.asarray(items, dtype=float) for items in data['levels']]
+        sketch.compactions = list(data['compactions'])
+        return sketch
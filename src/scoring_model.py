@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+What-if scoring against the fitted clusters, without refitting
+Usage: python3 scoring_model.py COUNTRY [FEATURE=VALUE ...] [--model output/scoring_model.json]
+       e.g. python3 scoring_model.py Netherlands immigration_ratio_2024=*2 pdi=60
+
+create_country_clustering saves everything needed to place a new row in the fitted space as
+scoring_model.json: the clip/log transform of the migration ratios, the StandardScaler
+statistics, the KMeans centroids, the PCA components, the cluster labels and the feature rows
+of the countries the model was fitted on. ScoringModel.score transforms and assigns any number
+of hypothetical rows in one vectorized pass.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifact_manifest import canonical_json, content_hash
+from cluster_labels import migration_levels, profile_labels
+
+MODEL_VERSION = 1
+MODEL_PATH = 'output/scoring_model.json'
+# Migration ratio the migration level is read from
+LEVEL_FEATURE = 'immigration_ratio_2024'
+
+def build_scoring_model(df_clean, scaler, kmeans, pca, cluster_stats, cultural_features, migration_features,
+                        ratio_range, migration_bins):
+    """
+    JSON-ready model: everything ScoringModel needs, identified by a hash of its content
+    """
+    features = cultural_features + migration_features
+    model = {
+        'version': MODEL_VERSION,
+        'features': {'cultural': cultural_features, 'migration': migration_features},
+        'transform': {'migration_clip': list(ratio_range), 'migration_log1p': True},
+        'scaler': {'mean': scaler.mean_.tolist(), 'scale': scaler.scale_.tolist()},
+        'centroids': kmeans.cluster_centers_.tolist(),
+        'pca': {'mean': pca.mean_.tolist(), 'components': pca.components_.tolist()},
+        'clusters': [
+            {'name': stats['name'], 'color': stats['color'], 'migration_level': stats['migration_level']}
+            for _, stats in sorted(cluster_stats.items())
+        ],
+        'migration_bins': list(migration_bins),
+        'countries': {
+            'names': df_clean['country'].tolist(),
+            'rows': df_clean[features].to_numpy(dtype=float).tolist(),
+        },
+    }
+    model['model_id'] = content_hash(canonical_json(model))
+    return model
+
+def save_scoring_model(model, path=MODEL_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(model, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+def parse_change(value):
+    """A scenario value: a number sets the feature, '*k' (or 'xk') multiplies its current value"""
+    text = str(value).strip()
+    try:
+        kind, number = ('scale', float(text[1:])) if text[:1] in ('*', 'x') else ('set', float(text))
+    except ValueError:
+        raise ValueError(f"Invalid scenario value: {value!r} (use a number or *factor)")
+    if not np.isfinite(number):
+        raise ValueError(f"Invalid scenario value: {value!r} (must be finite)")
+    return kind, number
+
+def records(scores):
+    """JSON-ready records of a score frame (numpy scalars converted)"""
+    return json.loads(scores.to_json(orient='records'))
+
+class ScoringModel:
+    """Read side of scoring_model.json"""
+
+    def __init__(self, model):
+        if model.get('version') != MODEL_VERSION:
+            raise ValueError(f"Unsupported scoring model version {model.get('version')} (expected {MODEL_VERSION})")
+        self.model = model
+        self.model_id = model['model_id']
+        self.cultural = model['features']['cultural']
+        self.migration = model['features']['migration']
+        self.features = self.cultural + self.migration
+        self.ratio_range = tuple(model['transform']['migration_clip'])
+
+        self.mean = np.asarray(model['scaler']['mean'])
+        self.scale = np.asarray(model['scaler']['scale'])
+        self.centroids = np.asarray(model['centroids'])
+        self.centroid_norms = (self.centroids ** 2).sum(axis=1)
+        self.pca_mean = np.asarray(model['pca']['mean'])
+        self.components = np.asarray(model['pca']['components'])
+        self.cluster_names = np.array([c['name'] for c in model['clusters']], dtype=object)
+        self.migration_bins = model['migration_bins']
+
+        self.countries = model['countries']['names']
+        self.rows = np.asarray(model['countries']['rows'], dtype=float).reshape(-1, len(self.features))
+        self.positions = {name.casefold(): i for i, name in enumerate(self.countries)}
+
+    @classmethod
+    def from_file(cls, path=MODEL_PATH):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def resolve(self, country):
+        """Canonical spelling of a country name, or None when the model was not fitted on it"""
+        position = self.positions.get(country.strip().casefold())
+        return None if position is None else self.countries[position]
+
+    def base_row(self, country):
+        """Feature values the model was fitted with for a country, or None for unknown names"""
+        position = self.positions.get(country.strip().casefold())
+        return None if position is None else dict(zip(self.features, self.rows[position].tolist()))
+
+    def feature_matrix(self, rows):
+        """
+        float64 feature matrix from a DataFrame or a list of dicts
+
+        A migration ratio may instead be given as the raw count of its year plus population
+        (e.g. '2024' and 'population' for immigration_ratio_2024).
+        """
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        columns = {}
+        missing = []
+        for feature in self.features:
+            if feature in frame:
+                columns[feature] = frame[feature]
+                continue
+            year = feature.rsplit('_', 1)[-1]
+            if feature in self.migration and year in frame and 'population' in frame:
+                population = pd.to_numeric(frame['population'], errors='coerce')
+                columns[feature] = pd.to_numeric(frame[year], errors='coerce') / population.where(population > 0) * 1000
+            else:
+                missing.append(feature)
+        if missing:
+            raise ValueError(f"Rows are missing features: {', '.join(missing)}")
+
+        return self.check_finite(pd.DataFrame(columns).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float))
+
+    def check_finite(self, X):
+        """X itself, or a ValueError naming the first row and feature that is NaN or infinite"""
+        bad = ~np.isfinite(X)
+        if bad.any():
+            row, col = np.argwhere(bad)[0]
+            raise ValueError(f"Row {row}: {self.features[col]} is not a finite number "
+                             f"({bad.any(axis=1).sum()} rows affected)")
+        return X
+
+    def transform(self, X):
+        """Standardized features: migration ratios clipped and log1p-transformed, then scaled"""
+        X = np.array(X, dtype=float)
+        migration = slice(len(self.cultural), None)
+        X[:, migration] = np.log1p(np.clip(X[:, migration], *self.ratio_range))
+        return (X - self.mean) / self.scale
+
+    def assign(self, X_scaled):
+        """Nearest centroid and its distance for every standardized row"""
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2 for all rows and centroids in one product
+        d2 = (X_scaled ** 2).sum(axis=1)[:, None] - 2 * X_scaled @ self.centroids.T + self.centroid_norms
+        clusters = d2.argmin(axis=1)
+        distance = np.sqrt(np.maximum(d2[np.arange(len(d2)), clusters], 0))
+        return clusters, distance
+
+    def score(self, rows):
+        """
+        Cluster, cluster name, own profile label, migration level and PCA coordinates of every row
+        """
+        if isinstance(rows, np.ndarray):
+            X = self.check_finite(np.asarray(rows, dtype=float))
+        else:
+            X = self.feature_matrix(rows)
+        X_scaled = self.transform(X)
+        clusters, distance = self.assign(X_scaled)
+        X_pca = (X_scaled - self.pca_mean) @ self.components.T
+
+        cultural = {dim: X[:, j] for j, dim in enumerate(self.cultural)}
+        ratio = X[:, self.features.index(LEVEL_FEATURE)]
+        profiles, _ = profile_labels(cultural, ratio)
+        return pd.DataFrame({
+            'cluster': clusters,
+            'cluster_name': self.cluster_names[clusters],
+            'profile': profiles,
+            'migration_level': migration_levels(ratio, self.migration_bins),
+            'pca_x': X_pca[:, 0],
+            'pca_y': X_pca[:, 1],
+            'distance': distance,
+        })
+
+    def what_if(self, country, changes):
+        """
+        Baseline and scenario scores for a country with changes applied
+        ({feature: number or '*factor'}); None for unknown countries
+        """
+        base = self.base_row(country)
+        if base is None:
+            return None
+        unknown = set(changes) - set(self.features)
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+
+        scenario = dict(base)
+        for feature, value in changes.items():
+            kind, number = parse_change(value)
+            scenario[feature] = scenario[feature] * number if kind == 'scale' else number
+
+        X = np.array([[base[f] for f in self.features], [scenario[f] for f in self.features]])
+        baseline, changed = records(self.score(X))
+        return {
+            'country': self.resolve(country),
+            'model_id': self.model_id,
+            'baseline': {**baseline, 'features': base},
+            'scenario': {**changed, 'features': scenario},
+            'cluster_changed': baseline['cluster'] != changed['cluster'],
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a what-if scenario against the fitted clusters")
+    parser.add_argument('country')
+    parser.add_argument('changes', nargs='*', metavar='FEATURE=VALUE',
+                        help="new feature value, or *factor to scale it (e.g. immigration_ratio_2024=*2)")
+    parser.add_argument('--model', default=MODEL_PATH)
+    args = parser.parse_args()
+
+    model = ScoringModel.from_file(args.model)
+    changes = dict(change.split('=', 1) for change in args.changes)
+    result = model.what_if(args.country, changes)
+    if result is None:
+        raise SystemExit(f"Unknown country: {args.country}")
+
+    for label in ('baseline', 'scenario'):
+        scored = result[label]
+        print(f"{label:>8}: cluster {scored['cluster']} ({scored['cluster_name']}), profile {scored['profile']}, "
+              f"{scored['migration_level']} migration, PCA ({scored['pca_x']:.2f}, {scored['pca_y']:.2f})")
+    print(f"Cluster {'changes' if result['cluster_changed'] else 'does not change'} (model {result['model_id']})")
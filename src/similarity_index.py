@@ -0,0 +1,98 @@
+"""
+Nearest-neighbour "similar countries" index over the standardized clustering features
+
+The top-k neighbours of every country are precomputed into similar_countries.json, so lookups
+are a dictionary read. Index backends are looked up by name and can be swapped for an
+approximate index without changing the artifact.
+"""
+
+import json
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+DEFAULT_K = 10
+
+def _sklearn_tree(algorithm):
+    def build(X):
+        return NearestNeighbors(algorithm=algorithm, metric='euclidean').fit(X)
+    return build
+
+# name -> callable(X) returning an object with kneighbors(X, n_neighbors)
+INDEX_BACKENDS = {
+    'kd_tree': _sklearn_tree('kd_tree'),
+    'ball_tree': _sklearn_tree('ball_tree'),
+    'brute': _sklearn_tree('brute'),
+}
+
+def build_neighbor_table(X_scaled, k=DEFAULT_K, backend='kd_tree'):
+    """
+    Indices and distances of the k nearest other countries for every row, closest first
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend}")
+
+    k = min(k, len(X_scaled) - 1)
+    index = INDEX_BACKENDS[backend](X_scaled)
+    distances, indices = index.kneighbors(X_scaled, n_neighbors=k + 1)
+
+    # Drop each row's own entry (normally the first, but not guaranteed with exact duplicates)
+    rows = np.arange(len(X_scaled))[:, None]
+    keep = indices != rows
+    keep[keep.sum(axis=1) > k, -1] = False
+    return indices[keep].reshape(-1, k), distances[keep].reshape(-1, k)
+
+def write_similar_countries(countries, X_scaled, path, k=DEFAULT_K, backend='kd_tree'):
+    """
+    Write the compact neighbour artifact: country names once, neighbours as indices into them
+    """
+    indices, distances = build_neighbor_table(X_scaled, k, backend)
+    artifact = {
+        'k': int(indices.shape[1]),
+        'metric': 'euclidean',
+        'backend': backend,
+        'countries': list(countries),
+        'neighbors': indices.tolist(),
+        'distances': np.round(distances, 4).tolist(),
+    }
+    with open(path, 'w') as f:
+        json.dump(artifact, f, separators=(',', ':'))
+    return artifact
+
+class SimilarCountries:
+    """Read side of similar_countries.json"""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.positions = {name.casefold(): i for i, name in enumerate(artifact['countries'])}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def resolve(self, country):
+        """Canonical spelling of a country name, or None when it is not indexed"""
+        position = self.positions.get(country.strip().casefold())
+        return None if position is None else self.artifact['countries'][position]
+
+    def query(self, country, k=None):
+        """
+        Up to k most similar countries as [{'country', 'distance'}], or None for unknown names
+
+        k above the precomputed neighbour count is capped; k below 1 raises ValueError.
+        """
+        if k is not None and k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        position = self.positions.get(country.strip().casefold())
+        if position is None:
+            return None
+        k = self.artifact['k'] if k is None else min(k, self.artifact['k'])
+        names = self.artifact['countries']
+        return [
+            {'country': names[i], 'distance': d}
+            for i, d in zip(self.artifact['neighbors'][position][:k], self.artifact['distances'][position][:k])
+        ]
+
+def similar_countries(country, k=None, path='output/similar_countries.json'):
+    return SimilarCountries.from_file(path).query(country, k)
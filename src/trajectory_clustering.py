@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Cluster countries on their 1990-2024 migration trajectories
+Usage: python3 trajectory_clustering.py [--method basis|dtw] [--clusters 8]
+
+Every country becomes a (years x features) trajectory of log immigration ratio, log growth
+rate and female share of migrants. Trajectories are clustered either by KMeans on a reduced
+PCA basis of the flattened tensor or by average-linkage on pairwise DTW distances; each
+country-year is also assigned to a shared set of per-year clusters.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import AgglomerativeClustering, KMeans
+from sklearn.decomposition import PCA
+
+from masterdata_schema import YEARS
+
+TRAJECTORY_FEATURES = ['log_ratio', 'growth', 'female_share']
+TRAJECTORY_METHODS = ['basis', 'dtw']
+# Country pairs per DTW batch; bounds the cost and accumulator arrays
+DTW_PAIR_BATCH = 1 << 14
+
+def build_trajectory_tensor(df_clean, years=YEARS):
+    """
+    (countries, years, features) tensor of migration trajectories
+
+    Ratios use the current population for every year, as the snapshot features do.
+    """
+    population = df_clean['population'].to_numpy(dtype=float)[:, None]
+    total = df_clean[years].to_numpy(dtype=float)
+    male = df_clean[[f"{y}_male" for y in years]].to_numpy(dtype=float)
+    female = df_clean[[f"{y}_female" for y in years]].to_numpy(dtype=float)
+
+    # Same clipping and log scaling as build_feature_matrix
+    log_ratio = np.log1p(np.clip(total / population * 1000, 0.001, 1000))
+
+    # Log growth between consecutive survey years, 0 for the first year
+    growth = np.zeros_like(log_ratio)
+    growth[:, 1:] = np.diff(np.log1p(total), axis=1)
+
+    by_sex = male + female
+    female_share = np.divide(female, by_sex, out=np.full_like(female, 0.5), where=by_sex > 0)
+
+    return np.stack([log_ratio, growth, female_share], axis=2)
+
+def standardize_tensor(tensor):
+    """Scale each feature to zero mean, unit variance over all countries and years"""
+    mean = tensor.mean(axis=(0, 1), keepdims=True)
+    std = tensor.std(axis=(0, 1), keepdims=True)
+    return (tensor - mean) / np.where(std > 0, std, 1)
+
+def dtw_distances(tensor, batch_size=DTW_PAIR_BATCH):
+    """
+    Pairwise DTW distances between all trajectories
+
+    The upper triangle of country pairs is processed in batches of batch_size. For each batch
+    the dynamic program runs over the (years x years) alignment grid with every cell updated for
+    all pairs at once, so memory is O(batch_size * T²) however many countries there are.
+    """
+    n_countries, n_years, _ = tensor.shape
+    first, second = np.triu_indices(n_countries, 1)
+    distances = np.zeros((n_countries, n_countries))
+
+    for start in range(0, len(first), batch_size):
+        a, b = first[start:start + batch_size], second[start:start + batch_size]
+        # Local cost for every pair in the batch and every pair of years: (T, T, pairs)
+        diff = tensor[a][:, :, None, :] - tensor[b][:, None, :, :]
+        cost = np.sqrt(np.sum(diff ** 2, axis=-1)).transpose(1, 2, 0)
+
+        acc = np.full((n_years + 1, n_years + 1, len(a)), np.inf)
+        acc[0, 0] = 0
+        for i in range(1, n_years + 1):
+            for j in range(1, n_years + 1):
+                best = np.minimum(np.minimum(acc[i - 1, j], acc[i, j - 1]), acc[i - 1, j - 1])
+                acc[i, j] = cost[i - 1, j - 1] + best
+        distances[a, b] = distances[b, a] = acc[n_years, n_years]
+    return distances
+
+def cluster_trajectories(tensor, n_clusters=8, method='basis', n_components=6, random_state=42, n_init=10):
+    """Label each country by the shape of its whole trajectory"""
+    if method == 'dtw':
+        model = AgglomerativeClustering(n_clusters=n_clusters, metric='precomputed', linkage='average')
+        return model.fit_predict(dtw_distances(tensor)), None
+
+    flat = tensor.reshape(len(tensor), -1)
+    pca = PCA(n_components=min(n_components, *flat.shape), random_state=random_state)
+    basis = pca.fit_transform(flat)
+    labels = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init).fit_predict(basis)
+    return labels, pca.explained_variance_ratio_
+
+def cluster_years(tensor, cultural, n_clusters=8, random_state=42, n_init=10):
+    """
+    Per-year cluster assignments from one KMeans over all country-year rows
+
+    Each row is a country's standardized cultural scores plus that year's migration features,
+    so labels are comparable across years and show countries moving between clusters.
+    """
+    n_countries, n_years, _ = tensor.shape
+    rows = np.concatenate([
+        np.repeat(cultural[:, None, :], n_years, axis=1),
+        tensor,
+    ], axis=2).reshape(n_countries * n_years, -1)
+    labels = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init).fit_predict(rows)
+    return labels.reshape(n_countries, n_years)
+
+def run_trajectory_clustering(df_clean, cultural_features, n_clusters=8, method='basis', random_state=42,
+                              n_init=10, years=YEARS):
+    """
+    Trajectory and per-year cluster labels for the countries in df_clean
+    """
+    if method not in TRAJECTORY_METHODS:
+        raise ValueError(f"Unknown trajectory method: {method}")
+
+    df_clean = df_clean.dropna(subset=years + [f"{y}_{sex}" for y in years for sex in ('male', 'female')])
+    tensor = standardize_tensor(build_trajectory_tensor(df_clean, years))
+    cultural = df_clean[cultural_features].to_numpy(dtype=float)
+    cultural = (cultural - cultural.mean(axis=0)) / cultural.std(axis=0)
+
+    trajectory_labels, explained = cluster_trajectories(tensor, n_clusters, method,
+                                                        random_state=random_state, n_init=n_init)
+    yearly_labels = cluster_years(tensor, cultural, n_clusters, random_state=random_state, n_init=n_init)
+
+    return {
+        'method': method,
+        'n_clusters': n_clusters,
+        'years': list(years),
+        'features': TRAJECTORY_FEATURES,
+        'basis_explained_variance': explained.tolist() if explained is not None else None,
+        'countries': [
+            {
+                'country': country,
+                'trajectory_cluster': int(label),
+                'yearly_clusters': dict(zip(years, yearly.tolist())),
+            }
+            for country, label, yearly in zip(df_clean['country'], trajectory_labels, yearly_labels)
+        ],
+    }
+
+def trajectory_frame(trajectory):
+    """One row per country: trajectory cluster and the cluster of every year"""
+    return pd.DataFrame([
+        {'country': c['country'], 'trajectory_cluster': c['trajectory_cluster'],
+         **{f"cluster_{year}": label for year, label in c['yearly_clusters'].items()}}
+        for c in trajectory['countries']
+    ])
+
+if __name__ == "__main__":
+    from clustering_analysis import create_country_clustering
+
+    parser = argparse.ArgumentParser(description="Cluster countries on 1990-2024 migration trajectories")
+    parser.add_argument('--method', choices=TRAJECTORY_METHODS, default='basis')
+    parser.add_argument('--clusters', type=int, default=8)
+    args = parser.parse_args()
+
+    create_country_clustering(n_clusters=args.clusters, trajectory_method=args.method)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Pre-projected, simplified world geometry for the dashboard maps
+Usage: python3 world_geometry.py [--atlas raw_data/countries-110m.json] [--output output/world_geometry.json]
+                                 [--masterdata output/masterdata.csv] [--clusters output/clustering_results.json]
+       python3 world_geometry.py --download
+
+The world-atlas TopoJSON is projected once with the projection the maps use
+(d3.geoNaturalEarth1, scale 130 on the 800x500 frame), simplified for each zoom level and
+joined to masterdata and the clustering results. The browser draws the SVG paths as they
+are: no TopoJSON decoding, projection or name matching at load time.
+
+Simplification works on TopoJSON arcs, so a border shared by two countries is simplified
+once and the neighbours still meet exactly at every level.
+"""
+
+import argparse
+import json
+import math
+import os
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from artifact_manifest import write_artifacts
+from cluster_labels import MIGRATION_BINS, migration_levels
+from country_matcher import CountryMatcher
+from profiling import log, span
+
+WORLD_ATLAS_URL = 'https://cdn.jsdelivr.net/npm/world-atlas@2/countries-110m.json'
+ATLAS_PATH = 'raw_data/countries-110m.json'
+GEOMETRY_PATH = 'output/world_geometry.json'
+GEOMETRY_VERSION = 1
+
+# Same frame as WorldMapComponent; other maps rescale it with an SVG transform
+PROJECTION = {'name': 'naturalEarth1', 'width': 800, 'height': 500, 'scale': 130, 'translate': [400, 250]}
+# Zoom factors of the map (d3.zoom scaleExtent is [0.5, 8]) that get their own level
+ZOOM_LEVELS = [1, 2, 4, 8]
+# Largest deviation from the full geometry, in screen pixels at a level's zoom
+SCREEN_TOLERANCE = 0.5
+
+# Atlas name -> masterdata name for pairs normalization alone cannot resolve
+ATLAS_ALIASES = {
+    "South Korea": "Republic of Korea",
+    "Moldova": "Republic of Moldova",
+    "Russia": "Russian Federation",
+    "Syria": "Syrian Arab Republic",
+    "Turkey": "Türkiye",
+    "Vietnam": "Viet Nam",
+    "Bosnia and Herz.": "Bosnia and Herzegovina",
+    "Dominican Rep.": "Dominican Republic",
+    "Macedonia": "North Macedonia",
+}
+
+def download_atlas(path=ATLAS_PATH, url=WORLD_ATLAS_URL):
+    """Fetch the world-atlas TopoJSON once; the pipeline reads the local copy"""
+    with urllib.request.urlopen(url, timeout=30) as response:
+        data = response.read()
+    json.loads(data)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+    log(f"Saved {url} to {path} ({len(data):,} bytes)")
+
+def decode_arcs(topology):
+    """Arcs as (n, 2) float arrays of longitude/latitude, undoing the quantized delta encoding"""
+    transform = topology.get('transform')
+    arcs = []
+    for arc in topology['arcs']:
+        points = np.asarray(arc, dtype=float)[:, :2]
+        if transform:
+            points = np.cumsum(points, axis=0) * transform['scale'] + transform['translate']
+        arcs.append(points)
+    return arcs
+
+def natural_earth1(points, scale=PROJECTION['scale'], translate=PROJECTION['translate']):
+    """d3.geoNaturalEarth1 for an (n, 2) array of degrees, in SVG pixel coordinates"""
+    lam, phi = np.radians(points[:, 0]), np.radians(points[:, 1])
+    phi2 = phi * phi
+    phi4 = phi2 * phi2
+    x = lam * (0.8707 - 0.131979 * phi2 + phi4 * (-0.013791 + phi4 * (0.003971 * phi2 - 0.001529 * phi4)))
+    y = phi * (1.007226 + phi2 * (0.015085 + phi4 * (-0.044475 + 0.028874 * phi2 - 0.005916 * phi4)))
+    return np.column_stack([translate[0] + scale * x, translate[1] - scale * y])
+
+def _segment_distance(points, start, end):
+    """Distance of every point to the segment start-end (to start, when the segment is a point)"""
+    direction = end - start
+    length2 = float(direction @ direction)
+    if length2 == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ direction / length2, 0, 1)
+    return np.hypot(*(points - start - t[:, None] * direction).T)
+
+def simplification_weights(points):
+    """
+    Douglas-Peucker weight of every point: the largest tolerance at which it is still kept
+
+    A child never outweighs the point that split its segment, so the points kept at a
+    tolerance are always a subset of those kept at any smaller one.
+    """
+    weights = np.zeros(len(points))
+    weights[0] = weights[-1] = np.inf
+    stack = [(0, len(points) - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        distance = _segment_distance(points[first + 1:last], points[first], points[last])
+        split = first + 1 + int(np.argmax(distance))
+        weights[split] = min(float(distance[split - first - 1]), cap)
+        stack.append((first, split, weights[split]))
+        stack.append((split, last, weights[split]))
+    return weights
+
+def _rings(geometry):
+    """Rings of a Polygon or MultiPolygon, each a list of arc indices"""
+    if geometry.get('type') == 'Polygon':
+        return list(geometry['arcs'])
+    if geometry.get('type') == 'MultiPolygon':
+        return [ring for polygon in geometry['arcs'] for ring in polygon]
+    return []
+
+def _stitch(ring, arcs, keep):
+    """Points of a ring: its arcs (reversed for negative indices) with shared endpoints dropped"""
+    parts = []
+    for i, index in enumerate(ring):
+        arc = index if index >= 0 else ~index
+        points = arcs[arc][keep[arc]]
+        if index < 0:
+            points = points[::-1]
+        parts.append(points if i == 0 else points[1:])
+    return np.concatenate(parts)
+
+def _distinct(points):
+    """Quantized points without consecutive repeats"""
+    if len(points) < 2:
+        return points
+    changed = np.any(points[1:] != points[:-1], axis=1)
+    return points[np.concatenate([[True], changed])]
+
+def _format(value, digits):
+    text = f"{value / 10 ** digits:.{digits}f}".rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+def svg_path(rings, digits):
+    """
+    Relative SVG path of integer-quantized rings (units of 10**-digits pixels), one closed
+    subpath per ring; deltas are taken between quantized points so no error accumulates
+    """
+    commands = []
+    for ring in rings:
+        x0, y0 = ring[0]
+        deltas = np.diff(ring[:-1] if np.array_equal(ring[0], ring[-1]) else ring, axis=0)
+        command = f"M{_format(x0, digits)},{_format(y0, digits)}"
+        if len(deltas):
+            command += 'l' + ' '.join(f"{_format(dx, digits)},{_format(dy, digits)}" for dx, dy in deltas)
+        commands.append(command + 'z')
+    return ''.join(commands)
+
+def level_digits(zoom):
+    """Decimals kept at a zoom level: a tenth of a screen pixel"""
+    return max(1, round(math.log10(zoom * 10)))
+
+def project_topology(topology, object_name='countries', zoom_levels=ZOOM_LEVELS, tolerance=SCREEN_TOLERANCE):
+    """
+    Projected features of a TopoJSON object: id, atlas name, bounds and one SVG path per
+    zoom level
+    """
+    geometries = topology['objects'][object_name]['geometries']
+    with span('project', arcs=len(topology['arcs'])):
+        arcs = [natural_earth1(points) for points in decode_arcs(topology)]
+        weights = [simplification_weights(points) for points in arcs]
+
+    features = [{
+        'id': geometry.get('id'),
+        'name': (geometry.get('properties') or {}).get('name'),
+        'rings': _rings(geometry),
+    } for geometry in geometries]
+
+    for feature in features:
+        full = [_stitch(ring, arcs, [slice(None)] * len(arcs)) for ring in feature['rings']]
+        points = np.concatenate(full) if full else np.zeros((0, 2))
+        feature['bounds'] = (
+            [np.round(points.min(axis=0), 2).tolist(), np.round(points.max(axis=0), 2).tolist()]
+            if len(points) else None
+        )
+        feature['paths'] = []
+
+    with span('simplify', levels=len(zoom_levels)):
+        for zoom in zoom_levels:
+            digits = level_digits(zoom)
+            keep = [w > tolerance / zoom for w in weights]
+            # Rings simplified away (small islands made of one or two arcs) keep their full arcs;
+            # keeping them per arc means a neighbour sharing one of those arcs keeps it too
+            for feature in features:
+                for ring in feature['rings']:
+                    if len(_distinct(np.rint(_stitch(ring, arcs, keep) * 10 ** digits))) < 4:
+                        for index in ring:
+                            arc = index if index >= 0 else ~index
+                            keep[arc] = np.ones(len(arcs[arc]), dtype=bool)
+            for feature in features:
+                rings = [_distinct(np.rint(_stitch(ring, arcs, keep) * 10 ** digits).astype(np.int64))
+                         for ring in feature['rings']]
+                feature['paths'].append(svg_path([ring for ring in rings if len(ring) >= 4], digits))
+
+    for feature in features:
+        del feature['rings']
+    return features
+
+def country_attributes(masterdata, clustering_results):
+    """Per masterdata country: cluster, cluster name and colour, 2024 ratio and its migration level"""
+    ratios = (masterdata['2024'] / masterdata['population'] * 1000).where(masterdata['population'] > 0)
+    bins = clustering_results.get('migration_thresholds', {}).get('by_year', {}).get('2024', MIGRATION_BINS)
+    levels = migration_levels(ratios.fillna(0).to_numpy(), bins)
+    clusters = {c['country']: c['cluster'] for c in clustering_results.get('countries', [])}
+
+    attributes = {}
+    for country, continent, ratio, level in zip(masterdata['country'], masterdata['continent'], ratios, levels):
+        cluster = clusters.get(country)
+        stats = clustering_results['clusters'].get(str(cluster), {}) if cluster is not None else {}
+        attributes[country] = {
+            'continent': continent,
+            'cluster': cluster,
+            'cluster_name': stats.get('name'),
+            'color': stats.get('color'),
+            'immigration_ratio_2024': None if pd.isna(ratio) else round(float(ratio), 3),
+            'migration_level': None if pd.isna(ratio) else level,
+        }
+    return attributes
+
+def build_geometry_bundle(atlas_path=ATLAS_PATH, masterdata_path='output/masterdata.csv',
+                          clustering_path='output/clustering_results.json', output_path=GEOMETRY_PATH,
+                          zoom_levels=ZOOM_LEVELS):
+    """
+    Write the projected, simplified and joined geometry to output_path and publish it as
+    the world_geometry artifact of output_path's directory
+    """
+    with open(atlas_path) as f:
+        topology = json.load(f)
+    masterdata = pd.read_csv(masterdata_path)
+    with open(clustering_path) as f:
+        clustering_results = json.load(f)
+
+    features = project_topology(topology, zoom_levels=zoom_levels)
+
+    with span('join'):
+        matches = CountryMatcher(masterdata['country'], aliases=ATLAS_ALIASES).match([f['name'] for f in features])
+        attributes = country_attributes(masterdata, clustering_results)
+        for feature, country in zip(features, matches['match']):
+            country = None if pd.isna(country) else country
+            feature['country'] = country
+            feature.update(attributes.get(country, {}))
+
+    bundle = {
+        'version': GEOMETRY_VERSION,
+        'projection': PROJECTION,
+        'levels': [{'zoom': zoom, 'tolerance': SCREEN_TOLERANCE / zoom} for zoom in zoom_levels],
+        'features': features,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(bundle, f, separators=(',', ':'), ensure_ascii=False)
+    write_artifacts(os.path.dirname(output_path), {'world_geometry': bundle})
+
+    matched = sum(f['country'] is not None for f in features)
+    log(f"World geometry: {len(features)} countries ({matched} joined to masterdata), "
+        f"{len(zoom_levels)} levels, {os.path.getsize(output_path):,} bytes")
+    return bundle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the pre-projected world geometry bundle")
+    parser.add_argument('--atlas', default=ATLAS_PATH)
+    parser.add_argument('--masterdata', default='output/masterdata.csv')
+    parser.add_argument('--clusters', default='output/clustering_results.json')
+    parser.add_argument('--output', default=GEOMETRY_PATH)
+    parser.add_argument('--download', action='store_true', help=f"fetch the atlas from {WORLD_ATLAS_URL} first")
+    args = parser.parse_args()
+
+    if args.download or not os.path.exists(args.atlas):
+        download_atlas(args.atlas)
+    build_geometry_bundle(args.atlas, args.masterdata, args.clusters, args.output)
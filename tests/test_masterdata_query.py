@@ -0,0 +1,25 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from masterdata_query import MasterdataTable
+
+def sorted_countries(table, sort):
+    response = table.query(table.normalize_query({'sort': [sort], 'columns': ['country']}))
+    return [row[0] for row in response['rows']]
+
+def test_missing_values_sort_last_in_both_directions():
+    table = MasterdataTable(pd.DataFrame({
+        'country': ['A', 'B', 'C', 'D', 'E'],
+        'lto': [30.0, np.nan, 10.0, np.nan, 30.0],
+        'region': ['west', None, 'East', 'north', None],
+    }))
+
+    assert sorted_countries(table, 'lto') == ['C', 'A', 'E', 'B', 'D']
+    # Ties keep row order and missing rows stay at the end when descending
+    assert sorted_countries(table, '-lto') == ['A', 'E', 'C', 'B', 'D']
+    assert sorted_countries(table, 'region') == ['C', 'D', 'A', 'B', 'E']
+    assert sorted_countries(table, '-region') == ['A', 'D', 'C', 'B', 'E']